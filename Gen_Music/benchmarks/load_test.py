@@ -0,0 +1,75 @@
+"""
+Prueba de carga contra el servidor local de inferencia
+
+Lanza peticiones /generate concurrentes, mide la latencia del cliente
+(primera nota y total) y muestra las métricas del servidor.
+
+Uso: python benchmarks/load_test.py --requests 200 --concurrency 32
+"""
+import json
+import time
+import argparse
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+SEEDS = ["C4, E4, G4", "Am", "D4, F#4, A4, D5", "G major", "Cmaj7", "E4, D4, C4"]
+
+def run_request(host, port, payload):
+    """Envía una petición y devuelve (segundos hasta la primera nota, segundos totales, notas)"""
+    start = time.perf_counter()
+    first = None
+    connection = http.client.HTTPConnection(host, port, timeout=120)
+    connection.request("POST", "/generate", json.dumps(payload), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    notes = 0
+    for line in response:
+        message = json.loads(line)
+        if 'error' in message:
+            raise RuntimeError(message['error'])
+        if 'note' in message:
+            notes += 1
+            if first is None:
+                first = time.perf_counter() - start
+    connection.close()
+    return first, time.perf_counter() - start, notes
+
+def get_json(host, port, path):
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    connection.request("GET", path)
+    data = json.loads(connection.getresponse().read())
+    connection.close()
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de inferencia")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default="CNN")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--length", type=int, default=32)
+    parser.add_argument("--temperature", type=float, default=0.9)
+    args = parser.parse_args()
+
+    payloads = [{"model": args.model, "seed": SEEDS[i % len(SEEDS)], "length": args.length,
+                 "temperature": args.temperature, "top_k": 20, "random_seed": i}
+                for i in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda p: run_request(args.host, args.port, p), payloads))
+    elapsed = time.perf_counter() - start
+
+    first = np.array([r[0] for r in results]) * 1000
+    total = np.array([r[1] for r in results]) * 1000
+    notes = sum(r[2] for r in results)
+    print(f"Peticiones: {len(results)} en {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s, "
+          f"{notes / elapsed:.0f} notas/s)")
+    print(f"Primera nota (cliente): p50 {np.percentile(first, 50):.1f} ms, p99 {np.percentile(first, 99):.1f} ms")
+    print(f"Total (cliente):        p50 {np.percentile(total, 50):.1f} ms, p99 {np.percentile(total, 99):.1f} ms")
+    print("Métricas del servidor:")
+    print(json.dumps(get_json(args.host, args.port, "/metrics"), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark de arranque en frío
+
+Mide, en procesos nuevos, el tiempo hasta poder usar cada punto de entrada:
+importar los helpers de teoría musical, importar el paquete de utilidades,
+importar main.py (todo lo necesario para mostrar la ventana) e importar
+TensorFlow (lo que main.py ya no paga antes de la primera ventana).
+
+Uso: python benchmarks/startup_benchmark.py --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+SCENARIOS = {
+    'music_utils': "from utils.music_utils import note_to_midi; note_to_midi('C4')",
+    'utils_package': "import utils; utils.note_to_midi('C4')",
+    'data_processing_package': "import data_processing",
+    'main_until_window': "import main; from interface.gui import create_ai_gui",
+    'tensorflow': "import tensorflow"
+}
+
+# El proceso hijo mide su propio tiempo desde el arranque del intérprete
+CHILD_TEMPLATE = """
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+def measure(statement, runs):
+    """Mediana (s) del tiempo de importación en runs procesos nuevos, o None si falla"""
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', CHILD_TEMPLATE.format(statement=statement)],
+                                cwd=SRC_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    times.sort()
+    return times[len(times) // 2], None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for name, statement in SCENARIOS.items():
+        seconds, error = measure(statement, args.runs)
+        results[name] = {'seconds': seconds, 'error': error}
+        if error:
+            print(f"{name:<26} no disponible ({error})")
+        else:
+            print(f"{name:<26} {seconds * 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""
+Suite de benchmarks de todas las etapas del pipeline
+
+Mide, sobre los MIDI de data/midi y sobre un corpus sintético escalado
+(copias transpuestas de esos archivos):
+
+- midi_to_notes: notas por segundo
+- preprocess_dataset de extremo a extremo, sin caché y con caché
+- prepare_data: ventanas por segundo
+- ventanas densas por segundo leídas del piano roll disperso
+- ventanas por segundo del índice de duplicados (y su ratio en el corpus
+  sintético, donde cada archivo aparece transpuesto varias veces)
+- pasos de entrenamiento por segundo del CNN y del Transformer
+- latencia por nota de generate_melody
+- tiempo de render de generate_audio_from_predictions, sin caché y con acierto en la caché de audio
+- melodía a audio: tiempo hasta la primera muestra y tiempo total en streaming,
+  frente a generar todas las notas y renderizar después
+
+Los resultados se guardan en JSON; el subcomando compare los compara con una
+ejecución anterior y termina con código 1 si alguna métrica empeora más que
+el umbral.
+
+Uso (desde Gen_Music):
+    python benchmarks/suite.py run --output bench.json
+    python benchmarks/suite.py compare base.json bench.json --threshold 0.1
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Una sola raíz de importación (src.*): con src también en sys.path los mismos
+# módulos se cargarían dos veces, cada uno con su propio estado
+sys.path.insert(0, ROOT_DIR)
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.10
+
+# Nombre -> (función, unidad, mayor es mejor, tolerancia propia o None)
+BENCHMARKS = {}
+
+def benchmark(name, unit, higher_is_better=True, tolerance=None):
+    """Registra una función de benchmark; recibe las fixtures y devuelve (valor por muestra, extra)"""
+    def decorator(func):
+        BENCHMARKS[name] = (func, unit, higher_is_better, tolerance)
+        return func
+    return decorator
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+class Fixtures:
+    """Datos compartidos entre benchmarks, creados la primera vez que se piden"""
+
+    def __init__(self, args, work_dir):
+        self.args = args
+        self.work_dir = work_dir
+        self._cache = {}
+
+    def _get(self, key, factory):
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    @property
+    def midi_dir(self):
+        return self.args.midi_dir
+
+    @property
+    def midi_files(self):
+        return self._get('midi_files', lambda: sorted(
+            os.path.join(self.midi_dir, f) for f in os.listdir(self.midi_dir)
+            if f.endswith(('.mid', '.midi'))))
+
+    @property
+    def synthetic_dir(self):
+        return self._get('synthetic_dir', self._make_synthetic)
+
+    def _make_synthetic(self):
+        """Corpus escalado: scale copias transpuestas (contenido distinto) de cada archivo"""
+        import pretty_midi
+        out_dir = os.path.join(self.work_dir, f'midi_x{self.args.scale}')
+        os.makedirs(out_dir)
+        for path in self.midi_files:
+            base = os.path.splitext(os.path.basename(path))[0]
+            for copy in range(self.args.scale):
+                pm = pretty_midi.PrettyMIDI(path)
+                for instrument in pm.instruments:
+                    for note in instrument.notes:
+                        note.pitch = min(127, max(0, note.pitch + copy % 12 - 6))
+                pm.write(os.path.join(out_dir, f'{base}_{copy}.mid'))
+        return out_dir
+
+    @property
+    def corpus_dir(self):
+        def build():
+            from src.data_processing.midi_processor import preprocess_dataset
+            corpus_dir = os.path.join(self.work_dir, 'processed')
+            preprocess_dataset(self.midi_dir, corpus_dir)
+            return corpus_dir
+        return self._get('corpus_dir', build)
+
+    @property
+    def scaled_corpus_dir(self):
+        def build():
+            from src.data_processing.midi_processor import preprocess_dataset
+            corpus_dir = os.path.join(self.work_dir, 'processed_scaled')
+            preprocess_dataset(self.synthetic_dir, corpus_dir, self.args.seq_length, dedup_mismatches=None)
+            return corpus_dir
+        return self._get('scaled_corpus_dir', build)
+
+    @property
+    def windows(self):
+        def build():
+            from src.data_processing.note_corpus import NoteCorpus
+            from src.data_processing.windowing import WindowIndex
+            return WindowIndex(NoteCorpus(self.corpus_dir), self.args.seq_length)
+        return self._get('windows', build)
+
+    def model(self, name):
+        def build():
+            from src.models.model_trainer import build_model
+            return build_model(name, (self.args.seq_length - 1, 1))
+        return self._get(f'model_{name}', build)
+
+@benchmark('midi_to_notes', 'notes/s')
+def bench_midi_to_notes(fx):
+    from src.data_processing.midi_processor import midi_to_notes
+    notes = 0
+    start = time.perf_counter()
+    for path in fx.midi_files:
+        notes += len(midi_to_notes(path, fx.args.seq_length)['pitch']) + fx.args.seq_length - 1
+    return notes / (time.perf_counter() - start), {'files': len(fx.midi_files)}
+
+def _preprocess(midi_dir, fx, use_cache, name):
+    from src.data_processing.midi_processor import preprocess_dataset
+    output_dir = os.path.join(fx.work_dir, name)
+    if not use_cache:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    elif not os.path.exists(output_dir):
+        preprocess_dataset(midi_dir, output_dir)
+    seconds, _ = timed(preprocess_dataset, midi_dir, output_dir, fx.args.seq_length, use_cache=use_cache)
+    return seconds
+
+@benchmark('preprocess_dataset_cold', 's', higher_is_better=False)
+def bench_preprocess_cold(fx):
+    return _preprocess(fx.midi_dir, fx, False, 'pre_cold'), {'files': len(fx.midi_files)}
+
+@benchmark('preprocess_dataset_warm', 's', higher_is_better=False, tolerance=0.25)
+def bench_preprocess_warm(fx):
+    return _preprocess(fx.midi_dir, fx, True, 'pre_warm'), {'files': len(fx.midi_files)}
+
+@benchmark('preprocess_dataset_scaled_cold', 's', higher_is_better=False)
+def bench_preprocess_scaled(fx):
+    return (_preprocess(fx.synthetic_dir, fx, False, 'pre_scaled'),
+            {'files': len(fx.midi_files) * fx.args.scale, 'scale': fx.args.scale})
+
+@benchmark('prepare_data', 'windows/s')
+def bench_prepare_data(fx):
+    from src.data_processing.note_corpus import NoteCorpus
+    from src.models.model_trainer import prepare_data
+    seconds, (X, _) = timed(prepare_data, NoteCorpus(fx.corpus_dir), fx.args.seq_length)
+    return len(X) / seconds, {'windows': len(X)}
+
+def _train_steps(fx, name):
+    from src.models.input_pipeline import make_dataset, split_windows
+    model = fx.model(name)
+    train_range, _ = split_windows(len(fx.windows))
+    dataset = make_dataset(fx.windows, train_range, fx.args.batch_size, seed=0).repeat()
+    model.fit(dataset, epochs=1, steps_per_epoch=2, verbose=0)
+    seconds, _ = timed(model.fit, dataset, epochs=1, steps_per_epoch=fx.args.train_steps, verbose=0)
+    return fx.args.train_steps / seconds, {'batch_size': fx.args.batch_size}
+
+@benchmark('piano_roll_windows', 'windows/s')
+def bench_piano_roll_windows(fx):
+    import numpy as np
+    from src.data_processing.note_corpus import NoteCorpus
+    from src.data_processing.windowing import RollWindowIndex
+    windows = RollWindowIndex(NoteCorpus(fx.corpus_dir), fx.args.seq_length)
+    batches = np.random.default_rng(0).integers(0, len(windows), (fx.args.train_steps, fx.args.batch_size))
+    start = time.perf_counter()
+    for indices in batches:
+        windows.gather('velocity', indices)
+    seconds = time.perf_counter() - start
+    return batches.size / seconds, {'batch_size': fx.args.batch_size, 'frames': fx.args.seq_length,
+                                    'fs': windows.corpus.piano_roll.fs}
+
+@benchmark('dedup_index', 'windows/s')
+def bench_dedup_index(fx):
+    from src.data_processing.dedup import DEFAULT_MAX_MISMATCHES, build_dedup_index
+    from src.data_processing.note_corpus import NoteCorpus
+    from src.data_processing.windowing import WindowIndex
+    windows = WindowIndex(NoteCorpus(fx.scaled_corpus_dir), fx.args.seq_length)
+    seconds, index = timed(build_dedup_index, windows, DEFAULT_MAX_MISMATCHES)
+    return len(windows) / seconds, {'windows': len(windows), 'dedup_ratio': round(index.ratio, 4),
+                                    'max_mismatches': DEFAULT_MAX_MISMATCHES}
+
+@benchmark('train_steps_cnn', 'steps/s', tolerance=0.15)
+def bench_train_cnn(fx):
+    return _train_steps(fx, 'CNN')
+
+@benchmark('train_steps_transformer', 'steps/s', tolerance=0.15)
+def bench_train_transformer(fx):
+    return _train_steps(fx, 'Transformer')
+
+def _generate_melody(fx):
+    """
+    generate_melody de la GUI; si PySimpleGUI no está instalado, el mismo camino sin la GUI
+
+    En ambos casos el motor (y su tf.function) se crea una sola vez por modelo,
+    así que la llamada de calentamiento deja la traza hecha.
+    """
+    try:
+        from src.interface.gui import generate_melody
+        return generate_melody, 'interface.gui.generate_melody'
+    except ImportError:
+        from src.models.generation import GenerationEngine, prepare_seed
+        from src.models.sampling import generate_takes
+        from src.utils.music_utils import parse_music_input
+
+        def generate_melody(model, seed_notes, length):
+            engine = fx._get('engine_CNN', lambda: GenerationEngine(model))
+            seed = prepare_seed(parse_music_input(seed_notes), engine.window)
+            return generate_takes(engine, seed[None], length)[0][0].tolist()
+        return generate_melody, 'models.sampling.generate_takes'
+
+@benchmark('generate_melody_per_note', 'ms/note', higher_is_better=False, tolerance=0.15)
+def bench_generate(fx):
+    generate_melody, target = _generate_melody(fx)
+    model = fx.model('CNN')
+    generate_melody(model, "C4, E4, G4", 4)
+    length = fx.args.generate_length
+    seconds, _ = timed(generate_melody, model, "C4, E4, G4", length)
+    return seconds / length * 1000, {'length': length, 'target': target}
+
+@benchmark('render_audio', 's', higher_is_better=False)
+def bench_render(fx):
+    import numpy as np
+    from src.utils.audio_utils import generate_audio_from_predictions
+    notes = list(np.random.default_rng(0).integers(48, 84, fx.args.render_notes))
+    output_dir = os.path.join(fx.work_dir, 'audio')
+    seconds, path = timed(generate_audio_from_predictions, notes, output_dir=output_dir,
+                          format='wav', use_cache=False)
+    os.remove(path)
+    return seconds, {'notes': fx.args.render_notes, 'format': 'wav'}
+
+@benchmark('render_audio_cached', 'ms', higher_is_better=False, tolerance=0.5)
+def bench_render_cached(fx):
+    import numpy as np
+    from src.utils.render_cache import CACHE_ENV_VAR
+    from src.utils.audio_utils import generate_audio_from_predictions
+    # Caché propia de la ejecución para no depender de la del usuario
+    os.environ[CACHE_ENV_VAR] = os.path.join(fx.work_dir, 'render_cache')
+    notes = list(np.random.default_rng(0).integers(48, 84, fx.args.render_notes))
+    output_dir = os.path.join(fx.work_dir, 'audio')
+    os.remove(generate_audio_from_predictions(notes, output_dir=output_dir, format='wav'))
+    seconds, path = timed(generate_audio_from_predictions, notes, output_dir=output_dir, format='wav')
+    os.remove(path)
+    return seconds * 1000, {'notes': fx.args.render_notes, 'format': 'wav'}
+
+def _melody_to_audio(fx, streaming):
+    """
+    Genera --generate-length notas con el CNN y las lleva a un WAV
+
+    Returns:
+        (segundos hasta la primera muestra escrita, segundos totales)
+    """
+    from src.models.generation import GenerationEngine, prepare_seed, stream_notes
+    from src.utils.audio_stream import stream_to_wav
+    from src.utils.audio_utils import generate_audio_from_predictions
+    engine = fx._get('engine_CNN', lambda: GenerationEngine(fx.model('CNN')))
+    seed = [60, 64, 67]
+    engine.generate(prepare_seed(seed, engine.window)[None], 2)  # traza de tf.function
+    length = fx.args.generate_length
+    output_dir = os.path.join(fx.work_dir, 'audio')
+    first = []
+
+    start = time.perf_counter()
+    if streaming:
+        def on_chunk(chunk, samples_written):
+            if not first:
+                first.append(time.perf_counter() - start)
+        path = stream_to_wav(stream_notes(engine, seed, length), os.path.join(output_dir, 'stream.wav'),
+                             on_chunk=on_chunk)
+    else:
+        notes = engine.generate(prepare_seed(seed, engine.window)[None], length)[0].tolist()
+        path = generate_audio_from_predictions(notes, output_dir=output_dir, format='wav', use_cache=False)
+    total = time.perf_counter() - start
+    os.remove(path)
+    # Sin streaming no hay audio hasta que el archivo está completo
+    return (first[0] if first else total), total
+
+@benchmark('melody_to_audio_batch', 's', higher_is_better=False, tolerance=0.15)
+def bench_melody_batch(fx):
+    _, total = _melody_to_audio(fx, streaming=False)
+    return total, {'length': fx.args.generate_length}
+
+@benchmark('melody_to_audio_stream_total', 's', higher_is_better=False, tolerance=0.15)
+def bench_melody_stream_total(fx):
+    first, total = _melody_to_audio(fx, streaming=True)
+    return total, {'length': fx.args.generate_length, 'first_sample_ms': first * 1000}
+
+@benchmark('melody_to_audio_stream_first_sample', 'ms', higher_is_better=False, tolerance=0.5)
+def bench_melody_stream_first(fx):
+    first, total = _melody_to_audio(fx, streaming=True)
+    return first * 1000, {'length': fx.args.generate_length, 'total_s': total}
+
+def environment():
+    """Metadatos de la ejecución para interpretar las comparaciones"""
+    import numpy as np
+    meta = {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        meta['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                        capture_output=True, text=True).stdout.strip()
+    except OSError:
+        pass
+    return meta
+
+def run(args):
+    selected = [name for name in BENCHMARKS if not args.only or re.search(args.only, name)]
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        fx = Fixtures(args, work_dir)
+        for name in selected:
+            func, unit, higher_is_better, tolerance = BENCHMARKS[name]
+            samples, extra = [], {}
+            try:
+                for _ in range(args.repeats):
+                    value, extra = func(fx)
+                    samples.append(value)
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"{name:<32} error: {e}")
+                continue
+            value = statistics.median(samples)
+            results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better,
+                             'tolerance': tolerance, 'samples': samples, 'extra': extra}
+            print(f"{name:<32} {value:14.4f} {unit}")
+
+    report = {'version': RESULTS_VERSION, 'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def compare(baseline, current, threshold=None):
+    """
+    Compara dos ejecuciones
+
+    Args:
+        baseline: Resultados de referencia
+        current: Resultados nuevos
+        threshold: Empeoramiento relativo tolerado para todas las métricas; si
+            es None, la tolerancia propia de cada benchmark o DEFAULT_THRESHOLD
+
+    Returns:
+        Lista de (nombre, valor base, valor actual, cambio, relativo, estado);
+        el cambio es positivo cuando la métrica mejora. Si el valor base es 0
+        el cambio es la diferencia absoluta (relativo=False) y cualquier
+        diferencia supera la tolerancia.
+    """
+    rows = []
+    for name, base in baseline['results'].items():
+        new = current['results'].get(name)
+        if 'value' not in base or not new or 'value' not in new:
+            rows.append((name, base.get('value'), (new or {}).get('value'), None, True, 'sin datos'))
+            continue
+        relative = base['value'] != 0
+        change = new['value'] - base['value']
+        if relative:
+            change /= abs(base['value'])
+        if not base['higher_is_better']:
+            change = -change
+        if threshold is not None:
+            tolerance = threshold
+        else:
+            tolerance = base.get('tolerance') or DEFAULT_THRESHOLD
+        if not relative:
+            tolerance = 0.0
+        status = 'regresión' if change < -tolerance else ('mejora' if change > tolerance else 'ok')
+        rows.append((name, base['value'], new['value'], change, relative, status))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline completo")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Ejecutar los benchmarks")
+    run_parser.add_argument("--output", default=None, help="Guardar resultados en JSON")
+    run_parser.add_argument("--only", default=None, help="Regex de los benchmarks a ejecutar")
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--midi-dir", default=os.path.join(ROOT_DIR, 'data', 'midi'))
+    run_parser.add_argument("--scale", type=int, default=4, help="Copias por archivo del corpus sintético")
+    run_parser.add_argument("--seq-length", type=int, default=100)
+    run_parser.add_argument("--batch-size", type=int, default=64)
+    run_parser.add_argument("--train-steps", type=int, default=20)
+    run_parser.add_argument("--generate-length", type=int, default=64)
+    run_parser.add_argument("--render-notes", type=int, default=64)
+
+    compare_parser = commands.add_parser('compare', help="Comparar con una ejecución anterior")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=None,
+                                help="Empeoramiento relativo tolerado (0.1 = 10%%) para todas las "
+                                     "métricas; si se omite, la tolerancia propia de cada benchmark "
+                                     f"o el {DEFAULT_THRESHOLD * 100:.0f}%%")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    for name, base, new, change, relative, status in rows:
+        if change is None:
+            print(f"{name:<32} {status}")
+        else:
+            delta = f"{change:+7.1%}" if relative else f"{change:+.4f} (absoluto)"
+            print(f"{name:<32} {base:12.4f} -> {new:12.4f}  {delta}  {status}")
+    return 1 if any(row[-1] == 'regresión' for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
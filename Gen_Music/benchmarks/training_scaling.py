@@ -0,0 +1,99 @@
+"""
+Benchmark de escalado del entrenamiento distribuido
+
+Entrena el CNN durante unos pasos con 1, 2, 4 y 8 réplicas de
+MirroredStrategy sobre el corpus de data/midi y mide muestras por segundo.
+Cada configuración se ejecuta en un proceso nuevo, porque los dispositivos
+lógicos de CPU solo se pueden configurar antes de inicializar TensorFlow.
+
+Uso (desde Gen_Music): python benchmarks/training_scaling.py --workers 1 2 4 8
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD_TEMPLATE = """
+import json, time
+from src.models.distributed import make_strategy, configure_mixed_precision
+strategy = make_strategy({workers})
+configure_mixed_precision({mixed_precision!r})
+from src.data_processing.note_corpus import NoteCorpus
+from src.data_processing.windowing import WindowIndex
+from src.models.input_pipeline import make_dataset, split_windows
+from src.models.model_trainer import build_model
+
+windows = WindowIndex(NoteCorpus({corpus_dir!r}), {seq_length})
+global_batch = {batch_size} * strategy.num_replicas_in_sync
+train_range, _ = split_windows(len(windows))
+dataset = make_dataset(windows, train_range, global_batch, seed=0).repeat()
+with strategy.scope():
+    model = build_model('CNN', ({seq_length} - 1, 1))
+model.fit(dataset, epochs=1, steps_per_epoch={warmup_steps}, verbose=0)
+start = time.perf_counter()
+model.fit(dataset, epochs=1, steps_per_epoch={steps}, verbose=0)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'replicas': strategy.num_replicas_in_sync, 'seconds': elapsed,
+                  'samples_per_sec': {steps} * global_batch / elapsed}}))
+"""
+
+def ensure_corpus(midi_dir, corpus_dir):
+    """Preprocesa data/midi si todavía no hay corpus"""
+    if not os.path.exists(os.path.join(corpus_dir, 'corpus.json')):
+        sys.path.insert(0, ROOT_DIR)
+        from src.data_processing.midi_processor import preprocess_dataset
+        preprocess_dataset(midi_dir, corpus_dir)
+
+def run_config(workers, args):
+    """Ejecuta una configuración en un proceso nuevo y devuelve su resultado"""
+    code = CHILD_TEMPLATE.format(workers=workers, mixed_precision=args.mixed_precision,
+                                 corpus_dir=args.corpus_dir, seq_length=args.seq_length,
+                                 batch_size=args.batch_size, warmup_steps=args.warmup_steps,
+                                 steps=args.steps)
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escalado del entrenamiento")
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument("--midi-dir", default=os.path.join(ROOT_DIR, 'data', 'midi'))
+    parser.add_argument("--corpus-dir", default=None,
+                        help="Corpus ya preprocesado (por defecto se crea uno temporal)")
+    parser.add_argument("--seq-length", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=64, help="Lote por réplica")
+    parser.add_argument("--warmup-steps", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--mixed-precision", choices=['auto', 'on', 'off'], default='off')
+    parser.add_argument("--output", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args.corpus_dir = os.path.abspath(args.corpus_dir or os.path.join(tmp_dir, 'processed'))
+        ensure_corpus(args.midi_dir, args.corpus_dir)
+
+        print(f"Núcleos disponibles: {os.cpu_count()}")
+        results = {}
+        baseline = None
+        for workers in args.workers:
+            entry = run_config(workers, args)
+            results[str(workers)] = entry
+            if 'error' in entry:
+                print(f"{workers} workers: no disponible ({entry['error']})")
+                continue
+            baseline = baseline or entry['samples_per_sec']
+            entry['speedup'] = entry['samples_per_sec'] / baseline
+            print(f"{workers} workers: {entry['samples_per_sec']:9.1f} muestras/s "
+                  f"(x{entry['speedup']:.2f})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
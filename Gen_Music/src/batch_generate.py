@@ -0,0 +1,212 @@
+"""
+Generación por lotes sin interfaz gráfica
+
+Lee un manifiesto (JSON o JSONL) con trabajos de la forma
+    {"id": "j1", "seed": "C4, E4, G4", "model": "CNN", "length": 32,
+     "instrument": "piano", "takes": 2, "strategy": "sample", "temperature": 0.9}
+genera las melodías por lotes en el modelo, renderiza el audio en un pool de
+procesos y mantiene un índice results.json que permite reanudar tras un fallo.
+
+Uso: python batch_generate.py manifiesto.jsonl --output-dir batch_output
+"""
+import os
+import json
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.audio_utils import generate_audio_from_predictions
+from utils.music_utils import parse_music_input
+from models.registry import MODEL_FILES, model_name
+
+RESULTS_FILE = 'results.json'
+# Clave del manifiesto -> parámetro de models.sampling.generate_takes
+# ("seed" en el manifiesto es la semilla musical, no la del generador aleatorio)
+SAMPLING_KEYS = {
+    'strategy': 'strategy',
+    'temperature': 'temperature',
+    'top_k': 'top_k',
+    'top_p': 'top_p',
+    'beam_width': 'beam_width',
+    'random_seed': 'seed'
+}
+JOB_DEFAULTS = {
+    'model': 'CNN',
+    'length': 16,
+    'instrument': 'piano',
+    'takes': 1,
+    'format': 'mp3',
+    'tempo': 120,
+    'note_duration': 0.5
+}
+
+def load_manifest(manifest_path):
+    """Carga los trabajos de un manifiesto JSON (lista) o JSONL (uno por línea)"""
+    with open(manifest_path) as f:
+        if manifest_path.endswith('.jsonl'):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+    
+    jobs = []
+    for i, entry in enumerate(entries):
+        job = dict(JOB_DEFAULTS, **entry)
+        job.setdefault('id', f"job-{i:06d}")
+        if job['model'] not in MODEL_FILES:
+            raise ValueError(f"Modelo desconocido en {job['id']}: {job['model']}")
+        jobs.append(job)
+    return jobs
+
+def load_results(output_dir):
+    """Índice de resultados ya completados (vacío si no existe)"""
+    path = os.path.join(output_dir, RESULTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_results(output_dir, results):
+    """Reescribe el índice de forma atómica para que un fallo nunca lo deje corrupto"""
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, RESULTS_FILE))
+
+def render_job(job, take, predictions, output_dir):
+    """Tarea del pool de procesos: renderiza una toma con un nombre estable"""
+    return generate_audio_from_predictions(
+        predictions,
+        instrument_type=job['instrument'],
+        tempo=job['tempo'],
+        note_duration=job['note_duration'],
+        format=job['format'],
+        output_path=os.path.join(output_dir, f"{job['id']}_take{take}.{job['format']}")
+    )
+
+def harvest_renders(futures, results, output_dir, wait=False):
+    """
+    Recoge los renders terminados y guarda el índice cada vez que un trabajo acaba
+
+    Args:
+        futures: Future -> (id del trabajo, toma); se retiran los recogidos
+        results: Índice de resultados (se actualiza)
+        output_dir: Directorio de results.json
+        wait: Esperar a todos los pendientes (si no, solo los ya terminados)
+    """
+    finished = as_completed(list(futures)) if wait else [f for f in list(futures) if f.done()]
+    for future in finished:
+        job_id, take = futures.pop(future)
+        entry = results[job_id]
+        try:
+            entry['outputs'][take] = future.result()
+        except Exception as e:
+            entry['status'] = 'error'
+            entry['error'] = str(e)
+            save_results(output_dir, results)
+        if entry['status'] == 'rendering' and all(entry['outputs']):
+            entry['status'] = 'ok'
+            save_results(output_dir, results)
+
+def group_jobs(jobs, batch_size):
+    """Agrupa trabajos compatibles (mismo modelo, longitud, tomas y muestreo) en lotes"""
+    groups = {}
+    for job in jobs:
+        key = (job['model'], job['length'], job['takes']) + tuple(job.get(k) for k in SAMPLING_KEYS)
+        groups.setdefault(key, []).append(job)
+    for group in groups.values():
+        for i in range(0, len(group), batch_size):
+            yield group[i:i + batch_size]
+
+def run_batch(manifest_path, output_dir="batch_output", models_dir="models",
+              batch_size=64, workers=None):
+    """
+    Ejecuta todos los trabajos pendientes de un manifiesto
+    
+    Args:
+        manifest_path: Ruta al manifiesto JSON/JSONL
+        output_dir: Directorio de salida (audio y results.json)
+        models_dir: Directorio con los modelos entrenados
+        batch_size: Semillas generadas a la vez en el modelo
+        workers: Procesos de renderizado (None para usar todos los núcleos)
+        
+    Returns:
+        Índice de resultados actualizado
+    """
+    # Importación diferida: los procesos de renderizado no necesitan TensorFlow
+    import numpy as np
+    from models.export import load_model
+    from models.generation import GenerationEngine, prepare_seed
+    from models.sampling import generate_takes
+    
+    os.makedirs(output_dir, exist_ok=True)
+    results = load_results(output_dir)
+    jobs = load_manifest(manifest_path)
+    pending = [job for job in jobs if results.get(job['id'], {}).get('status') != 'ok']
+    print(f"Trabajos: {len(jobs)} ({len(jobs) - len(pending)} ya completados, {len(pending)} pendientes)")
+    if not pending:
+        return results
+    
+    engines = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as executor:
+        futures = {}
+        for batch in group_jobs(pending, batch_size):
+            first = batch[0]
+            if first['model'] not in engines:
+                # Usa la exportación TFLite (<nombre>.tflite) si existe
+                model = load_model(models_dir, model_name(first['model']))
+                engines[first['model']] = GenerationEngine(model)
+            engine = engines[first['model']]
+            
+            valid = []
+            for job in batch:
+                try:
+                    valid.append((job, prepare_seed(parse_music_input(job['seed']), engine.window)))
+                except ValueError as e:
+                    results[job['id']] = {'status': 'error', 'error': str(e)}
+            if len(valid) < len(batch):
+                save_results(output_dir, results)
+            if not valid:
+                continue
+            
+            sampling = {param: first[key] for key, param in SAMPLING_KEYS.items()
+                        if first.get(key) is not None}
+            try:
+                takes = generate_takes(engine, np.stack([seed for _, seed in valid]),
+                                       first['length'], first['takes'], **sampling)
+            except Exception as e:
+                for job, _ in valid:
+                    results[job['id']] = {'status': 'error', 'error': str(e)}
+                save_results(output_dir, results)
+                continue
+            
+            # El renderizado se solapa con la generación del siguiente lote
+            for (job, _), job_takes in zip(valid, takes):
+                results[job['id']] = {'status': 'rendering', 'outputs': [None] * len(job_takes),
+                                      'predictions': job_takes.tolist()}
+                for take, predictions in enumerate(job_takes.tolist()):
+                    future = executor.submit(render_job, job, take, predictions, output_dir)
+                    futures[future] = (job['id'], take)
+            # Lo ya renderizado queda en el índice aunque la generación falle después
+            harvest_renders(futures, results, output_dir)
+        
+        harvest_renders(futures, results, output_dir, wait=True)
+    
+    save_results(output_dir, results)
+    done = sum(1 for job in jobs if results.get(job['id'], {}).get('status') == 'ok')
+    print(f"Completados {done}/{len(jobs)} trabajos. Índice: {os.path.join(output_dir, RESULTS_FILE)}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Generación de melodías por lotes sin interfaz")
+    parser.add_argument("manifest", help="Manifiesto JSON o JSONL con los trabajos")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    
+    run_batch(args.manifest, args.output_dir, args.models_dir, args.batch_size, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,51 @@ Módulo para procesamiento de datos musicales
 Contiene:
 - midi_processor: Conversión de archivos MIDI a formatos procesables
 - data_augmentation: Técnicas para aumentar el dataset
+- note_corpus: Corpus columnar de notas abierto con np.memmap
+- windowing: Ventanas deslizantes sin copia sobre el corpus
+- event_tokens: Vocabulario de eventos (altura, desplazamiento, velocidad, duración)
+- piano_roll: Piano roll disperso (CSR) de todos los instrumentos
+- dedup: Índice de ventanas duplicadas (invariante a la transposición)
+
+Los submódulos se importan de forma diferida (PEP 562): leer el corpus no
+carga pretty_midi.
 """
-from .midi_processor import midi_to_notes, preprocess_dataset
-from .data_augmentation import augment_sequence, transpose_sequence
+import importlib
+
+# Nombre exportado -> submódulo que lo define
+_EXPORTS = {
+    'midi_to_notes': 'midi_processor',
+    'midi_to_note_arrays': 'midi_processor',
+    'preprocess_dataset': 'midi_processor',
+    'NoteCorpus': 'note_corpus',
+    'write_corpus': 'note_corpus',
+    'WindowIndex': 'windowing',
+    'RollWindowIndex': 'windowing',
+    'SparsePianoRoll': 'piano_roll',
+    'DedupIndex': 'dedup',
+    'build_dedup_index': 'dedup',
+    'load_dedup_index': 'dedup',
+    'sliding_windows': 'windowing',
+    'augment_sequence': 'data_augmentation',
+    'transpose_sequence': 'data_augmentation',
+    'BatchAugmenter': 'data_augmentation',
+    'encode_notes': 'event_tokens',
+    'decode_tokens': 'event_tokens'
+}
+
+__all__ = ['midi_to_notes', 'midi_to_note_arrays', 'preprocess_dataset', 'NoteCorpus', 'write_corpus',
+           'WindowIndex', 'RollWindowIndex', 'SparsePianoRoll', 'sliding_windows',
+           'DedupIndex', 'build_dedup_index', 'load_dedup_index',
+           'augment_sequence', 'transpose_sequence', 'BatchAugmenter',
+           'encode_notes', 'decode_tokens']
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
 
-__all__ = ['midi_to_notes', 'preprocess_dataset', 'augment_sequence', 'transpose_sequence']
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
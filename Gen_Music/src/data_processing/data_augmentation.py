@@ -1,6 +1,136 @@
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
 import random
+import hashlib
+from .event_tokens import NUM_PITCHES, VELOCITY_OFFSET, VELOCITY_BINS
+
+# Parámetros de aumento compartidos por la versión por lotes y la de listas de notas
+TRANSPOSITIONS = (-3, -2, 2, 3)  # Evitamos transposiciones cromáticas
+TIME_SHIFT_RANGE = (-0.05, 0.05)
+VELOCITY_RANGE = (0.8, 1.2)
+AUGMENTATION_TYPES = ('transpose', 'time_shift', 'velocity_change')
+
+def transpose_pitches(pitch: np.ndarray, semitones) -> np.ndarray:
+    """
+    Transpone un array de alturas MIDI, limitando el resultado a 0-127
+
+    Args:
+        pitch: Alturas de forma (..., seq_length) o (seq_length,)
+        semitones: Semitonos, escalar o uno por fila (forma (lote,))
+
+    Returns:
+        Nuevo array con el mismo dtype que pitch
+    """
+    semitones = np.asarray(semitones, dtype=np.int16)
+    if semitones.ndim:
+        semitones = semitones[:, None]
+    return np.clip(pitch.astype(np.int16) + semitones, 0, 127).astype(pitch.dtype)
+
+def shift_times(times: np.ndarray, shift) -> np.ndarray:
+    """Desplaza tiempos (inicio o fin) en segundos; shift es escalar o uno por fila"""
+    shift = np.asarray(shift, dtype=np.float32)
+    if shift.ndim:
+        shift = shift[:, None]
+    return (times + shift).astype(times.dtype)
+
+def scale_velocities(velocity: np.ndarray, factor) -> np.ndarray:
+    """Escala velocidades MIDI, truncando y limitando el resultado a 1-127"""
+    factor = np.asarray(factor, dtype=np.float32)
+    if factor.ndim:
+        factor = factor[:, None]
+    return np.clip(velocity * factor, 1, 127).astype(velocity.dtype)
+
+def transpose_tokens(tokens: np.ndarray, semitones) -> np.ndarray:
+    """Transpone los tokens de altura (0-127) de un lote de tokens de eventos"""
+    is_pitch = tokens < NUM_PITCHES
+    return np.where(is_pitch, transpose_pitches(tokens, semitones), tokens).astype(tokens.dtype)
+
+def scale_velocity_tokens(tokens: np.ndarray, factor) -> np.ndarray:
+    """Escala los tokens de velocidad de un lote de tokens de eventos"""
+    is_velocity = (tokens >= VELOCITY_OFFSET) & (tokens < VELOCITY_OFFSET + VELOCITY_BINS)
+    factor = np.asarray(factor, dtype=np.float32)
+    if factor.ndim:
+        factor = factor[:, None]
+    # Se escala el centro de cada cubeta
+    buckets = np.floor((tokens.astype(np.float32) - VELOCITY_OFFSET + 0.5) * factor)
+    scaled = VELOCITY_OFFSET + np.clip(buckets, 0, VELOCITY_BINS - 1)
+    return np.where(is_velocity, scaled, tokens).astype(tokens.dtype)
+
+class BatchAugmenter:
+    """
+    Aumento de datos por lotes sobre ventanas de notas
+
+    Cada ventana del lote recibe una transposición (o ninguna), un
+    desplazamiento temporal y un factor de velocidad aleatorios. En los lotes
+    de tokens de eventos ('tokens') se transponen los tokens de altura y se
+    escalan los de velocidad; los tiempos son relativos y no se desplazan. No se guarda
+    ninguna copia aumentada del dataset: se aplica al materializar cada lote.
+
+    El generador aleatorio de cada lote se deriva de la semilla y de un hash
+    de todos sus índices, así que el resultado es reproducible y no depende
+    del orden en que tf.data ejecute los lotes en paralelo; como cada época
+    baraja de nuevo, una misma ventana recibe otro aumento en la siguiente.
+    """
+
+    def __init__(self, seed: int = None, augmentation_types: Sequence[str] = None,
+                 transpositions: Sequence[int] = TRANSPOSITIONS):
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.augmentation_types = tuple(augmentation_types or AUGMENTATION_TYPES)
+        # La transposición 0 conserva la ventana original
+        self.transpositions = np.array((0,) + tuple(transpositions), dtype=np.int16)
+
+    def rng(self, indices) -> np.random.Generator:
+        """Generador aleatorio de un lote a partir de sus índices de ventana"""
+        digest = hashlib.blake2b(np.ascontiguousarray(indices, dtype=np.int64).tobytes(), digest_size=16)
+        return np.random.default_rng([self.seed, *np.frombuffer(digest.digest(), dtype=np.uint32).tolist()])
+
+    def __call__(self, batch: Dict[str, np.ndarray], indices) -> Dict[str, np.ndarray]:
+        """
+        Aplica el aumento a un lote
+
+        Args:
+            batch: Campo -> array de forma (lote, seq_length); solo se
+                modifican los campos presentes
+            indices: Índices de ventana del lote
+
+        Returns:
+            Nuevo diccionario con los campos aumentados
+        """
+        rng = self.rng(indices)
+        size = len(next(iter(batch.values())))
+        augmented = dict(batch)
+
+        if 'transpose' in self.augmentation_types:
+            semitones = rng.choice(self.transpositions, size)
+            if 'pitch' in batch:
+                augmented['pitch'] = transpose_pitches(batch['pitch'], semitones)
+            if 'tokens' in batch:
+                augmented['tokens'] = transpose_tokens(batch['tokens'], semitones)
+
+        if 'time_shift' in self.augmentation_types and ('start' in batch or 'end' in batch):
+            shift = rng.uniform(*TIME_SHIFT_RANGE, size)
+            for field in ('start', 'end'):
+                if field in batch:
+                    augmented[field] = shift_times(batch[field], shift)
+
+        if 'velocity_change' in self.augmentation_types:
+            factor = rng.uniform(*VELOCITY_RANGE, size)
+            if 'velocity' in batch:
+                augmented['velocity'] = scale_velocities(batch['velocity'], factor)
+            if 'tokens' in batch:
+                augmented['tokens'] = scale_velocity_tokens(augmented['tokens'], factor)
+
+        return augmented
+
+def _sequence_to_arrays(sequence: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    fields = sequence[0].keys() if sequence else ('pitch', 'velocity', 'start', 'end')
+    return {field: np.array([note_data[field] for note_data in sequence])
+            for field in ('pitch', 'velocity', 'start', 'end') if field in fields}
+
+def _arrays_to_sequence(sequence: List[Dict[str, Any]], arrays: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    columns = {field: column.tolist() for field, column in arrays.items()}
+    return [dict(note_data, **{field: column[i] for field, column in columns.items()})
+            for i, note_data in enumerate(sequence)]
 
 def transpose_sequence(sequence: List[Dict[str, Any]], semitones: int) -> List[Dict[str, Any]]:
     """
@@ -13,18 +143,19 @@ def transpose_sequence(sequence: List[Dict[str, Any]], semitones: int) -> List[D
     Returns:
         Secuencia transpuesta
     """
-    transposed = []
-    for note_data in sequence:
-        new_note = note_data.copy()
-        new_note['pitch'] = max(0, min(127, note_data['pitch'] + semitones))
-        transposed.append(new_note)
-    return transposed
+    if not sequence:
+        return []
+    pitch = np.array([note_data['pitch'] for note_data in sequence], dtype=np.int16)
+    return _arrays_to_sequence(sequence, {'pitch': transpose_pitches(pitch, semitones)})
 
 def augment_sequence(sequence: List[Dict[str, Any]], 
                     augmentation_types: List[str] = None) -> List[List[Dict[str, Any]]]:
     """
     Aplica aumentos de datos a una secuencia musical
     
+    Para entrenar no se usa esta función (multiplica el dataset en memoria):
+    BatchAugmenter aplica los mismos aumentos lote a lote en el input pipeline.
+    
     Args:
         sequence: Secuencia original de notas
         augmentation_types: Tipos de aumento a aplicar (None para todos)
@@ -33,34 +164,29 @@ def augment_sequence(sequence: List[Dict[str, Any]],
         Lista de secuencias aumentadas (incluyendo la original)
     """
     if augmentation_types is None:
-        augmentation_types = ['transpose', 'time_shift', 'velocity_change']
+        augmentation_types = list(AUGMENTATION_TYPES)
     
     augmented_sequences = [sequence]
+    arrays = _sequence_to_arrays(sequence)
     
-    # Transposición (variaciones de tono)
+    # Transposición (variaciones de tono): las cuatro de una vez
     if 'transpose' in augmentation_types:
-        for semitones in [-3, -2, 2, 3]:  # Evitamos transposiciones cromáticas
-            augmented_sequences.append(transpose_sequence(sequence, semitones))
+        pitch = np.broadcast_to(arrays['pitch'].astype(np.int16), (len(TRANSPOSITIONS), len(sequence)))
+        for transposed in transpose_pitches(pitch, TRANSPOSITIONS):
+            augmented_sequences.append(_arrays_to_sequence(sequence, {'pitch': transposed}))
     
     # Cambios de tiempo (pequeñas variaciones rítmicas)
     if 'time_shift' in augmentation_types:
-        time_shift = random.uniform(-0.05, 0.05)
-        time_shifted = []
-        for note_data in sequence:
-            new_note = note_data.copy()
-            new_note['start'] += time_shift
-            new_note['end'] += time_shift
-            time_shifted.append(new_note)
-        augmented_sequences.append(time_shifted)
+        time_shift = random.uniform(*TIME_SHIFT_RANGE)
+        augmented_sequences.append(_arrays_to_sequence(sequence, {
+            'start': arrays['start'] + time_shift,
+            'end': arrays['end'] + time_shift
+        }))
     
     # Cambios de velocidad (dinámica)
     if 'velocity_change' in augmentation_types:
-        velocity_factor = random.uniform(0.8, 1.2)
-        velocity_changed = []
-        for note_data in sequence:
-            new_note = note_data.copy()
-            new_note['velocity'] = int(max(1, min(127, note_data['velocity'] * velocity_factor)))
-            velocity_changed.append(new_note)
-        augmented_sequences.append(velocity_changed)
+        velocity_factor = random.uniform(*VELOCITY_RANGE)
+        velocity = np.clip(arrays['velocity'] * velocity_factor, 1, 127).astype(int)
+        augmented_sequences.append(_arrays_to_sequence(sequence, {'velocity': velocity}))
     
-    return augmented_sequences
\ No newline at end of file
+    return augmented_sequences
@@ -0,0 +1,234 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from typing import Optional
+
+# Índice de ventanas duplicadas, invariante a la transposición: dos ventanas
+# son iguales si sus secuencias de intervalos (diferencias de altura) lo son.
+DEDUP_VERSION = 2
+DEDUP_DIR_NAME = 'dedup'
+DEFAULT_MAX_MISMATCHES = 2
+# Uso en el entrenamiento: no deduplicar, descartar duplicados o reducir su peso
+DEDUP_MODES = ('off', 'drop', 'weight')
+VERIFY_CHUNK = 65536
+FINGERPRINT_CHUNK = 1 << 24
+# Base del hash polinómico (impar: invertible módulo 2^64)
+HASH_BASE = 0x9E3779B97F4A7C15
+HASH_BASE_INV = pow(HASH_BASE, -1, 1 << 64)
+
+class DedupIndex:
+    """
+    Resultado de la deduplicación de un WindowIndex
+
+    duplicate_of[i] es -1 si la ventana i es la primera de su grupo (se
+    conserva) o el índice de la ventana anterior de la que es duplicado.
+    fingerprint identifica el corpus del que se construyó (ver
+    corpus_fingerprint).
+    """
+
+    def __init__(self, duplicate_of: np.ndarray, max_mismatches: int = 0, fingerprint: str = ''):
+        self.duplicate_of = duplicate_of
+        self.max_mismatches = max_mismatches
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.duplicate_of)
+
+    @property
+    def keep(self) -> np.ndarray:
+        """Máscara de las ventanas que se conservan al descartar duplicados"""
+        return self.duplicate_of < 0
+
+    @property
+    def num_duplicates(self) -> int:
+        return int(np.count_nonzero(self.duplicate_of >= 0))
+
+    @property
+    def ratio(self) -> float:
+        """Fracción de ventanas duplicadas"""
+        return self.num_duplicates / len(self) if len(self) else 0.0
+
+    def weights(self) -> np.ndarray:
+        """Peso por ventana para reducir en lugar de descartar: 1 / tamaño de su grupo"""
+        group = np.where(self.keep, np.arange(len(self)), self.duplicate_of)
+        return (1.0 / np.bincount(group, minlength=len(self))[group]).astype(np.float32)
+
+    def save(self, path: str) -> None:
+        """Escritura atómica: otro proceso (p. ej. train_models(parallel=True)) nunca ve un archivo a medias"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, duplicate_of=self.duplicate_of, max_mismatches=self.max_mismatches,
+                         fingerprint=self.fingerprint, version=DEDUP_VERSION)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'DedupIndex':
+        with np.load(path) as data:
+            if int(data['version']) != DEDUP_VERSION:
+                raise ValueError(f"Versión de índice de duplicados no soportada: {int(data['version'])}")
+            return cls(data['duplicate_of'], int(data['max_mismatches']), str(data['fingerprint']))
+
+def corpus_fingerprint(corpus, tokens: bool = False) -> str:
+    """
+    Hash de lo que leen las ventanas: la columna de alturas (o los tokens) y
+    los límites entre archivos
+
+    Returns:
+        Hash hexadecimal (sha256)
+    """
+    offsets, column = ((corpus.token_offsets, corpus.tokens) if tokens
+                       else (corpus.offsets, corpus.columns['pitch']))
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(offsets, dtype=np.int64).tobytes())
+    for start in range(0, len(column), FINGERPRINT_CHUNK):
+        digest.update(np.ascontiguousarray(column[start:start + FINGERPRINT_CHUNK]).tobytes())
+    return digest.hexdigest()
+
+def _hash_powers(length: int):
+    """Potencias de la base y de su inverso módulo 2^64 (el desbordamiento de uint64 hace el módulo)"""
+    powers = np.empty(length, dtype=np.uint64)
+    inverse = np.empty(length, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        powers[0] = inverse[0] = 1
+        np.cumprod(np.full(length - 1, HASH_BASE, dtype=np.uint64), out=powers[1:])
+        np.cumprod(np.full(length - 1, HASH_BASE_INV, dtype=np.uint64), out=inverse[1:])
+    return powers, inverse
+
+def _file_intervals(windows, index: int) -> np.ndarray:
+    start, end = windows.offsets[index], windows.offsets[index + 1]
+    return np.diff(windows.column('pitch')[start:end].astype(np.int16))
+
+def band_hashes(windows, offset: int, length: int, powers=None) -> np.ndarray:
+    """
+    Hash de Rabin-Karp de un tramo de intervalos de cada ventana
+
+    Con prefijos H[k] = sum(v_j * B^j) el hash del tramo [p, p + length) es
+    (H[p + length] - H[p]) * B^-p, así que todas las ventanas de un archivo se
+    calculan con una suma acumulada y sin bucles por ventana.
+
+    Args:
+        windows: WindowIndex de notas
+        offset: Primer intervalo del tramo dentro de la ventana
+        length: Número de intervalos del tramo
+        powers: Resultado de _hash_powers (se calcula si es None)
+
+    Returns:
+        Array uint64 con un hash por ventana
+    """
+    if powers is None:
+        powers = _hash_powers(int(np.diff(windows.offsets).max(initial=1)))
+    powers, inverse = powers
+    hashes = np.empty(len(windows), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for index in np.flatnonzero(windows.file_counts):
+            # Los intervalos van de -127 a 127; +128 los deja en 1..255 (nunca 0)
+            values = (_file_intervals(windows, index) + 128).astype(np.uint64)
+            prefix = np.zeros(len(values) + 1, dtype=np.uint64)
+            np.cumsum(values * powers[:len(values)], out=prefix[1:])
+            starts = np.arange(windows.file_counts[index]) * windows.stride + offset
+            hashes[windows.window_offsets[index]:windows.window_offsets[index + 1]] = \
+                (prefix[starts + length] - prefix[starts]) * inverse[starts]
+    return hashes
+
+def _window_intervals(windows, indices) -> np.ndarray:
+    return np.diff(windows.gather('pitch', indices).astype(np.int16), axis=1)
+
+def _verify(windows, candidates, representatives, max_mismatches: int) -> np.ndarray:
+    """Comprueba por lotes cuáles candidatas difieren de su representante en <= max_mismatches intervalos"""
+    matches = np.zeros(len(candidates), dtype=bool)
+    for start in range(0, len(candidates), VERIFY_CHUNK):
+        chunk = slice(start, start + VERIFY_CHUNK)
+        mismatches = np.count_nonzero(_window_intervals(windows, candidates[chunk])
+                                      != _window_intervals(windows, representatives[chunk]), axis=1)
+        matches[chunk] = mismatches <= max_mismatches
+    return matches
+
+def build_dedup_index(windows, max_mismatches: int = DEFAULT_MAX_MISMATCHES) -> DedupIndex:
+    """
+    Detecta ventanas duplicadas o casi duplicadas, salvo transposición
+
+    Cada ventana se divide en max_mismatches + 1 tramos de intervalos: si dos
+    ventanas difieren en como mucho max_mismatches intervalos, al menos un
+    tramo es idéntico (palomar). Por cada tramo se agrupan las ventanas por su
+    hash; cada una se compara con la primera de su grupo y, si se confirma,
+    se marca como duplicada de ella. Las colisiones de hash nunca producen
+    falsos duplicados porque todo se verifica. El coste es lineal en número
+    de ventanas (salvo la ordenación de los hashes) y la memoria es de unos
+    pocos arrays por ventana.
+
+    A diferencia de MinHash sobre conjuntos de n-gramas, la comparación es
+    posicional: dos ventanas consecutivas (desplazadas una nota) no cuentan
+    como duplicadas.
+
+    Args:
+        windows: WindowIndex de notas (no de tokens)
+        max_mismatches: Intervalos distintos tolerados (0 para duplicados exactos)
+
+    Returns:
+        DedupIndex con el representante de cada ventana duplicada
+    """
+    if windows.tokens:
+        raise ValueError("La deduplicación por intervalos requiere ventanas de notas")
+    num_intervals = windows.seq_length - 1
+    bands = min(max_mismatches + 1, num_intervals)
+    bounds = np.linspace(0, num_intervals, bands + 1).astype(np.int64)
+    powers = _hash_powers(int(np.diff(windows.offsets).max(initial=1)))
+
+    duplicate_of = np.full(len(windows), -1, dtype=np.int64)
+    for band in range(bands):
+        hashes = band_hashes(windows, bounds[band], bounds[band + 1] - bounds[band], powers)
+        _, first, group = np.unique(hashes, return_index=True, return_inverse=True)
+        representatives = first[group]
+        candidates = np.flatnonzero((representatives != np.arange(len(windows))) & (duplicate_of < 0))
+        if not len(candidates):
+            continue
+        matched = _verify(windows, candidates, representatives[candidates], max_mismatches)
+        duplicate_of[candidates[matched]] = representatives[candidates[matched]]
+
+    # Un representante puede ser a su vez duplicado (de otro tramo): apuntar a la raíz
+    while True:
+        parents = duplicate_of[duplicate_of >= 0]
+        chained = duplicate_of >= 0
+        chained[chained] = duplicate_of[parents] >= 0
+        if not chained.any():
+            break
+        duplicate_of[chained] = duplicate_of[duplicate_of[chained]]
+    return DedupIndex(duplicate_of, max_mismatches, corpus_fingerprint(windows.corpus))
+
+def dedup_cache_path(corpus_dir: str, windows, max_mismatches: int) -> str:
+    """Archivo del índice para una configuración de ventanas dentro del corpus"""
+    return os.path.join(corpus_dir, DEDUP_DIR_NAME,
+                        f"L{windows.seq_length}_s{windows.stride}_m{max_mismatches}.npz")
+
+def load_dedup_index(windows, max_mismatches: int = DEFAULT_MAX_MISMATCHES,
+                     corpus_dir: Optional[str] = None) -> DedupIndex:
+    """
+    Lee el índice guardado junto al corpus o lo construye (y lo guarda)
+
+    Solo se reconstruye si no existe o si el corpus cambió desde que se
+    guardó (su huella no coincide).
+
+    Args:
+        windows: WindowIndex de notas
+        max_mismatches: Ver build_dedup_index
+        corpus_dir: Directorio del corpus (por defecto el de windows.corpus)
+    """
+    corpus_dir = corpus_dir or windows.corpus.corpus_dir
+    path = dedup_cache_path(corpus_dir, windows, max_mismatches)
+    if os.path.exists(path):
+        try:
+            index = DedupIndex.load(path)
+            if len(index) == len(windows) and index.fingerprint == corpus_fingerprint(windows.corpus):
+                return index
+        except Exception as e:
+            print(f"Índice de duplicados inválido, se reconstruye: {e}")
+    index = build_dedup_index(windows, max_mismatches)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    index.save(path)
+    return index
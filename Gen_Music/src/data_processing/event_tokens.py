@@ -0,0 +1,121 @@
+import numpy as np
+from typing import Dict
+
+# Vocabulario de eventos: cada nota se codifica como
+#   [TIME_SHIFT...] [VELOCITY] PITCH DURATION
+# Los tokens de altura conservan el número MIDI (0-127), así que una secuencia
+# de solo alturas sigue siendo válida en este vocabulario.
+NUM_PITCHES = 128
+TIME_STEP = 0.01          # Resolución temporal en segundos
+NUM_TIME_SHIFTS = 100     # Desplazamientos de 1 a 100 pasos (10 ms - 1 s)
+VELOCITY_BINS = 32
+NUM_DURATIONS = 100       # Duraciones de 1 a 100 pasos (las más largas se recortan)
+
+PITCH_OFFSET = 0
+TIME_SHIFT_OFFSET = PITCH_OFFSET + NUM_PITCHES
+VELOCITY_OFFSET = TIME_SHIFT_OFFSET + NUM_TIME_SHIFTS
+DURATION_OFFSET = VELOCITY_OFFSET + VELOCITY_BINS
+VOCAB_SIZE = DURATION_OFFSET + NUM_DURATIONS
+TOKEN_DTYPE = np.uint16
+
+DEFAULT_VELOCITY = 100
+
+def token_settings() -> Dict[str, float]:
+    """Parámetros del vocabulario, guardados con el corpus"""
+    return {'time_step': TIME_STEP, 'num_time_shifts': NUM_TIME_SHIFTS,
+            'velocity_bins': VELOCITY_BINS, 'num_durations': NUM_DURATIONS,
+            'vocab_size': VOCAB_SIZE}
+
+def velocity_to_bucket(velocity: np.ndarray) -> np.ndarray:
+    """Cubeta (0 a VELOCITY_BINS - 1) de cada velocidad MIDI"""
+    return np.asarray(velocity, dtype=np.int64) * VELOCITY_BINS // 128
+
+def bucket_to_velocity(bucket: np.ndarray) -> np.ndarray:
+    """Velocidad MIDI central de cada cubeta"""
+    return (np.asarray(bucket, dtype=np.int64) * 128 + 64) // VELOCITY_BINS
+
+def encode_notes(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Codifica las notas de un archivo como tokens de eventos
+
+    Las notas se ordenan por inicio. Antes de cada nota se emiten los
+    desplazamientos temporales desde el inicio anterior (partidos en tokens de
+    como mucho NUM_TIME_SHIFTS pasos) y un token de velocidad solo si cambia
+    su cubeta.
+
+    Args:
+        arrays: Columnas pitch, velocity, start y end (ver note_corpus)
+
+    Returns:
+        Array uint16 de tokens
+    """
+    if len(arrays['pitch']) == 0:
+        return np.empty(0, dtype=TOKEN_DTYPE)
+
+    order = np.lexsort((arrays['pitch'], arrays['start']))
+    pitch = arrays['pitch'][order].astype(np.int64)
+    start = arrays['start'][order].astype(np.float64)
+    end = arrays['end'][order].astype(np.float64)
+
+    onsets = np.maximum(np.round(start / TIME_STEP).astype(np.int64), 0)
+    shifts = np.diff(onsets, prepend=0)
+    num_shifts = -(-shifts // NUM_TIME_SHIFTS)
+    buckets = velocity_to_bucket(arrays['velocity'][order])
+    velocity_changes = np.diff(buckets, prepend=-1) != 0
+    durations = np.clip(np.round((end - start) / TIME_STEP).astype(np.int64), 1, NUM_DURATIONS)
+
+    counts = num_shifts + velocity_changes + 2
+    note_starts = np.cumsum(counts) - counts
+    tokens = np.empty(int(counts.sum()), dtype=TOKEN_DTYPE)
+
+    # Desplazamientos: NUM_TIME_SHIFTS en todos los tokens del grupo salvo el último
+    total_shifts = int(num_shifts.sum())
+    if total_shifts:
+        group_starts = np.repeat(np.cumsum(num_shifts) - num_shifts, num_shifts)
+        within = np.arange(total_shifts) - group_starts
+        last = within == np.repeat(num_shifts, num_shifts) - 1
+        remainder = np.repeat(shifts - NUM_TIME_SHIFTS * (num_shifts - 1), num_shifts)
+        values = np.where(last, remainder, NUM_TIME_SHIFTS)
+        tokens[np.repeat(note_starts, num_shifts) + within] = TIME_SHIFT_OFFSET + values - 1
+
+    velocity_positions = note_starts + num_shifts
+    tokens[velocity_positions[velocity_changes]] = VELOCITY_OFFSET + buckets[velocity_changes]
+    pitch_positions = velocity_positions + velocity_changes
+    tokens[pitch_positions] = PITCH_OFFSET + pitch
+    tokens[pitch_positions + 1] = DURATION_OFFSET + durations - 1
+    return tokens
+
+def decode_tokens(tokens: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Reconstruye las notas de una secuencia de tokens
+
+    Admite secuencias generadas por un modelo: una altura sin token de
+    duración detrás dura un paso y antes del primer token de velocidad se usa
+    DEFAULT_VELOCITY.
+
+    Returns:
+        Columnas pitch, velocity, start y end
+    """
+    tokens = np.asarray(tokens, dtype=np.int64)
+    positions = np.arange(len(tokens))
+
+    is_shift = (tokens >= TIME_SHIFT_OFFSET) & (tokens < VELOCITY_OFFSET)
+    steps = np.cumsum(np.where(is_shift, tokens - TIME_SHIFT_OFFSET + 1, 0))
+
+    is_velocity = (tokens >= VELOCITY_OFFSET) & (tokens < DURATION_OFFSET)
+    last_velocity = np.maximum.accumulate(np.where(is_velocity, positions, -1)) if len(tokens) else positions
+    velocity = np.where(last_velocity >= 0,
+                        bucket_to_velocity(tokens[np.maximum(last_velocity, 0)] - VELOCITY_OFFSET),
+                        DEFAULT_VELOCITY)
+
+    pitch_positions = np.flatnonzero(tokens < TIME_SHIFT_OFFSET)
+    following = np.append(tokens, -1)[pitch_positions + 1]
+    durations = np.where(following >= DURATION_OFFSET, following - DURATION_OFFSET + 1, 1)
+
+    start = steps[pitch_positions] * TIME_STEP
+    return {
+        'pitch': tokens[pitch_positions].astype(np.uint8),
+        'velocity': velocity[pitch_positions].astype(np.uint8),
+        'start': start.astype(np.float32),
+        'end': (start + durations * TIME_STEP).astype(np.float32)
+    }
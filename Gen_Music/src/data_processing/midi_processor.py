@@ -1,43 +1,229 @@
 import pretty_midi
 import numpy as np
-from music21 import converter, instrument, note, chord
 import os
+import json
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from .note_corpus import NOTE_FIELDS, NoteCorpus, notes_to_arrays, write_corpus
+from .piano_roll import (DEFAULT_FRAME_RATE, INSTRUMENT_NOTE_FIELDS, PEDAL_THRESHOLD, ROLL_META,
+                         SparsePianoRoll, instrument_note_arrays, notes_to_piano_roll, write_piano_roll)
+from .windowing import WindowIndex, note_windows
+from .dedup import DEFAULT_MAX_MISMATCHES, load_dedup_index
+try:
+    from ..utils.profiling import span, count, profiled
+except ImportError:
+    # Importado como paquete de primer nivel (src en sys.path, p. ej. desde main.py)
+    from utils.profiling import span, count, profiled
 
-def midi_to_notes(midi_path, seq_length=100):
-    """Convierte un archivo MIDI a secuencias de notas para el modelo"""
+# Cambiar al modificar la extracción de notas para invalidar la caché
+PARSER_VERSION = 2
+# Prefijo en la caché de las columnas con las notas de todos los instrumentos
+ALL_INSTRUMENTS_PREFIX = 'all_'
+CACHE_DIR_NAME = 'cache'
+
+@profiled('preprocess.midi_to_note_arrays')
+def midi_to_note_arrays(midi_path):
+    """Extrae las notas de un archivo MIDI como columnas tipadas (pitch, velocity, start, end)"""
     pm = pretty_midi.PrettyMIDI(midi_path)
     instrument = pm.instruments[0]
-    notes = []
-    
-    for note in instrument.notes:
-        notes.append({
-            'pitch': note.pitch,
-            'start': note.start,
-            'end': note.end,
-            'velocity': note.velocity
-        })
-    
-    # Crear secuencias para entrenamiento
-    sequences = []
-    for i in range(len(notes) - seq_length):
-        seq = notes[i:i + seq_length]
-        sequences.append(seq)
-    
-    return sequences
+    return notes_to_arrays(instrument.notes)
 
-def preprocess_dataset(data_dir, output_dir, seq_length=100):
-    """Preprocesa todos los archivos MIDI en un directorio"""
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    all_sequences = []
-    for file in os.listdir(data_dir):
-        if file.endswith('.mid') or file.endswith('.midi'):
+@profiled('preprocess.midi_to_notes')
+def midi_to_notes(midi_path, seq_length=100, stride=1):
+    """
+    Convierte un archivo MIDI a secuencias de notas para el modelo
+
+    Devuelve, para cada campo, una vista de forma (num_ventanas, seq_length)
+    sobre las notas del archivo: cada nota se almacena una sola vez.
+    """
+    arrays = midi_to_note_arrays(midi_path)
+    return note_windows(arrays, seq_length, stride)
+
+@profiled('preprocess.midi_to_corpus_arrays')
+def midi_to_corpus_arrays(midi_path):
+    """
+    Extrae en una sola lectura lo que guarda el corpus de un archivo MIDI
+
+    Returns:
+        (notas del primer instrumento, notas de todos los instrumentos con su
+        programa; ver piano_roll.instrument_note_arrays)
+    """
+    pm = pretty_midi.PrettyMIDI(midi_path)
+    return notes_to_arrays(pm.instruments[0].notes), instrument_note_arrays(pm)
+
+def parser_settings():
+    """Parámetros de extracción que forman parte de la clave de caché"""
+    return {'version': PARSER_VERSION, 'instrument': 0,
+            'fields': {field: np.dtype(dtype).name for field, dtype in NOTE_FIELDS.items()},
+            'all_instruments': {field: np.dtype(dtype).name for field, dtype in INSTRUMENT_NOTE_FIELDS.items()},
+            'pedal_threshold': PEDAL_THRESHOLD}
+
+def file_cache_key(midi_path, settings=None):
+    """Clave de caché: hash del contenido del archivo más los parámetros de extracción"""
+    digest = hashlib.sha256()
+    with open(midi_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps(settings or parser_settings(), sort_keys=True).encode())
+    return digest.hexdigest()
+
+def _load_cached_arrays(cache_path):
+    with np.load(cache_path) as data:
+        return ({field: data[field] for field in NOTE_FIELDS},
+                {field: data[ALL_INSTRUMENTS_PREFIX + field] for field in INSTRUMENT_NOTE_FIELDS})
+
+def _save_cached_arrays(cache_path, arrays):
+    # Escritura atómica: otro proceso nunca ve un archivo a medias
+    cache_dir = os.path.dirname(cache_path)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _roll_cache_path(cache_path, frame_rate):
+    """Entrada de la caché con el piano roll de un archivo a un frame rate dado"""
+    if cache_path is None or not frame_rate:
+        return None
+    return f"{os.path.splitext(cache_path)[0]}_roll{frame_rate:g}.npz"
+
+def _file_piano_roll(all_arrays, roll_path, frame_rate):
+    """Piano roll de un archivo: de la caché o construido a partir de sus notas (y guardado)"""
+    if not frame_rate:
+        return None
+    if roll_path is not None and os.path.exists(roll_path):
+        try:
+            with np.load(roll_path) as data:
+                return SparsePianoRoll.from_arrays(data, frame_rate)
+        except Exception as e:
+            print(f"Caché de piano roll inválida, se reconstruye: {e}")
+    roll = notes_to_piano_roll(all_arrays, frame_rate)
+    if roll_path is not None:
+        _save_cached_arrays(roll_path, roll.arrays())
+    return roll
+
+def _parse_and_cache(midi_path, cache_path, frame_rate=None):
+    """Tarea del pool: extrae las notas (y el piano roll) de un archivo y los guarda en la caché"""
+    arrays, all_arrays = midi_to_corpus_arrays(midi_path)
+    if cache_path is not None:
+        _save_cached_arrays(cache_path, dict(arrays, **{ALL_INSTRUMENTS_PREFIX + field: column
+                                                        for field, column in all_arrays.items()}))
+    return arrays, all_arrays, _file_piano_roll(all_arrays, _roll_cache_path(cache_path, frame_rate), frame_rate)
+
+def _lookup_cache(data_dir, files, cache_dir, settings, results, pending, frame_rate=None):
+    """Carga de la caché los archivos ya analizados y añade el resto a pending"""
+    for file in files:
+        midi_path = os.path.join(data_dir, file)
+        cache_path = None
+        if cache_dir is not None:
+            cache_path = os.path.join(cache_dir, f"{file_cache_key(midi_path, settings)}.npz")
+            if os.path.exists(cache_path):
+                try:
+                    arrays, all_arrays = _load_cached_arrays(cache_path)
+                    roll = _file_piano_roll(all_arrays, _roll_cache_path(cache_path, frame_rate), frame_rate)
+                    results[file] = (arrays, all_arrays, roll)
+                    continue
+                except Exception as e:
+                    print(f"Caché inválida para {file}, se vuelve a procesar: {e}")
+        pending.append((file, midi_path, cache_path))
+
+def _parse_pending(pending, workers, results, frame_rate=None):
+    """Analiza los archivos pendientes, en paralelo si hay más de uno y más de un proceso"""
+    max_workers = workers or os.cpu_count() or 1
+    if max_workers == 1 or len(pending) == 1:
+        for file, midi_path, cache_path in pending:
             try:
-                sequences = midi_to_notes(os.path.join(data_dir, file), seq_length)
-                all_sequences.extend(sequences)
+                results[file] = _parse_and_cache(midi_path, cache_path, frame_rate)
             except Exception as e:
+                count('preprocess.errors')
                 print(f"Error procesando {file}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {
+                executor.submit(_parse_and_cache, midi_path, cache_path, frame_rate): file
+                for file, midi_path, cache_path in pending
+            }
+            for future, file in futures.items():
+                try:
+                    results[file] = future.result()
+                except Exception as e:
+                    count('preprocess.errors')
+                    print(f"Error procesando {file}: {e}")
+
+def preprocess_dataset(data_dir, output_dir, seq_length=100, workers=None, use_cache=True,
+                       frame_rate=DEFAULT_FRAME_RATE, dedup_mismatches=DEFAULT_MAX_MISMATCHES):
+    """
+    Preprocesa todos los archivos MIDI en un directorio
+
+    Guarda un corpus columnar (ver note_corpus) en lugar de las secuencias ya
+    cortadas; las ventanas de seq_length notas se leen después bajo demanda.
+    Los archivos se analizan en paralelo en un pool de procesos y sus notas se
+    guardan en una caché por hash de contenido, de modo que al volver a
+    ejecutar solo se analizan los archivos nuevos o modificados.
+    Junto al corpus se guarda el piano roll disperso de todos los instrumentos
+    (ver piano_roll); la caché guarda sus notas y el roll de cada frame rate
+    usado, así que cambiar frame_rate no vuelve a analizar ningún archivo.
+    Al final se construye, si el corpus cambió, el índice de ventanas
+    duplicadas de seq_length notas (ver dedup), que el entrenamiento reutiliza.
+    Con la instrumentación activa (utils.profiling) se miden la lectura de la
+    caché, el análisis en el pool (en conjunto: los procesos hijos no
+    registran spans) y la escritura del corpus.
+
+    Args:
+        data_dir: Directorio con archivos .mid/.midi
+        output_dir: Directorio de salida del corpus
+        seq_length: Longitud de secuencia prevista (las ventanas se generan al
+            entrenar; se usa para el índice de duplicados)
+        workers: Número de procesos (None para usar todos los núcleos)
+        use_cache: Reutilizar las notas ya extraídas de ejecuciones anteriores
+        frame_rate: Frames por segundo del piano roll (None para no generarlo)
+        dedup_mismatches: Intervalos distintos tolerados entre ventanas
+            duplicadas (None para no construir el índice)
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    cache_dir = os.path.join(output_dir, CACHE_DIR_NAME)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    files = [f for f in sorted(os.listdir(data_dir)) if f.endswith('.mid') or f.endswith('.midi')]
+    settings = parser_settings()
+
+    results = {}
+    pending = []
+    with span('preprocess.cache_lookup', files=len(files)):
+        _lookup_cache(data_dir, files, cache_dir if use_cache else None, settings, results, pending, frame_rate)
+    count('preprocess.cache_hits', len(results))
+    count('preprocess.cache_misses', len(pending))
+    
+    if pending:
+        with span('preprocess.parse', files=len(pending), workers=workers or os.cpu_count() or 1):
+            _parse_pending(pending, workers, results, frame_rate)
+    
+    print(f"Archivos MIDI: {len(files)} ({len(files) - len(pending)} desde caché, {len(pending)} analizados)")
+    
+    # Guardar corpus preprocesado (orden estable por nombre de archivo)
+    file_names = [file for file in files if file in results]
+    with span('preprocess.write_corpus', files=len(file_names)):
+        write_corpus(output_dir, file_names, [results[file][0] for file in file_names])
+    
+    roll_meta = os.path.join(output_dir, ROLL_META)
+    if frame_rate:
+        with span('preprocess.write_piano_roll', files=len(file_names)):
+            write_piano_roll(output_dir, [results[file][2] for file in file_names], frame_rate)
+    elif os.path.exists(roll_meta):
+        # Un piano roll de una ejecución anterior ya no corresponde al corpus
+        os.remove(roll_meta)
     
-    # Guardar secuencias preprocesadas
-    np.save(os.path.join(output_dir, 'sequences.npy'), np.array(all_sequences))
\ No newline at end of file
+    # Un índice de duplicados existente solo se reconstruye si el corpus cambió
+    if dedup_mismatches is not None:
+        windows = WindowIndex(NoteCorpus(output_dir), seq_length)
+        with span('preprocess.dedup', windows=len(windows)):
+            index = load_dedup_index(windows, dedup_mismatches, output_dir)
+        print(f"Ventanas duplicadas: {index.num_duplicates} de {len(index)} ({index.ratio:.1%})")
@@ -0,0 +1,172 @@
+import os
+import json
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from .event_tokens import TOKEN_DTYPE, encode_notes, token_settings
+
+# Formato columnar del corpus: un array tipado por campo más un índice de offsets,
+# y la codificación en tokens de eventos con su propio índice de offsets
+CORPUS_VERSION = 2
+CORPUS_META = 'corpus.json'
+OFFSETS_FILE = 'offsets.npy'
+TOKENS_FILE = 'tokens.npy'
+TOKEN_OFFSETS_FILE = 'token_offsets.npy'
+NOTE_FIELDS = {
+    'pitch': np.uint8,
+    'velocity': np.uint8,
+    'start': np.float32,
+    'end': np.float32
+}
+
+def empty_note_arrays() -> Dict[str, np.ndarray]:
+    """Devuelve un conjunto de columnas de notas vacío"""
+    return {field: np.empty(0, dtype=dtype) for field, dtype in NOTE_FIELDS.items()}
+
+def notes_to_arrays(notes) -> Dict[str, np.ndarray]:
+    """
+    Convierte una lista de notas de pretty_midi a columnas tipadas
+
+    Args:
+        notes: Iterable de objetos con atributos pitch, velocity, start y end
+
+    Returns:
+        Diccionario campo -> array numpy
+    """
+    notes = list(notes)
+    if not notes:
+        return empty_note_arrays()
+
+    return {
+        field: np.fromiter((getattr(n, field) for n in notes), dtype=dtype, count=len(notes))
+        for field, dtype in NOTE_FIELDS.items()
+    }
+
+def _concat_offsets(lengths: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(np.asarray(lengths, dtype=np.int64), out=offsets[1:])
+    return offsets
+
+def _write_column(path: str, dtype, chunks: Sequence[np.ndarray], offsets: np.ndarray) -> None:
+    """Escribe la concatenación de chunks directamente en el archivo, sin duplicarla en memoria"""
+    total = int(offsets[-1])
+    if total == 0:
+        np.save(path, np.empty(0, dtype=dtype))
+        return
+    column = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(total,))
+    for i, chunk in enumerate(chunks):
+        column[offsets[i]:offsets[i + 1]] = chunk
+    column.flush()
+    del column
+
+def write_corpus(output_dir: str, file_names: Sequence[str],
+                 note_arrays: Sequence[Dict[str, np.ndarray]]) -> None:
+    """
+    Escribe un corpus columnar en disco, junto con su codificación en tokens
+
+    Args:
+        output_dir: Directorio de salida
+        file_names: Nombre de cada archivo MIDI de origen
+        note_arrays: Columnas de notas de cada archivo (mismo orden que file_names)
+    """
+    if len(file_names) != len(note_arrays):
+        raise ValueError("file_names y note_arrays deben tener la misma longitud")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    offsets = _concat_offsets([len(arrays['pitch']) for arrays in note_arrays])
+    for field, dtype in NOTE_FIELDS.items():
+        _write_column(os.path.join(output_dir, f'{field}.npy'), dtype,
+                      [arrays[field] for arrays in note_arrays], offsets)
+    np.save(os.path.join(output_dir, OFFSETS_FILE), offsets)
+
+    tokens = [encode_notes(arrays) for arrays in note_arrays]
+    token_offsets = _concat_offsets([len(file_tokens) for file_tokens in tokens])
+    _write_column(os.path.join(output_dir, TOKENS_FILE), TOKEN_DTYPE, tokens, token_offsets)
+    np.save(os.path.join(output_dir, TOKEN_OFFSETS_FILE), token_offsets)
+
+    meta = {
+        'version': CORPUS_VERSION,
+        'num_notes': int(offsets[-1]),
+        'num_tokens': int(token_offsets[-1]),
+        'files': list(file_names),
+        'fields': {field: np.dtype(dtype).name for field, dtype in NOTE_FIELDS.items()},
+        'tokens': token_settings()
+    }
+    with open(os.path.join(output_dir, CORPUS_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+class NoteCorpus:
+    """Corpus de notas en formato columnar abierto con np.memmap"""
+
+    def __init__(self, corpus_dir: str, mmap_mode: str = 'r'):
+        meta_path = os.path.join(corpus_dir, CORPUS_META)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No se encontró un corpus en {corpus_dir}")
+
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != CORPUS_VERSION:
+            raise ValueError(f"Versión de corpus no soportada: {self.meta.get('version')} "
+                             f"(vuelve a ejecutar el preprocesado)")
+
+        self.corpus_dir = corpus_dir
+        self.mmap_mode = mmap_mode
+        self.files: List[str] = self.meta['files']
+        self.offsets = np.load(os.path.join(corpus_dir, OFFSETS_FILE))
+        self.columns = {
+            field: np.load(os.path.join(corpus_dir, f'{field}.npy'), mmap_mode=mmap_mode)
+            for field in NOTE_FIELDS
+        }
+        self.token_offsets = np.load(os.path.join(corpus_dir, TOKEN_OFFSETS_FILE))
+        self.tokens = np.load(os.path.join(corpus_dir, TOKENS_FILE), mmap_mode=mmap_mode)
+        self._piano_roll = None
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    @property
+    def num_notes(self) -> int:
+        return int(self.offsets[-1])
+
+    def file_lengths(self) -> np.ndarray:
+        """Número de notas de cada archivo"""
+        return np.diff(self.offsets)
+
+    @property
+    def piano_roll(self):
+        """Piano roll disperso de todos los instrumentos (None si el corpus no lo tiene)"""
+        if self._piano_roll is None:
+            # Importación diferida: piano_roll depende de este módulo
+            from .piano_roll import load_piano_roll
+            self._piano_roll = load_piano_roll(self.corpus_dir, self.mmap_mode) or (None, None)
+            if self._piano_roll[1] is not None and len(self._piano_roll[1]) != len(self.files) + 1:
+                raise ValueError("El piano roll no corresponde al corpus (vuelve a ejecutar el preprocesado)")
+        return self._piano_roll[0]
+
+    @property
+    def roll_offsets(self) -> Optional[np.ndarray]:
+        """Primer frame del piano roll de cada archivo"""
+        return self._piano_roll[1] if self.piano_roll is not None else None
+
+    def file_piano_roll(self, index: int):
+        """Piano roll de un archivo (las columnas son vistas sobre las del corpus)"""
+        if self.piano_roll is None:
+            raise ValueError("El corpus no tiene piano roll (vuelve a ejecutar el preprocesado)")
+        return self.piano_roll.slice(self.roll_offsets[index], self.roll_offsets[index + 1])
+
+    def file_tokens(self, index: int) -> np.ndarray:
+        """Tokens de eventos de un archivo como vista sobre la columna de tokens"""
+        return self.tokens[self.token_offsets[index]:self.token_offsets[index + 1]]
+
+    def file_notes(self, index: int) -> Dict[str, np.ndarray]:
+        """
+        Devuelve las notas de un archivo como vistas sobre las columnas
+
+        Args:
+            index: Índice del archivo en el corpus
+
+        Returns:
+            Diccionario campo -> vista numpy (sin copia)
+        """
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return {field: column[start:end] for field, column in self.columns.items()}
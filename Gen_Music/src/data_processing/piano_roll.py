@@ -0,0 +1,248 @@
+import os
+import json
+import numpy as np
+from typing import Dict, Optional, Sequence
+from .note_corpus import NOTE_FIELDS, empty_note_arrays, notes_to_arrays, _concat_offsets, _write_column
+
+# Piano roll disperso (CSR) de todos los instrumentos: una fila por frame y,
+# por cada celda activa, su altura, programa General MIDI y velocidad
+DEFAULT_FRAME_RATE = 100
+DRUM_PROGRAM = 128
+# Valor del controlador 64 a partir del cual el pedal de sostenido está pisado
+PEDAL_THRESHOLD = 64
+SUSTAIN_PEDAL_CC = 64
+ROLL_META = 'piano_roll.json'
+ROLL_OFFSETS_FILE = 'roll_offsets.npy'
+ROLL_INDPTR_FILE = 'roll_indptr.npy'
+ROLL_FIELDS = {
+    'pitch': np.uint8,
+    'program': np.uint8,
+    'velocity': np.uint8
+}
+# Columnas de las notas de todos los instrumentos (las de NOTE_FIELDS más el programa)
+INSTRUMENT_NOTE_FIELDS = dict(NOTE_FIELDS, program=np.uint8)
+
+def pedal_intervals(control_changes, threshold: int = PEDAL_THRESHOLD) -> np.ndarray:
+    """
+    Intervalos (pisado, soltado) en segundos del pedal de sostenido
+
+    Un pedal que sigue pisado al final del archivo no cuenta, como en
+    pretty_midi.Instrument.get_piano_roll.
+    """
+    intervals = []
+    pressed_at = None
+    for cc in sorted((cc for cc in control_changes if cc.number == SUSTAIN_PEDAL_CC), key=lambda cc: cc.time):
+        if cc.value >= threshold and pressed_at is None:
+            pressed_at = cc.time
+        elif cc.value < threshold and pressed_at is not None:
+            intervals.append((pressed_at, cc.time))
+            pressed_at = None
+    return np.array(intervals, dtype=np.float64).reshape(-1, 2)
+
+def apply_sustain(arrays: Dict[str, np.ndarray], intervals: np.ndarray) -> np.ndarray:
+    """
+    Fin sonoro de cada nota: las que suenan mientras el pedal está pisado se
+    prolongan hasta que se suelta
+
+    Equivale al sostenido de pretty_midi.get_piano_roll, salvo que el solape
+    con el pedal se decide con los tiempos exactos y no con frames.
+
+    Returns:
+        Nueva columna 'end' (float32)
+    """
+    end = arrays['end'].astype(np.float64)
+    if not len(intervals) or not len(end):
+        return arrays['end']
+    # Último intervalo que empieza antes del final de cada nota
+    k = np.searchsorted(intervals[:, 0], end, side='left') - 1
+    released = intervals[np.maximum(k, 0), 1]
+    sustained = (k >= 0) & (arrays['start'] < released)
+    return np.where(sustained, np.maximum(end, released), end).astype(np.float32)
+
+def instrument_note_arrays(pm, pedal_threshold: Optional[int] = PEDAL_THRESHOLD) -> Dict[str, np.ndarray]:
+    """
+    Columnas con las notas de todos los instrumentos de un PrettyMIDI
+
+    Args:
+        pm: Archivo ya cargado con pretty_midi
+        pedal_threshold: Umbral del pedal de sostenido; con él, 'end' es el fin
+            sonoro de la nota (ver apply_sustain). None para ignorar el pedal
+
+    Returns:
+        Columnas de NOTE_FIELDS más 'program' (DRUM_PROGRAM para percusión)
+    """
+    parts = []
+    for instrument in pm.instruments:
+        arrays = notes_to_arrays(instrument.notes)
+        if pedal_threshold is not None and not instrument.is_drum:
+            arrays['end'] = apply_sustain(arrays, pedal_intervals(instrument.control_changes, pedal_threshold))
+        program = DRUM_PROGRAM if instrument.is_drum else instrument.program
+        arrays['program'] = np.full(len(arrays['pitch']), program, dtype=np.uint8)
+        parts.append(arrays)
+    if not parts:
+        return dict(empty_note_arrays(), program=np.empty(0, dtype=np.uint8))
+    return {field: np.concatenate([part[field] for part in parts]) for field in INSTRUMENT_NOTE_FIELDS}
+
+class SparsePianoRoll:
+    """
+    Piano roll en formato CSR
+
+    indptr tiene una entrada por frame más una; las celdas activas del frame f
+    son pitch/program/velocity[indptr[f]:indptr[f + 1]], ordenadas por
+    (programa, altura). Solo se densifica lo que se pide (to_dense, gather).
+    """
+
+    def __init__(self, indptr: np.ndarray, pitch: np.ndarray, program: np.ndarray,
+                 velocity: np.ndarray, fs: float = DEFAULT_FRAME_RATE):
+        self.indptr = indptr
+        self.pitch = pitch
+        self.program = program
+        self.velocity = velocity
+        self.fs = fs
+
+    @classmethod
+    def from_arrays(cls, arrays, fs: float = DEFAULT_FRAME_RATE) -> 'SparsePianoRoll':
+        """Reconstruye un roll a partir de arrays() (p. ej. leídos de un .npz)"""
+        return cls(arrays['indptr'], *(arrays[field] for field in ROLL_FIELDS), fs=fs)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """indptr y columnas, para guardarlos con np.savez"""
+        return dict({field: getattr(self, field) for field in ROLL_FIELDS}, indptr=self.indptr)
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1])
+
+    def slice(self, start: int, stop: int) -> 'SparsePianoRoll':
+        """Frames [start, stop) como otro SparsePianoRoll (las columnas son vistas)"""
+        lo, hi = self.indptr[start], self.indptr[stop]
+        return SparsePianoRoll(self.indptr[start:stop + 1] - lo, self.pitch[lo:hi],
+                               self.program[lo:hi], self.velocity[lo:hi], self.fs)
+
+    def to_dense(self, programs: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Matriz densa (frames, 128) de velocidades; ver gather"""
+        return self.gather([0], len(self), programs)[0]
+
+    def gather(self, starts, length: int, programs: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Densifica un lote de ventanas de length frames
+
+        Args:
+            starts: Frame inicial de cada ventana
+            length: Frames por ventana
+            programs: Programas a incluir (None para todos); los instrumentos
+                se mezclan quedándose con la velocidad máxima de cada celda
+
+        Returns:
+            Array uint8 de forma (len(starts), length, 128)
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        lo = self.indptr[starts]
+        counts = self.indptr[starts + length] - lo
+        out = np.zeros((len(starts), length, 128), dtype=np.uint8)
+        if counts.sum() == 0:
+            return out
+
+        window = np.repeat(np.arange(len(starts)), counts)
+        entries = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        frames = np.searchsorted(self.indptr, entries, side='right') - 1 - starts[window]
+        pitch = self.pitch[entries]
+        velocity = self.velocity[entries]
+        if programs is not None:
+            keep = np.isin(self.program[entries], programs)
+            window, frames, pitch, velocity = window[keep], frames[keep], pitch[keep], velocity[keep]
+        np.maximum.at(out, (window, frames, pitch), velocity)
+        return out
+
+def notes_to_piano_roll(notes: Dict[str, np.ndarray], fs: float = DEFAULT_FRAME_RATE) -> SparsePianoRoll:
+    """
+    Convierte columnas de notas (con 'program') en un piano roll disperso
+
+    Cada nota ocupa los frames [int(start * fs), int(end * fs)), como en
+    pretty_midi.get_piano_roll, y al menos uno para no perder notas cortas.
+    Si dos notas del mismo programa coinciden en una celda se guarda la
+    velocidad máxima.
+
+    Args:
+        notes: Columnas de INSTRUMENT_NOTE_FIELDS (ver instrument_note_arrays)
+        fs: Frames por segundo
+
+    Returns:
+        SparsePianoRoll con ceil(fin de la última nota * fs) frames
+    """
+    start = (notes['start'].astype(np.float64) * fs).astype(np.int64)
+    end = np.maximum((notes['end'].astype(np.float64) * fs).astype(np.int64), start + 1)
+    num_frames = int(max(end.max(initial=0), np.ceil(notes['end'].max(initial=0) * fs)))
+
+    lengths = end - start
+    note = np.repeat(np.arange(len(start)), lengths)
+    frames = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + start[note]
+    pitch = notes['pitch'][note]
+    program = notes['program'][note]
+    velocity = notes['velocity'][note]
+
+    # Orden por (frame, programa, altura) y, en cada celda, velocidad máxima
+    # primero; una sola clave entera (los frames ya vienen casi ordenados y la
+    # ordenación estable aprovecha esas rachas)
+    cell = (frames << 16) | (program.astype(np.int64) << 8) | pitch
+    order = np.argsort((cell << 7) | (127 - velocity), kind='stable')
+    cell = cell[order]
+    first = np.ones(len(cell), dtype=bool)
+    first[1:] = cell[1:] != cell[:-1]
+    order = order[first]
+
+    indptr = _concat_offsets(np.bincount(frames[order], minlength=num_frames))
+    return SparsePianoRoll(indptr, pitch[order], program[order], velocity[order], fs)
+
+def write_piano_roll(output_dir: str, rolls: Sequence[SparsePianoRoll],
+                     fs: float = DEFAULT_FRAME_RATE) -> None:
+    """
+    Escribe junto al corpus el piano roll disperso de cada archivo
+
+    Los frames de todos los archivos se concatenan en un único CSR; el índice
+    roll_offsets.npy marca el primer frame de cada archivo.
+
+    Args:
+        output_dir: Directorio del corpus
+        rolls: Piano roll de cada archivo (ver notes_to_piano_roll), en el
+            mismo orden que los archivos del corpus
+        fs: Frames por segundo de los rolls
+    """
+    offsets = _concat_offsets([len(roll) for roll in rolls])
+    entry_offsets = _concat_offsets([roll.nnz for roll in rolls])
+
+    indptr = np.concatenate([roll.indptr[:-1] + entry_offsets[i] for i, roll in enumerate(rolls)]
+                            + [entry_offsets[-1:]])
+    np.save(os.path.join(output_dir, ROLL_INDPTR_FILE), indptr)
+    np.save(os.path.join(output_dir, ROLL_OFFSETS_FILE), offsets)
+    for field, dtype in ROLL_FIELDS.items():
+        _write_column(os.path.join(output_dir, f'roll_{field}.npy'), dtype,
+                      [getattr(roll, field) for roll in rolls], entry_offsets)
+
+    meta = {'fs': fs, 'num_files': len(rolls), 'num_frames': int(offsets[-1]),
+            'num_entries': int(entry_offsets[-1]), 'drum_program': DRUM_PROGRAM,
+            'fields': {field: np.dtype(dtype).name for field, dtype in ROLL_FIELDS.items()}}
+    with open(os.path.join(output_dir, ROLL_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def load_piano_roll(corpus_dir: str, mmap_mode: str = 'r'):
+    """
+    Abre el piano roll de un corpus
+
+    Returns:
+        (SparsePianoRoll de todo el corpus, offsets de frames por archivo), o
+        None si el corpus se preprocesó sin piano roll
+    """
+    meta_path = os.path.join(corpus_dir, ROLL_META)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    columns = {field: np.load(os.path.join(corpus_dir, f'roll_{field}.npy'), mmap_mode=mmap_mode)
+               for field in ROLL_FIELDS}
+    indptr = np.load(os.path.join(corpus_dir, ROLL_INDPTR_FILE), mmap_mode=mmap_mode)
+    offsets = np.load(os.path.join(corpus_dir, ROLL_OFFSETS_FILE))
+    return SparsePianoRoll(indptr, fs=meta['fs'], **columns), offsets
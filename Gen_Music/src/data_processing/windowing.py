@@ -0,0 +1,140 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict
+
+def num_windows(length: int, seq_length: int, stride: int = 1) -> int:
+    """Número de ventanas de seq_length elementos que caben en length con el paso dado"""
+    if length < seq_length:
+        return 0
+    return (length - seq_length) // stride + 1
+
+def sliding_windows(array: np.ndarray, seq_length: int, stride: int = 1) -> np.ndarray:
+    """
+    Devuelve las ventanas deslizantes de un array como una vista sin copia
+
+    Args:
+        array: Array 1D (por ejemplo una columna del corpus)
+        seq_length: Longitud de cada ventana
+        stride: Separación entre inicios de ventanas consecutivas
+
+    Returns:
+        Vista de forma (num_windows, seq_length) que comparte memoria con array
+    """
+    if stride < 1:
+        raise ValueError("stride debe ser mayor o igual que 1")
+    if len(array) < seq_length:
+        return np.empty((0, seq_length), dtype=array.dtype)
+    return sliding_window_view(array, seq_length)[::stride]
+
+def note_windows(arrays: Dict[str, np.ndarray], seq_length: int, stride: int = 1) -> Dict[str, np.ndarray]:
+    """Aplica sliding_windows a cada columna de un conjunto de notas"""
+    return {field: sliding_windows(column, seq_length, stride) for field, column in arrays.items()}
+
+class WindowIndex:
+    """
+    Índice de ventanas de entrenamiento sobre un NoteCorpus
+
+    Cada nota se guarda una sola vez; las ventanas se identifican por un índice
+    global y se resuelven bajo demanda, sin cruzar el límite entre archivos.
+    Con tokens=True las ventanas recorren los tokens de eventos en lugar de
+    las notas.
+    """
+
+    def __init__(self, corpus, seq_length: int = 100, stride: int = 1, tokens: bool = False):
+        if stride < 1:
+            raise ValueError("stride debe ser mayor o igual que 1")
+        self.corpus = corpus
+        self.seq_length = seq_length
+        self.stride = stride
+        self.tokens = tokens
+        self.offsets = self._unit_offsets()
+
+        lengths = np.diff(self.offsets)
+        counts = np.maximum(lengths - seq_length, -1) // stride + 1
+        self.file_counts = counts.astype(np.int64)
+        self.window_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(self.file_counts, out=self.window_offsets[1:])
+
+    def _unit_offsets(self) -> np.ndarray:
+        """Inicio de cada archivo en la unidad que recorren las ventanas"""
+        return self.corpus.token_offsets if self.tokens else self.corpus.offsets
+
+    def __len__(self) -> int:
+        return int(self.window_offsets[-1])
+
+    def starts(self, indices) -> np.ndarray:
+        """
+        Convierte índices globales de ventana en posiciones de inicio en el corpus
+
+        Args:
+            indices: Índices de ventana (0 <= i < len(self))
+
+        Returns:
+            Posición de la primera nota de cada ventana en las columnas del corpus
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        files = np.searchsorted(self.window_offsets, indices, side='right') - 1
+        local = indices - self.window_offsets[files]
+        return self.offsets[files] + local * self.stride
+
+    def column(self, field: str) -> np.ndarray:
+        """Columna completa de un campo ('tokens' para los tokens de eventos)"""
+        return self.corpus.tokens if field == 'tokens' else self.corpus.columns[field]
+
+    def file_windows(self, index: int, field: str = 'pitch') -> np.ndarray:
+        """Vista (sin copia) de todas las ventanas de un archivo para un campo"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return sliding_windows(self.column(field)[start:end], self.seq_length, self.stride)
+
+    def gather(self, field: str, indices) -> np.ndarray:
+        """
+        Lee un lote de ventanas de un campo
+
+        Solo se copia el lote pedido, de forma (len(indices), seq_length).
+        """
+        starts = self.starts(indices)
+        return self.column(field)[starts[:, None] + np.arange(self.seq_length)]
+
+class RollWindowIndex(WindowIndex):
+    """
+    Ventanas de seq_length frames sobre el piano roll disperso del corpus
+
+    El roll se guarda en CSR; gather densifica solo el lote pedido, así que la
+    memoria es la del lote (lote x seq_length x 128) y no la del corpus.
+    """
+
+    def __init__(self, corpus, seq_length: int = 100, stride: int = 1, programs=None):
+        if corpus.piano_roll is None:
+            raise ValueError("El corpus no tiene piano roll (vuelve a ejecutar el preprocesado)")
+        self.programs = programs
+        super().__init__(corpus, seq_length, stride)
+
+    def _unit_offsets(self) -> np.ndarray:
+        return self.corpus.roll_offsets
+
+    def column(self, field: str) -> np.ndarray:
+        raise ValueError("Las ventanas del piano roll no tienen columnas; usa gather")
+
+    def file_windows(self, index: int, field: str = 'velocity') -> np.ndarray:
+        """Ventanas de un archivo como vista (ventanas, seq_length, 128) sobre su roll denso"""
+        dense = self.corpus.file_piano_roll(index).to_dense(self.programs)
+        if len(dense) < self.seq_length:
+            return np.empty((0, self.seq_length, 128), dtype=dense.dtype)
+        windows = sliding_window_view(dense, self.seq_length, axis=0).transpose(0, 2, 1)
+        return windows[::self.stride]
+
+    def gather(self, field: str, indices) -> np.ndarray:
+        """
+        Lee un lote de ventanas densas
+
+        Args:
+            field: 'velocity' (uint8) o 'active' (bool)
+            indices: Índices de ventana
+
+        Returns:
+            Array de forma (len(indices), seq_length, 128)
+        """
+        if field not in ('velocity', 'active'):
+            raise ValueError(f"Campo no soportado en el piano roll: {field}")
+        windows = self.corpus.piano_roll.gather(self.starts(indices), self.seq_length, self.programs)
+        return windows > 0 if field == 'active' else windows
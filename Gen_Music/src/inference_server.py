@@ -0,0 +1,339 @@
+"""
+Servidor HTTP local de inferencia con batching dinámico
+
+Mantiene los modelos cargados y precalentados, agrupa las peticiones
+/generate que llegan con pocos milisegundos de diferencia en un único lote
+(una pasada del modelo por nota para todo el lote) y devuelve las notas en
+streaming como líneas JSON (NDJSON) a medida que se generan.
+
+Endpoints:
+    POST /generate  {"model": "CNN", "seed": "C4, E4", "length": 32,
+                     "temperature": 0.9, "top_k": 20, "top_p": null, "random_seed": 1}
+    GET  /metrics   latencias p50/p99 y tamaños de lote
+    GET  /health
+
+Uso: python inference_server.py --port 8765
+"""
+import json
+import math
+import time
+import asyncio
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from models.export import load_model
+from models.generation import ContextRingBuffer, GenerationEngine, prepare_seed
+from models.sampling import sample_rows
+from models.registry import MODEL_FILES, model_name
+from utils.music_utils import parse_music_input
+
+MAX_LENGTH = 512
+
+def parse_sampling(params):
+    """
+    Valida los parámetros de muestreo de una petición
+
+    Se comprueban aquí y no en el lote: un valor inválido haría fallar a todas
+    las peticiones agrupadas con la suya.
+
+    Returns:
+        (temperature, top_k, top_p)
+
+    Raises:
+        ValueError: Si algún parámetro tiene un tipo o rango inválido
+    """
+    def number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+    temperature = params.get('temperature', 0.0)
+    if not number(temperature) or temperature < 0:
+        raise ValueError("temperature debe ser un número mayor o igual que 0")
+    top_k = params.get('top_k')
+    if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+        raise ValueError("top_k debe ser un entero positivo")
+    top_p = params.get('top_p')
+    if top_p is not None and (not number(top_p) or not 0 < top_p <= 1):
+        raise ValueError("top_p debe estar en (0, 1]")
+    return float(temperature), top_k, None if top_p is None else float(top_p)
+
+class GenerationRequest:
+    """Petición pendiente: semilla, parámetros y cola de notas para el cliente"""
+
+    def __init__(self, seed, length, temperature=0.0, top_k=None, top_p=None, random_seed=None):
+        self.seed = seed
+        self.length = length
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.rng = np.random.default_rng(random_seed)
+        self.notes = asyncio.Queue()
+        self.arrival = time.perf_counter()
+        self.first_note = None
+
+class ServerMetrics:
+    """Latencias y tamaños de lote recientes (ventana acotada)"""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.first_note_latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def record_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.batch_sizes.append(size)
+
+    def record_request(self, request):
+        with self._lock:
+            self.requests += 1
+            now = time.perf_counter()
+            self.latencies.append(now - request.arrival)
+            if request.first_note is not None:
+                self.first_note_latencies.append(request.first_note - request.arrival)
+
+    def snapshot(self):
+        def percentiles(values):
+            if not values:
+                return {'p50': None, 'p99': None}
+            data = np.array(values) * 1000
+            return {'p50': float(np.percentile(data, 50)), 'p99': float(np.percentile(data, 99))}
+        
+        with self._lock:
+            sizes = np.array(self.batch_sizes) if self.batch_sizes else np.zeros(1)
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'latency_ms': percentiles(self.latencies),
+                'first_note_ms': percentiles(self.first_note_latencies),
+                'batch_size': {'mean': float(sizes.mean()), 'max': int(sizes.max()),
+                               'p50': float(np.percentile(sizes, 50))}
+            }
+
+class DynamicBatcher:
+    """
+    Agrupa peticiones concurrentes para un modelo en un solo lote
+
+    La primera petición abre una ventana de max_wait_ms; todas las que llegan
+    en ese intervalo (hasta max_batch) empiezan a generarse juntas en un hilo
+    aparte mientras el bucle de eventos sigue atendiendo clientes. El lote es
+    continuo: entre paso y paso se retiran las filas que ya tienen todas sus
+    notas y se admiten las peticiones en espera, así que ninguna petición
+    espera a la más larga de su lote ni ocupa el modelo con pasos de más.
+    """
+
+    def __init__(self, engine, metrics, max_batch=64, max_wait_ms=5.0):
+        self.engine = engine
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        # Peticiones aún no admitidas: las encola el bucle de eventos y las toma el hilo de generación
+        self.waiting = deque()
+        self._lock = threading.Lock()
+        self._arrival = asyncio.Event()
+        # Un solo hilo por modelo: los pasos de un mismo modelo se serializan
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def submit(self, request):
+        with self._lock:
+            self.waiting.append(request)
+        self._arrival.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrival.wait()
+            self._arrival.clear()
+            if not self.waiting:
+                continue
+            deadline = loop.time() + self.max_wait
+            while len(self.waiting) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                self._arrival.clear()
+                try:
+                    await asyncio.wait_for(self._arrival.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            await loop.run_in_executor(self.executor, self._generate, loop)
+
+    def _admit(self, free):
+        with self._lock:
+            return [self.waiting.popleft() for _ in range(min(free, len(self.waiting)))]
+
+    def _generate(self, loop):
+        """Genera mientras haya peticiones activas o en espera"""
+        engine = self.engine
+        active = []
+        remaining = np.zeros(0, dtype=np.int64)
+        context = ContextRingBuffer(0, engine.window, dtype=engine.input_dtype.as_numpy_dtype)
+        retired = False
+        while True:
+            admitted = self._admit(self.max_batch - len(active))
+            if admitted:
+                active += admitted
+                remaining = np.concatenate([remaining, [request.length for request in admitted]])
+                context.append(np.stack([request.seed for request in admitted]))
+                self.metrics.record_batch(len(active))
+            if not active:
+                return
+            if admitted or retired:
+                # Parámetros de muestreo por fila; cada petición con su propio generador aleatorio
+                temperatures = np.array([request.temperature for request in active])
+                top_k = np.array([request.top_k or 0 for request in active])
+                top_p = np.array([1.0 if request.top_p is None else request.top_p for request in active])
+                rngs = [request.rng for request in active]
+
+            try:
+                probs = engine.predict_step(context.view())
+                notes = sample_rows(probs, temperatures, top_k, top_p, rngs)
+            except Exception as e:
+                for request in active:
+                    loop.call_soon_threadsafe(request.notes.put_nowait, e)
+                # Se descarta el lote fallido y se sigue con las peticiones en espera
+                active, remaining = [], remaining[:0]
+                context.reorder(remaining)
+                continue
+            context.push(notes)
+
+            now = time.perf_counter()
+            remaining -= 1
+            for request, note, left in zip(active, notes.tolist(), remaining.tolist()):
+                if request.first_note is None:
+                    request.first_note = now
+                loop.call_soon_threadsafe(request.notes.put_nowait, note)
+                if left == 0:
+                    loop.call_soon_threadsafe(request.notes.put_nowait, None)
+
+            retired = not remaining.all()
+            if retired:
+                rows = np.flatnonzero(remaining)
+                active = [active[row] for row in rows]
+                remaining = remaining[rows]
+                context.reorder(rows)
+
+def load_engines(models_dir, model_names=None, warmup_batches=(1, 8, 64)):
+    """Carga los modelos, crea sus motores y los precalienta con lotes de varios tamaños"""
+    engines = {}
+    for name in model_names or MODEL_FILES:
+        # Como la GUI y batch_generate: la exportación TFLite si está al día
+        model = load_model(models_dir, model_name(name))
+        engine = GenerationEngine(model)
+        for size in warmup_batches:
+            engine.predict_step(np.zeros((size, engine.window), dtype=engine.input_dtype.as_numpy_dtype))
+        engines[name] = engine
+        print(f"Modelo {name} cargado y precalentado")
+    return engines
+
+class InferenceServer:
+    """Servidor HTTP/1.1 mínimo sobre asyncio (sin dependencias externas)"""
+
+    def __init__(self, engines, max_batch=64, max_wait_ms=5.0):
+        self.metrics = ServerMetrics()
+        self.batchers = {name: DynamicBatcher(engine, self.metrics, max_batch, max_wait_ms)
+                         for name, engine in engines.items()}
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        for batcher in self.batchers.values():
+            asyncio.create_task(batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Servidor de inferencia en http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode().split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                key, _, value = line.partition(':')
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            if len(request_line) < 2:
+                await self.respond(writer, 400, {'error': 'Petición inválida'})
+            elif request_line[:2] == ['POST', '/generate']:
+                await self.generate(writer, body)
+            elif request_line[:2] == ['GET', '/metrics']:
+                await self.respond(writer, 200, self.metrics.snapshot())
+            elif request_line[:2] == ['GET', '/health']:
+                await self.respond(writer, 200, {'status': 'ok', 'models': list(self.batchers)})
+            else:
+                await self.respond(writer, 404, {'error': 'Ruta no encontrada'})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def generate(self, writer, body):
+        try:
+            params = json.loads(body or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("El cuerpo debe ser un objeto JSON")
+            batcher = self.batchers[params.get('model', 'CNN')]
+            length = int(params.get('length', 16))
+            if not 1 <= length <= MAX_LENGTH:
+                raise ValueError(f"length debe estar entre 1 y {MAX_LENGTH}")
+            seed = prepare_seed(parse_music_input(params.get('seed', '')), batcher.engine.window)
+            request = GenerationRequest(seed, length, *parse_sampling(params), params.get('random_seed'))
+        except KeyError:
+            await self.respond(writer, 400, {'error': 'Modelo desconocido'})
+            return
+        except (ValueError, TypeError) as e:
+            await self.respond(writer, 400, {'error': str(e)})
+            return
+
+        await batcher.submit(request)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        notes = []
+        while True:
+            note = await request.notes.get()
+            if note is None:
+                line = {'done': True, 'notes': notes}
+            elif isinstance(note, Exception):
+                line = {'error': str(note)}
+            else:
+                notes.append(note)
+                line = {'step': len(notes) - 1, 'note': note}
+            chunk = (json.dumps(line) + '\n').encode()
+            writer.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+            await writer.drain()
+            if note is None or isinstance(note, Exception):
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        self.metrics.record_request(request)
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de inferencia con batching dinámico")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--models", nargs='*', default=None, help="Modelos a cargar (por defecto todos)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    engines = load_engines(args.models_dir, args.models)
+    server = InferenceServer(engines, args.max_batch, args.max_wait_ms)
+    asyncio.run(server.serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import PySimpleGUI as sg
 import numpy as np
-from ..models.cnn_model import build_cnn_model
-from ..models.transformer_model import build_transformer_model
-from ..utils.audio_utils import generate_audio_from_predictions
+try:
+    from ..utils.music_utils import parse_music_input
+except ImportError:
+    # Importado como paquete de primer nivel (src en sys.path, p. ej. desde main.py)
+    from utils.music_utils import parse_music_input
 
-def create_ai_gui(models):
+def create_ai_gui(models=None):
     sg.theme('DarkAmber')
     
     layout = [
@@ -15,28 +17,77 @@ def create_ai_gui(models):
         [sg.Multiline(size=(50, 5), key='-SEED-')],
         [sg.Text("Longitud de la melodía:"), 
          sg.Slider(range=(4, 64), default_value=16, orientation='h', key='-LENGTH-')],
-        [sg.Button("Generar"), sg.Button("Salir")],
+        [sg.Button("Generar", disabled=models is None), sg.Button("Cancelar"), sg.Button("Salir")],
         [sg.Text("", size=(50, 1), key='-STATUS-')],
-        [sg.ProgressBar(100, orientation='h', size=(50, 20), key='-PROGRESS-')]
+        [sg.ProgressBar(100, orientation='h', size=(50, 20), key='-PROGRESS-')],
+        [sg.Text("Cola de trabajos:")],
+        [sg.Listbox([], size=(50, 4), key='-JOBS-')]
     ]
     
     return sg.Window('Generador de Melodías con IA', layout)
 
-def generate_melody(model, seed_notes, length):
-    """Genera una melodía usando el modelo seleccionado"""
-    # Preprocesar las notas semilla
-    seed_sequence = process_seed_notes(seed_notes)
+# Motores de generación compilados, uno por modelo cargado
+_engines = {}
+
+def get_engine(model):
+    """Devuelve (creándolo si hace falta) el motor de generación de un modelo"""
+    # Importación diferida: TensorFlow solo se carga al generar por primera vez
+    try:
+        from ..models.generation import GenerationEngine
+    except ImportError:
+        from models.generation import GenerationEngine
     
-    # Generar predicciones
-    predictions = []
-    current_sequence = seed_sequence.copy()
+    engine = _engines.get(id(model))
+    if engine is None or engine.model is not model:
+        engine = GenerationEngine(model)
+        _engines[id(model)] = engine
+    return engine
+
+def generate_melodies(model, seeds, length, num_takes=1, **sampling):
+    """
+    Genera num_takes melodías por semilla en un único lote
+
+    Los parámetros de muestreo (strategy, temperature, top_k, top_p,
+    beam_width, seed, callback) se pasan a models.sampling.generate_takes.
+    """
+    try:
+        from ..models.generation import prepare_seed
+        from ..models.sampling import generate_takes
+    except ImportError:
+        from models.generation import prepare_seed
+        from models.sampling import generate_takes
     
-    for i in range(length):
-        # Predecir la siguiente nota
-        prediction = model.predict(np.array([current_sequence]))[0]
-        predicted_note = np.argmax(prediction)
-        
-        predictions.append(predicted_note)
-        current_sequence = np.append(current_sequence[1:], predicted_note)
+    engine = get_engine(model)
+    batch = np.stack([prepare_seed(parse_music_input(seed), engine.window) for seed in seeds])
+    return generate_takes(engine, batch, length, num_takes, **sampling)
+
+def generate_melody(model, seed_notes, length, num_takes=1, **sampling):
+    """
+    Genera una melodía usando el modelo seleccionado
+
+    Con num_takes > 1 devuelve una lista de tomas alternativas para la misma semilla.
+    """
+    takes = generate_melodies(model, [seed_notes], length, num_takes, **sampling)[0]
+    if num_takes == 1:
+        return takes[0].tolist()
+    return takes.tolist()
+
+def stream_melody(model, seed_notes, length, strategy='greedy', temperature=1.0,
+                  top_k=None, top_p=None, seed=None, callback=None):
+    """
+    Genera una melodía nota a nota, como iterador de valores MIDI
+
+    Pensado para el render en streaming (utils.audio_stream). Beam search no
+    es incremental: la mejor hipótesis solo se conoce al final.
+    """
+    try:
+        from ..models.generation import stream_notes
+        from ..models.sampling import make_sampler
+    except ImportError:
+        from models.generation import stream_notes
+        from models.sampling import make_sampler
     
-    return predictions
\ No newline at end of file
+    if strategy == 'beam':
+        raise ValueError("beam search no admite generación en streaming")
+    select = None if strategy == 'greedy' else make_sampler(temperature, top_k, top_p, seed)
+    return stream_notes(get_engine(model), parse_music_input(seed_notes), length, select, callback)
@@ -0,0 +1,179 @@
+import os
+import itertools
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .gui import generate_melody, stream_melody
+
+# Eventos que el worker envía a la ventana con window.write_event_value
+EVENT_QUEUED = '-JOB-QUEUED-'
+EVENT_PROGRESS = '-JOB-PROGRESS-'
+EVENT_DONE = '-JOB-DONE-'
+EVENT_ERROR = '-JOB-ERROR-'
+EVENT_CANCELLED = '-JOB-CANCELLED-'
+EVENT_AUDIO_READY = '-JOB-AUDIO-READY-'
+
+STREAM_OUTPUT_DIR = "audio_output"
+
+# Reparto de la barra de progreso entre generación y renderizado
+GENERATION_SHARE = 80
+RENDER_STAGES = {'midi': 85, 'render': 90, 'done': 100}
+
+class GenerationWorker:
+    """
+    Ejecuta generación y renderizado fuera del bucle de eventos de la GUI
+
+    La generación se serializa en un hilo (un modelo, una cola FIFO de
+    peticiones) y el renderizado de audio se hace en un pool aparte, de modo
+    que la siguiente melodía puede generarse mientras se renderiza la anterior.
+    El progreso se publica con window.write_event_value como tuplas
+    (job_id, porcentaje, mensaje).
+
+    Con streaming=True (una sola toma, sin beam search) cada nota se sintetiza
+    en el hilo de generación según se predice y se añade a un WAV que crece;
+    EVENT_AUDIO_READY avisa en cuanto el archivo tiene el primer audio. Al
+    terminar se entrega en format, pasando por la caché de audio igual que el
+    render por lotes.
+    """
+
+    def __init__(self, window, models, render_workers=2, streaming=True, format='mp3'):
+        self.window = window
+        self.models = models
+        self.streaming = streaming
+        self.format = format
+        self._generation = ThreadPoolExecutor(max_workers=1, thread_name_prefix='generation')
+        self._render = ThreadPoolExecutor(max_workers=render_workers, thread_name_prefix='render')
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, model_type, seed, length, **options):
+        """Encola una petición de generación y devuelve su identificador"""
+        job_id = next(self._ids)
+        cancel_event = threading.Event()
+        # Se anuncia antes de encolar para que la GUI lo vea antes que su progreso
+        self.window.write_event_value(EVENT_QUEUED, (job_id, f"{model_type}: {seed.strip()} ({length} notas)"))
+        with self._lock:
+            future = self._generation.submit(self._run, job_id, cancel_event, model_type, seed, length, options)
+            self._jobs[job_id] = (future, cancel_event)
+        return job_id
+
+    def cancel(self, job_id=None):
+        """Cancela un trabajo (o todos si job_id es None), en cola o en curso"""
+        with self._lock:
+            targets = list(self._jobs) if job_id is None else [job_id]
+            for target in targets:
+                if target not in self._jobs:
+                    continue
+                future, cancel_event = self._jobs[target]
+                cancel_event.set()
+                if future.cancel():
+                    # Nunca llegó a ejecutarse: se notifica aquí
+                    del self._jobs[target]
+                    self.window.write_event_value(EVENT_CANCELLED, (target, 0, "Cancelado"))
+
+    def pending(self):
+        """Identificadores de los trabajos aún no terminados"""
+        with self._lock:
+            return sorted(self._jobs)
+
+    def shutdown(self):
+        """Cancela todo y libera los hilos"""
+        self.cancel()
+        self._generation.shutdown(wait=False, cancel_futures=True)
+        self._render.shutdown(wait=False, cancel_futures=True)
+
+    def _post(self, event, job_id, percent, message):
+        self.window.write_event_value(event, (job_id, percent, message))
+
+    def _finish(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _run(self, job_id, cancel_event, model_type, seed, length, options):
+        try:
+            from ..models.generation import GenerationCancelled
+        except ImportError:
+            # Importado como paquete de primer nivel (src en sys.path, p. ej. desde main.py)
+            from models.generation import GenerationCancelled
+        
+        def on_step(step, notes):
+            if cancel_event.is_set():
+                raise GenerationCancelled()
+            percent = GENERATION_SHARE * (step + 1) // length
+            self._post(EVENT_PROGRESS, job_id, percent, f"Nota {step + 1}/{length}")
+
+        if self.streaming and options.get('strategy', 'greedy') != 'beam' \
+                and options.get('num_takes', 1) == 1:
+            self._run_streaming(job_id, on_step, model_type, seed, length, options)
+            return
+
+        try:
+            self._post(EVENT_PROGRESS, job_id, 0, "Generando melodía...")
+            predictions = generate_melody(self.models[model_type], seed, length,
+                                          callback=on_step, **options)
+        except GenerationCancelled:
+            self._finish(job_id)
+            self._post(EVENT_CANCELLED, job_id, 0, "Cancelado")
+            return
+        except Exception as e:
+            self._finish(job_id)
+            self._post(EVENT_ERROR, job_id, 0, f"Error: {e}")
+            return
+
+        self._render.submit(self._render_audio, job_id, cancel_event, predictions)
+
+    def _run_streaming(self, job_id, on_step, model_type, seed, length, options):
+        try:
+            from ..models.generation import GenerationCancelled
+            from ..utils.audio_stream import stream_to_file
+        except ImportError:
+            from models.generation import GenerationCancelled
+            from utils.audio_stream import stream_to_file
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        stream_path = os.path.join(STREAM_OUTPUT_DIR, f"melody_{timestamp}.wav")
+        output_path = os.path.join(STREAM_OUTPUT_DIR, f"melody_{timestamp}.{self.format}")
+        
+        def on_chunk(chunk, samples_written):
+            if samples_written == len(chunk) and len(chunk):
+                self._post(EVENT_AUDIO_READY, job_id, 0, f"Audio disponible: {stream_path}")
+
+        options = {k: v for k, v in options.items() if k not in ('num_takes', 'beam_width')}
+        try:
+            self._post(EVENT_PROGRESS, job_id, 0, "Generando melodía...")
+            notes = stream_melody(self.models[model_type], seed, length, callback=on_step, **options)
+            stream_to_file(notes, output_path, on_chunk=on_chunk, stream_path=stream_path)
+        except GenerationCancelled:
+            self._post(EVENT_CANCELLED, job_id, 0, "Cancelado")
+        except Exception as e:
+            self._post(EVENT_ERROR, job_id, 0, f"Error: {e}")
+        else:
+            self._post(EVENT_DONE, job_id, 100, f"Audio generado: {output_path}")
+        finally:
+            self._finish(job_id)
+
+    def _render_audio(self, job_id, cancel_event, predictions):
+        try:
+            from ..models.generation import GenerationCancelled
+            from ..utils.audio_utils import generate_audio_from_predictions
+        except ImportError:
+            from models.generation import GenerationCancelled
+            from utils.audio_utils import generate_audio_from_predictions
+        
+        def on_stage(stage):
+            if cancel_event.is_set():
+                raise GenerationCancelled()
+            self._post(EVENT_PROGRESS, job_id, RENDER_STAGES[stage], f"Renderizando audio ({stage})...")
+
+        try:
+            output_path = generate_audio_from_predictions(predictions, format=self.format,
+                                                         progress_callback=on_stage)
+        except GenerationCancelled:
+            self._post(EVENT_CANCELLED, job_id, 0, "Cancelado")
+        except Exception as e:
+            self._post(EVENT_ERROR, job_id, 0, f"Error: {e}")
+        else:
+            self._post(EVENT_DONE, job_id, 100, f"Audio generado: {output_path}")
+        finally:
+            self._finish(job_id)
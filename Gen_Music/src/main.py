@@ -1,62 +1,92 @@
+import argparse
+import threading
 from interface.gui import create_ai_gui
-from models.cnn_model import build_cnn_model
-from models.transformer_model import build_transformer_model
-from utils.audio_utils import generate_audio_from_predictions
-import tensorflow as tf
-import numpy as np
+from interface.worker import (GenerationWorker, EVENT_QUEUED, EVENT_PROGRESS, EVENT_AUDIO_READY,
+                              EVENT_DONE, EVENT_ERROR, EVENT_CANCELLED)
+from utils.profiling import PROFILE_MODES, profile_session
+
+EVENT_MODELS_LOADED = '-MODELS-LOADED-'
 
 def load_models():
     """Carga los modelos preentrenados"""
+    # Importación diferida: TensorFlow tarda segundos en importarse
+    from models.export import MODEL_NAMES, load_model
+    
     try:
-        cnn_model = tf.keras.models.load_model("models/cnn_model.h5")
-        transformer_model = tf.keras.models.load_model("models/transformer_model.h5")
-        return {
-            'CNN': cnn_model,
-            'Transformer': transformer_model
-        }
+        # Se prefiere la versión TFLite cuantizada si se ha exportado
+        return {display_name: load_model("models", name) for display_name, name in MODEL_NAMES.items()}
     except Exception as e:
         print(f"Error cargando modelos: {e}")
         return None
 
 def main():
-    # Cargar modelos
-    models = load_models()
-    if not models:
-        print("No se pudieron cargar los modelos. Ejecuta train.py primero.")
-        return
+    # Crear interfaz primero; los modelos se cargan en segundo plano
+    window = create_ai_gui()
+    window.finalize()
+    window['-STATUS-'].update("Cargando modelos...")
+    threading.Thread(target=lambda: window.write_event_value(EVENT_MODELS_LOADED, load_models()),
+                     daemon=True).start()
+    worker = None
+    jobs = {}
     
-    # Crear interfaz
-    window = create_ai_gui(models)
+    def refresh_jobs():
+        window['-JOBS-'].update([f"#{job_id} {label}" for job_id, label in sorted(jobs.items())])
     
     while True:
         event, values = window.read()
         
-        if event == "Generar" and values['-SEED-']:
-            try:
-                window['-STATUS-'].update("Generando melodía...")
-                window['-PROGRESS-'].update(0)
-                
-                # Seleccionar modelo
-                model_type = values['-MODEL-']
-                model = models[model_type]
-                
-                # Generar melodía
-                length = int(values['-LENGTH-'])
-                predictions = generate_melody(model, values['-SEED-'], length)
-                window['-PROGRESS-'].update(50)
-                
-                # Generar audio
-                output_path = generate_audio_from_predictions(predictions)
-                window['-PROGRESS-'].update(100)
-                window['-STATUS-'].update(f"Audio generado: {output_path}")
-                
-            except Exception as e:
-                window['-STATUS-'].update(f"Error: {str(e)}")
+        if event == EVENT_MODELS_LOADED:
+            models = values[event]
+            if not models:
+                window['-STATUS-'].update("No se pudieron cargar los modelos. Ejecuta train.py primero.")
+                continue
+            worker = GenerationWorker(window, models)
+            window['Generar'].update(disabled=False)
+            window['-STATUS-'].update("Modelos cargados")
+            
+        elif event == "Generar" and values['-SEED-'] and worker is not None:
+            # La generación y el renderizado corren en segundo plano
+            worker.submit(values['-MODEL-'], values['-SEED-'], int(values['-LENGTH-']))
+            
+        elif event == "Cancelar" and worker is not None:
+            # Cancela los trabajos seleccionados en la cola, o todos si no hay selección
+            selected = [int(item.split()[0][1:]) for item in values['-JOBS-']]
+            if selected:
+                for job_id in selected:
+                    worker.cancel(job_id)
+            else:
+                worker.cancel()
+            
+        elif event == EVENT_QUEUED:
+            job_id, label = values[event]
+            jobs[job_id] = label
+            refresh_jobs()
+            
+        elif event == EVENT_AUDIO_READY:
+            # El WAV ya se puede abrir mientras se siguen generando notas
+            job_id, _, message = values[event]
+            window['-STATUS-'].update(f"#{job_id} {message}")
+            
+        elif event in (EVENT_PROGRESS, EVENT_DONE, EVENT_ERROR, EVENT_CANCELLED):
+            job_id, percent, message = values[event]
+            window['-STATUS-'].update(f"#{job_id} {message}")
+            window['-PROGRESS-'].update(percent)
+            if event != EVENT_PROGRESS:
+                jobs.pop(job_id, None)
+                refresh_jobs()
                 
         elif event == "Salir" or event == None:
             break
             
+    if worker is not None:
+        worker.shutdown()
     window.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generador de melodías con IA")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default='off',
+                        help="Instrumentación: spans, cProfile o tf.profiler")
+    parser.add_argument("--profile-dir", default="profiles")
+    args = parser.parse_args()
+    with profile_session(args.profile, args.profile_dir):
+        main()
\ No newline at end of file
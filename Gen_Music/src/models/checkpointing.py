@@ -0,0 +1,180 @@
+"""
+Checkpoints y reanudación del entrenamiento
+
+ResumableTraining es un callback de Keras que guarda periódicamente, en un
+único tf.train.Checkpoint, el modelo, el optimizador y la posición del input
+pipeline (época, lote dentro de la época y semilla de datos). El mismo estado
+incluye la parada temprana y la reducción del learning rate sobre la pérdida
+de validación, de modo que al reanudar se continúa exactamente donde se quedó.
+
+Junto a los checkpoints, run.json guarda la huella de los datos y la
+configuración con que se entrenó y si el entrenamiento terminó: solo se
+reanuda un entrenamiento a medias con la misma huella.
+"""
+import os
+import json
+import random
+import shutil
+import numpy as np
+import tensorflow as tf
+
+CHECKPOINT_DIR_NAME = 'checkpoints'
+BEST_WEIGHTS_FILE = 'best.weights.h5'
+RUN_FILE = 'run.json'
+
+class ResumableTraining(tf.keras.callbacks.Callback):
+    """
+    Estado reanudable del entrenamiento de un modelo
+
+    Se entrena una época por llamada a fit (ver model_trainer.train_model):
+    el orden de los lotes de cada época depende solo de la semilla de datos y
+    del número de época, así que tras reanudar basta con saltar los lotes ya
+    vistos de la época interrumpida.
+
+    Args:
+        model: Modelo compilado (el optimizador debe estar construido)
+        directory: Directorio de checkpoints de este modelo
+        seed: Semilla de datos (None para elegir una y guardarla en el checkpoint)
+        save_every: Guardar cada save_every lotes además de al final de cada época
+        patience: Épocas sin mejorar val_loss antes de parar
+        lr_patience: Épocas sin mejorar antes de reducir el learning rate
+        lr_factor: Factor de reducción del learning rate
+        min_lr: Learning rate mínimo
+        min_delta: Mejora mínima de val_loss que cuenta como mejora
+        max_to_keep: Checkpoints que se conservan
+        fingerprint: Huella de los datos y la configuración (ver
+            model_trainer.run_fingerprint)
+    """
+
+    def __init__(self, model, directory, seed=None, save_every=500, patience=5, lr_patience=2,
+                 lr_factor=0.5, min_lr=1e-5, min_delta=1e-4, max_to_keep=3, fingerprint=None):
+        super().__init__()
+        # fit vuelve a asignarlo; hace falta antes para restaurar y guardar pesos
+        self.set_model(model)
+        self.directory = directory
+        self.save_every = save_every
+        self.patience = patience
+        self.lr_patience = lr_patience
+        self.lr_factor = lr_factor
+        self.min_lr = min_lr
+        self.min_delta = min_delta
+        self.max_to_keep = max_to_keep
+        self.fingerprint = fingerprint
+        self.best_weights_path = os.path.join(directory, BEST_WEIGHTS_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 31)
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.step = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.data_seed = tf.Variable(seed, dtype=tf.int64, trainable=False)
+        self.best_loss = tf.Variable(np.inf, dtype=tf.float64, trainable=False)
+        self.wait = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.lr_wait = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.stopped = tf.Variable(False, trainable=False)
+
+        self.checkpoint = tf.train.Checkpoint(
+            model=model, optimizer=model.optimizer, epoch=self.epoch, step=self.step,
+            data_seed=self.data_seed, best_loss=self.best_loss, wait=self.wait,
+            lr_wait=self.lr_wait, stopped=self.stopped)
+        self.manager = tf.train.CheckpointManager(self.checkpoint, directory, max_to_keep=max_to_keep)
+
+    @property
+    def run_path(self):
+        return os.path.join(self.directory, RUN_FILE)
+
+    @property
+    def seed(self):
+        return int(self.data_seed.numpy())
+
+    def epoch_seed(self, epoch=None):
+        """Semilla del barajado de una época (por defecto la actual)"""
+        epoch = int(self.epoch.numpy()) if epoch is None else epoch
+        return (self.seed * 1000003 + epoch) % (2 ** 31)
+
+    def restore(self):
+        """
+        Restaura el último checkpoint si existe y corresponde a un entrenamiento
+        a medias con la misma huella; si no, borra los checkpoints y empieza de cero
+
+        Returns:
+            True si se ha reanudado desde un checkpoint
+        """
+        latest = self.manager.latest_checkpoint
+        if latest is not None:
+            run = {}
+            if os.path.exists(self.run_path):
+                with open(self.run_path) as f:
+                    run = json.load(f)
+            name = os.path.basename(self.directory)
+            if run.get('fingerprint') != self.fingerprint:
+                print(f"{name}: el checkpoint es de otros datos o configuración; se empieza de cero")
+            elif run.get('finished'):
+                print(f"{name}: el entrenamiento anterior ya terminó; se empieza de cero")
+            else:
+                self.checkpoint.restore(latest).assert_existing_objects_matched()
+                return True
+            self.clear()
+        self._write_run(finished=False)
+        return False
+
+    def clear(self):
+        """Borra los checkpoints, los mejores pesos y run.json de este modelo"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self.manager = tf.train.CheckpointManager(self.checkpoint, self.directory,
+                                                  max_to_keep=self.max_to_keep)
+
+    def mark_finished(self):
+        """Marca el entrenamiento como terminado: la próxima ejecución no lo reanuda"""
+        self._write_run(finished=True)
+
+    def _write_run(self, finished):
+        with open(self.run_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'finished': finished}, f, indent=2)
+
+    def save(self):
+        return self.manager.save()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step.assign_add(1)
+        if self.save_every and int(self.step.numpy()) % self.save_every == 0:
+            self.save()
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        val_loss = logs.get('val_loss', logs.get('loss'))
+        if val_loss is not None:
+            self._update_plateau(float(val_loss))
+        self.epoch.assign_add(1)
+        self.step.assign(0)
+        self.save()
+
+    def _update_plateau(self, val_loss):
+        """Parada temprana y reducción del learning rate (como EarlyStopping y ReduceLROnPlateau)"""
+        if val_loss < float(self.best_loss.numpy()) - self.min_delta:
+            self.best_loss.assign(val_loss)
+            self.wait.assign(0)
+            self.lr_wait.assign(0)
+            self.model.save_weights(self.best_weights_path)
+            return
+
+        self.wait.assign_add(1)
+        self.lr_wait.assign_add(1)
+        if int(self.lr_wait.numpy()) >= self.lr_patience:
+            learning_rate = self.model.optimizer.learning_rate
+            old_lr = float(learning_rate.numpy())
+            if old_lr > self.min_lr:
+                new_lr = max(old_lr * self.lr_factor, self.min_lr)
+                learning_rate.assign(new_lr)
+                print(f"\nLearning rate reducido a {new_lr:.2e}")
+            self.lr_wait.assign(0)
+        if int(self.wait.numpy()) >= self.patience:
+            self.stopped.assign(True)
+            self.model.stop_training = True
+            print(f"\nParada temprana: val_loss sin mejorar en {self.patience} épocas")
+
+    def restore_best_weights(self):
+        """Carga los pesos con mejor val_loss, si se guardaron"""
+        if os.path.exists(self.best_weights_path):
+            self.model.load_weights(self.best_weights_path)
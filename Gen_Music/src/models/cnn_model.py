@@ -1,10 +1,22 @@
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv1D, MaxPooling1D, Flatten, Dense, Dropout
+from tensorflow.keras.layers import Input, Embedding, Conv1D, MaxPooling1D, Flatten, Dense, Dropout
 
-def build_cnn_model(input_shape, num_pitches=128):
-    """Construye un modelo CNN para generación musical"""
-    model = Sequential([
-        Conv1D(64, 3, activation='relu', input_shape=input_shape),
+def build_cnn_model(input_shape, num_pitches=128, vocab_size=None, embed_dim=64):
+    """
+    Construye un modelo CNN para generación musical
+
+    Con vocab_size la entrada son tokens enteros de forma (seq_length,) que
+    pasan por una capa Embedding, y la salida es una distribución sobre el
+    vocabulario; sin él, alturas MIDI como un canal float (seq_length, 1).
+    """
+    if vocab_size is None:
+        input_layers = [Conv1D(64, 3, activation='relu', input_shape=input_shape)]
+    else:
+        input_layers = [Input(shape=input_shape, dtype='int32'),
+                        Embedding(vocab_size, embed_dim),
+                        Conv1D(64, 3, activation='relu')]
+    
+    model = Sequential(input_layers + [
         MaxPooling1D(2),
         Conv1D(128, 3, activation='relu'),
         MaxPooling1D(2),
@@ -12,11 +24,11 @@ def build_cnn_model(input_shape, num_pitches=128):
         Flatten(),
         Dense(512, activation='relu'),
         Dropout(0.3),
-        Dense(num_pitches, activation='softmax')
+        Dense(vocab_size or num_pitches, activation='softmax', dtype='float32')
     ])
     
     model.compile(optimizer='adam',
-                 loss='categorical_crossentropy',
+                 loss='sparse_categorical_crossentropy',
                  metrics=['accuracy'])
     
-    return model
\ No newline at end of file
+    return model
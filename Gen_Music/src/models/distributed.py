@@ -0,0 +1,85 @@
+"""
+Entrenamiento distribuido en CPU
+
+Divide la CPU en varios dispositivos lógicos y replica el modelo en cada uno
+con tf.distribute.MirroredStrategy (cada réplica procesa su parte del lote y
+los gradientes se suman con all-reduce). También detecta si la CPU tiene
+instrucciones bfloat16 para activar la precisión mixta.
+"""
+import os
+import tensorflow as tf
+
+# Flags de /proc/cpuinfo con las que bfloat16 es más rápido que float32
+BF16_CPU_FLAGS = ('avx512_bf16', 'amx_bf16')
+
+def cpu_flags():
+    """Flags de la CPU (vacío si no se pueden leer, p. ej. fuera de Linux)"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+def supports_bfloat16():
+    """Indica si la CPU tiene instrucciones bfloat16 nativas"""
+    return any(flag in cpu_flags() for flag in BF16_CPU_FLAGS)
+
+def configure_mixed_precision(mode='auto'):
+    """
+    Activa la precisión mixta de Keras
+
+    Args:
+        mode: 'auto' (mixed_bfloat16 solo si la CPU lo soporta), True/'on'
+            para forzarla o False/'off' para float32
+
+    Returns:
+        Nombre de la política global resultante
+    """
+    if mode == 'auto':
+        enabled = supports_bfloat16()
+    else:
+        enabled = mode in (True, 'on')
+    tf.keras.mixed_precision.set_global_policy('mixed_bfloat16' if enabled else 'float32')
+    return tf.keras.mixed_precision.global_policy().name
+
+def configure_cpu_devices(num_devices):
+    """
+    Divide la CPU física en num_devices dispositivos lógicos
+
+    Debe llamarse antes de que TensorFlow inicialice sus dispositivos; si ya
+    están inicializados se devuelven los existentes.
+
+    Returns:
+        Nombres de los dispositivos lógicos de CPU
+    """
+    cpus = tf.config.list_physical_devices('CPU')
+    if num_devices > 1:
+        try:
+            tf.config.set_logical_device_configuration(
+                cpus[0], [tf.config.LogicalDeviceConfiguration() for _ in range(num_devices)])
+        except RuntimeError as e:
+            print(f"No se pudieron crear {num_devices} dispositivos lógicos: {e}")
+    return [device.name for device in tf.config.list_logical_devices('CPU')]
+
+def make_strategy(num_workers=1):
+    """
+    Estrategia de distribución para num_workers réplicas en CPU
+
+    Con un solo worker devuelve la estrategia por defecto (sin réplicas).
+    """
+    if num_workers <= 1:
+        return tf.distribute.get_strategy()
+    devices = configure_cpu_devices(num_workers)[:num_workers]
+    if len(devices) < num_workers:
+        print(f"Solo hay {len(devices)} dispositivos de CPU disponibles")
+    # Cada réplica usa como mucho su parte de los núcleos
+    threads = max(1, (os.cpu_count() or 1) // len(devices))
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+    except RuntimeError:
+        pass
+    return tf.distribute.MirroredStrategy(
+        devices=devices, cross_device_ops=tf.distribute.ReductionToOneDevice())
@@ -0,0 +1,250 @@
+"""
+Exportación de modelos para inferencia en CPU
+
+Convierte los modelos Keras (.h5) a grafos TFLite optimizados con
+cuantización post-entrenamiento (float16, int8 de rango dinámico o int8
+completo con datos representativos) y genera un informe de precisión frente
+a latencia comparándolos con el modelo float original.
+
+Uso (desde Gen_Music): python -m src.models.export --quantization float16 int8
+"""
+import os
+import glob
+import json
+import time
+import numpy as np
+import tensorflow as tf
+from .registry import MODEL_FILES, model_name
+
+# Nombre del modelo en la interfaz -> nombre base de sus archivos
+MODEL_NAMES = {display_name: model_name(display_name) for display_name in MODEL_FILES}
+QUANTIZATIONS = ('none', 'float16', 'dynamic', 'int8')
+# El intérprete TFLite aborta al ejecutar la atención multi-cabeza con activaciones int8
+INT8_UNSUPPORTED = ('transformer_model',)
+
+def export_tflite(model, output_path, quantization='float16', representative_windows=None):
+    """
+    Exporta un modelo Keras a TFLite con cuantización post-entrenamiento
+    
+    Args:
+        model: Modelo Keras (build_cnn_model o build_transformer_model)
+        output_path: Ruta del archivo .tflite
+        quantization: 'none', 'float16', 'dynamic' (pesos int8) o 'int8'
+            (pesos y activaciones int8; requiere representative_windows)
+        representative_windows: Ventanas de entrada para calibrar la cuantización int8
+        
+    Returns:
+        Tamaño del archivo generado en bytes
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Cuantización no soportada: {quantization}")
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_windows is None:
+            raise ValueError("La cuantización int8 necesita ventanas representativas")
+        
+        def representative_dataset():
+            for window in representative_windows:
+                yield [np.asarray(window[None], dtype=np.float32)]
+        converter.representative_dataset = representative_dataset
+        # Las entradas y salidas siguen en float32 para no cambiar a quien llama
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+                                               tf.lite.OpsSet.TFLITE_BUILTINS]
+    
+    flatbuffer = converter.convert()
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(flatbuffer)
+    return len(flatbuffer)
+
+class TFLiteModel:
+    """
+    Modelo TFLite con la interfaz mínima que usa GenerationEngine
+    
+    Se llama como un modelo Keras (model(x) -> probabilidades) y redimensiona
+    la entrada del intérprete cuando cambia el tamaño de lote. No es seguro
+    usarlo desde varios hilos a la vez.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None,) + tuple(int(d) for d in self._input['shape'][1:])
+        self.input_dtype = self._input['dtype']
+        self._batch_size = int(self._input['shape'][0])
+
+    def __call__(self, x, training=False):
+        x = np.asarray(x, dtype=self.input_dtype)
+        if len(x) != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input['index'], x.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(x)
+        self.interpreter.set_tensor(self._input['index'], x)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output['index'])
+
+    def predict(self, x, batch_size=64, verbose=0):
+        """Predicción por lotes con la misma firma básica que Keras"""
+        return np.concatenate([self(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+def optimized_is_current(models_dir, name):
+    """
+    True si <name>.tflite existe y no es anterior al modelo Keras del que se
+    exportó (tras reentrenar, la exportación ya no corresponde a los pesos)
+    """
+    tflite_path = os.path.join(models_dir, f"{name}.tflite")
+    keras_path = os.path.join(models_dir, f"{name}.h5")
+    if not os.path.exists(tflite_path):
+        return False
+    return not os.path.exists(keras_path) or os.path.getmtime(tflite_path) >= os.path.getmtime(keras_path)
+
+def remove_exports(models_dir, name):
+    """Borra las exportaciones TFLite de un modelo (p. ej. al reentrenarlo)"""
+    base = os.path.join(glob.escape(models_dir), glob.escape(name))
+    for path in glob.glob(f"{base}.tflite") + glob.glob(f"{base}.*.tflite"):
+        os.remove(path)
+
+def load_model(models_dir, name, prefer_optimized=True):
+    """
+    Carga un modelo por su nombre base, prefiriendo la versión TFLite exportada
+    
+    Args:
+        models_dir: Directorio de modelos
+        name: Nombre base ('cnn_model', 'transformer_model')
+        prefer_optimized: Usar <name>.tflite si existe y está al día (ver
+            optimized_is_current)
+        
+    Returns:
+        TFLiteModel o modelo Keras
+    """
+    tflite_path = os.path.join(models_dir, f"{name}.tflite")
+    if prefer_optimized and optimized_is_current(models_dir, name):
+        return TFLiteModel(tflite_path)
+    if prefer_optimized and os.path.exists(tflite_path):
+        print(f"{tflite_path} es anterior al modelo entrenado; se usa el modelo Keras")
+    return tf.keras.models.load_model(os.path.join(models_dir, f"{name}.h5"))
+
+def measure_latency(model, windows, batch_size, repeats=20):
+    """Mediana en ms de una llamada con un lote de batch_size ventanas"""
+    x = np.resize(windows, (batch_size,) + windows.shape[1:]).astype(np.float32)
+    model(x)  # Calentamiento (trazado / asignación de tensores)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model(x)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+def compare_models(keras_model, optimized_model, X, y, batch_sizes=(1, 64)):
+    """
+    Informe de precisión y latencia de un modelo exportado frente al original
+    
+    Args:
+        keras_model: Modelo Keras float
+        optimized_model: TFLiteModel exportado
+        X: Ventanas de validación
+        y: Notas objetivo (enteros)
+        batch_sizes: Tamaños de lote para medir latencia
+        
+    Returns:
+        Diccionario con accuracy de ambos, concordancia top-1 y latencias
+    """
+    keras_call = tf.function(lambda x: keras_model(x, training=False))
+    float_probs = np.concatenate([keras_call(X[i:i + 256]).numpy() for i in range(0, len(X), 256)])
+    optimized_probs = optimized_model.predict(X, batch_size=256)
+    float_pred = float_probs.argmax(axis=-1)
+    optimized_pred = optimized_probs.argmax(axis=-1)
+    
+    report = {
+        'samples': int(len(X)),
+        'float_accuracy': float((float_pred == y).mean()),
+        'optimized_accuracy': float((optimized_pred == y).mean()),
+        'top1_agreement': float((float_pred == optimized_pred).mean()),
+        'max_abs_prob_diff': float(np.abs(float_probs - optimized_probs).max()),
+        'latency_ms': {}
+    }
+    for batch_size in batch_sizes:
+        report['latency_ms'][str(batch_size)] = {
+            'float': measure_latency(lambda x: keras_call(x).numpy(), X, batch_size),
+            'optimized': measure_latency(optimized_model, X, batch_size)
+        }
+    return report
+
+def export_models(models_dir="models", corpus_dir="data/processed", quantizations=('float16',),
+                  seq_length=100, max_eval_windows=2048, report_path=None):
+    """
+    Exporta los modelos entrenados y escribe el informe de precisión frente a latencia
+    
+    Las ventanas de evaluación salen de la parte de validación del corpus (las
+    últimas ventanas, igual que en el entrenamiento). La última cuantización
+    de la lista queda como <name>.tflite, el modelo que prefiere load_model.
+    
+    Returns:
+        Informe por modelo y cuantización
+    """
+    from ..data_processing.note_corpus import NoteCorpus
+    from ..data_processing.windowing import WindowIndex
+    from .input_pipeline import split_windows, window_batch_loader
+    
+    windows = WindowIndex(NoteCorpus(corpus_dir), seq_length)
+    train_range, val_range = split_windows(len(windows))
+    load_batch = window_batch_loader(windows)
+    X, y = load_batch(np.arange(val_range[0], min(val_range[1], val_range[0] + max_eval_windows)))
+    representative, _ = load_batch(np.linspace(train_range[0], train_range[1] - 1, 200).astype(np.int64))
+    
+    report = {}
+    for display_name, name in MODEL_NAMES.items():
+        keras_path = os.path.join(models_dir, f"{name}.h5")
+        if not os.path.exists(keras_path):
+            print(f"Omitiendo {display_name}: no existe {keras_path}")
+            continue
+        try:
+            keras_model = tf.keras.models.load_model(keras_path, compile=False)
+        except Exception as e:
+            print(f"Error cargando {keras_path}: {e}")
+            continue
+        report[display_name] = {}
+        exported = None
+        for quantization in quantizations:
+            if quantization == 'int8' and name in INT8_UNSUPPORTED:
+                print(f"Omitiendo {display_name} [int8]: no soportado por el intérprete TFLite")
+                continue
+            path = os.path.join(models_dir, f"{name}.{quantization}.tflite")
+            size = export_tflite(keras_model, path, quantization, representative)
+            entry = compare_models(keras_model, TFLiteModel(path), X, y)
+            entry['size_bytes'] = size
+            entry['float_size_bytes'] = os.path.getsize(keras_path)
+            report[display_name][quantization] = entry
+            exported = path
+            print(f"{display_name} [{quantization}]: accuracy {entry['optimized_accuracy']:.3f} "
+                  f"(float {entry['float_accuracy']:.3f}), concordancia {entry['top1_agreement']:.3f}, "
+                  f"latencia lote 1 {entry['latency_ms']['1']['optimized']:.2f} ms "
+                  f"(float {entry['latency_ms']['1']['float']:.2f} ms)")
+        if exported:
+            os.replace(exported, os.path.join(models_dir, f"{name}.tflite"))
+    
+    report_path = report_path or os.path.join(models_dir, "export_report.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Exporta los modelos a TFLite cuantizado")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--corpus-dir", default="data/processed")
+    parser.add_argument("--seq-length", type=int, default=100)
+    parser.add_argument("--quantization", nargs='+', default=['float16'], choices=QUANTIZATIONS)
+    args = parser.parse_args()
+    export_models(args.models_dir, args.corpus_dir, args.quantization, args.seq_length)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import numpy as np
+import tensorflow as tf
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+try:
+    from ..utils.profiling import span
+except ImportError:
+    # Importado como paquete de primer nivel (src en sys.path, p. ej. desde main.py)
+    from utils.profiling import span
+
+class GenerationCancelled(Exception):
+    """Se lanza desde un callback de progreso para interrumpir la generación"""
+
+class ContextRingBuffer:
+    """
+    Buffer circular preasignado con el contexto de cada melodía del lote
+
+    Cada valor se escribe dos veces (posición h y h + window), de modo que la
+    ventana actual siempre es un slice contiguo y nunca hace falta desplazar
+    ni copiar el contexto con np.append.
+    """
+
+    def __init__(self, batch_size: int, window: int, dtype=np.float32):
+        self.window = window
+        self.buffer = np.zeros((batch_size, 2 * window), dtype=dtype)
+        self.head = 0
+
+    def fill(self, seeds: np.ndarray) -> None:
+        """Inicializa el contexto con semillas de forma (lote, window)"""
+        self.buffer[:, :self.window] = seeds
+        self.buffer[:, self.window:] = seeds
+        self.head = 0
+
+    def push(self, values: np.ndarray) -> None:
+        """Añade un valor por melodía descartando el más antiguo"""
+        self.buffer[:, self.head] = values
+        self.buffer[:, self.head + self.window] = values
+        self.head = (self.head + 1) % self.window
+
+    def append(self, seeds: np.ndarray) -> None:
+        """Añade filas al lote con semillas (n, window), alineadas con la cabeza actual"""
+        rolled = np.roll(seeds, self.head, axis=1).astype(self.buffer.dtype)
+        self.buffer = np.concatenate([self.buffer, np.concatenate([rolled, rolled], axis=1)])
+
+    def reorder(self, rows: np.ndarray) -> None:
+        """Reordena (o duplica) las filas del lote, p. ej. al podar hipótesis en beam search"""
+        self.buffer = self.buffer[rows]
+
+    def view(self) -> np.ndarray:
+        """Ventana actual (del más antiguo al más reciente) sin copia"""
+        return self.buffer[:, self.head:self.head + self.window]
+
+def prepare_seed(seed_notes: Sequence[int], window: int) -> np.ndarray:
+    """
+    Ajusta una semilla de notas MIDI a la ventana de contexto del modelo
+
+    Las semillas cortas se completan repitiéndose cíclicamente por la izquierda
+    (la última nota de la semilla queda al final); las largas se recortan.
+    """
+    seed = np.asarray(seed_notes, dtype=np.int64)
+    if seed.size == 0:
+        raise ValueError("La semilla no contiene notas válidas")
+    if len(seed) >= window:
+        return seed[-window:]
+    return np.pad(seed, (window - len(seed), 0), mode='wrap')
+
+class GenerationEngine:
+    """
+    Motor de generación autorregresiva por lotes
+
+    Compila una única llamada por paso (tf.function sobre model(x, training=False))
+    con firma de lote variable, de modo que generar N melodías cuesta una
+    pasada del modelo por nota en lugar de N llamadas a model.predict.
+    También acepta modelos de inferencia exportados (ver models.export.TFLiteModel),
+    que ya están compilados y se llaman directamente.
+    """
+
+    def __init__(self, model, window: Optional[int] = None):
+        self.model = model
+        input_shape = tuple(model.input_shape)
+        self.window = window or input_shape[1]
+        self.feature_shape = input_shape[2:]
+        if isinstance(model, tf.keras.Model):
+            self.input_dtype = tf.as_dtype(model.inputs[0].dtype)
+            self._step = tf.function(
+                lambda x: self.model(x, training=False),
+                input_signature=[tf.TensorSpec((None, self.window) + self.feature_shape, self.input_dtype)]
+            )
+        else:
+            self.input_dtype = tf.as_dtype(model.input_dtype)
+            self._step = model
+
+    def predict_step(self, context: np.ndarray) -> np.ndarray:
+        """Probabilidades de la siguiente nota, de forma (lote, 128), para un contexto (lote, window)"""
+        x = context.reshape(context.shape + (1,) * len(self.feature_shape))
+        with span('generation.model_call', batch=len(x)):
+            return np.asarray(self._step(x.astype(self.input_dtype.as_numpy_dtype, copy=False)))
+
+    def generate(self, seeds: np.ndarray, length: int,
+                 select: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 callback: Optional[Callable[[int, np.ndarray], None]] = None) -> np.ndarray:
+        """
+        Genera length notas para cada semilla del lote
+
+        Args:
+            seeds: Semillas de forma (lote, window), ver prepare_seed
+            length: Número de notas a generar
+            select: Función que elige la nota a partir de las probabilidades
+                (lote, 128) -> (lote,); por defecto argmax
+            callback: Función llamada tras cada paso con (paso, notas del paso);
+                puede lanzar GenerationCancelled para detener la generación
+
+        Returns:
+            Array de forma (lote, length) con las notas generadas
+        """
+        seeds = np.atleast_2d(seeds)
+        generated = np.zeros((len(seeds), length), dtype=np.int64)
+        for i, notes in self.iter_generate(seeds, length, select):
+            generated[:, i] = notes
+            if callback is not None:
+                callback(i, generated[:, i])
+
+        return generated
+
+    def iter_generate(self, seeds: np.ndarray, length: int,
+                      select: Optional[Callable[[np.ndarray], np.ndarray]] = None
+                      ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Versión incremental de generate: produce (paso, notas del paso) nada más
+        predecir cada nota, para que el consumidor (p. ej. el render en
+        streaming) trabaje mientras el resto de la melodía aún no existe.
+        Cerrar el iterador detiene la generación.
+        """
+        seeds = np.atleast_2d(seeds)
+        if select is None:
+            select = lambda probs: np.argmax(probs, axis=-1)
+
+        context = ContextRingBuffer(len(seeds), self.window, dtype=self.input_dtype.as_numpy_dtype)
+        context.fill(seeds)
+
+        for i in range(length):
+            with span('generation.step', batch=len(seeds)):
+                probs = self.predict_step(context.view())
+                notes = np.asarray(select(probs), dtype=np.int64)
+                context.push(notes)
+            yield i, notes
+
+def stream_notes(engine: GenerationEngine, seed_notes: Sequence[int], length: int,
+                 select: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 callback: Optional[Callable[[int, np.ndarray], None]] = None) -> Iterator[int]:
+    """
+    Genera una melodía nota a nota como iterador de valores MIDI
+
+    Args:
+        engine: Motor de generación
+        seed_notes: Semilla (se ajusta a la ventana con prepare_seed)
+        length: Número de notas a generar
+        select: Función de selección (ver GenerationEngine.generate)
+        callback: Llamada tras cada paso con (paso, notas del paso); puede
+            lanzar GenerationCancelled
+    """
+    seed = prepare_seed(seed_notes, engine.window)[None]
+    for i, notes in engine.iter_generate(seed, length, select):
+        if callback is not None:
+            callback(i, notes)
+        yield int(notes[0])
@@ -0,0 +1,125 @@
+import numpy as np
+import tensorflow as tf
+from typing import Tuple
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+def split_windows(num_windows: int, validation_split: float = 0.2) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """
+    Divide los índices de ventana en entrenamiento y validación
+
+    Igual que validation_split de Keras, la validación son las últimas ventanas.
+
+    Returns:
+        Rangos (inicio, fin) de entrenamiento y de validación
+    """
+    num_val = int(num_windows * validation_split)
+    num_train = num_windows - num_val
+    return (0, num_train), (num_train, num_windows)
+
+def window_batch_loader(windows, augment=None, weights=None):
+    """
+    Crea la función que materializa un lote de ventanas a partir de sus índices
+
+    Devuelve X con forma (lote, seq_length - 1, 1) y objetivos enteros (lote,).
+    Si las ventanas son de tokens (WindowIndex con tokens=True), X son los
+    tokens enteros con forma (lote, seq_length - 1) para una capa Embedding.
+    Si se pasa augment (un BatchAugmenter) se aplica al lote recién leído.
+    Con weights (un peso por ventana) devuelve además los pesos del lote.
+    """
+    field = 'tokens' if windows.tokens else 'pitch'
+
+    def load_batch(indices):
+        batch = {field: windows.gather(field, indices)}
+        if augment is not None:
+            batch = augment(batch, indices)
+        sequences = batch[field]
+        if windows.tokens:
+            X = sequences[:, :-1].astype(np.int32)
+        else:
+            X = sequences[:, :-1, None].astype(np.float32)
+        y = sequences[:, -1].astype(np.int32)
+        if weights is not None:
+            return X, y, weights[indices].astype(np.float32)
+        return X, y
+    return load_batch
+
+def window_input_spec(windows) -> Tuple[tuple, tf.DType]:
+    """Forma (sin el lote) y tipo de X para las ventanas dadas"""
+    if windows.tokens:
+        return (windows.seq_length - 1,), tf.int32
+    return (windows.seq_length - 1, 1), tf.float32
+
+def make_dataset(windows, index_range: Tuple[int, int], batch_size: int = 64,
+                 shuffle: bool = True, shuffle_buffer: int = 100000, seed: int = None,
+                 augment=None, reshuffle: bool = True, skip_batches: int = 0,
+                 keep: np.ndarray = None, weights: np.ndarray = None) -> tf.data.Dataset:
+    """
+    Construye un tf.data.Dataset en streaming sobre un WindowIndex
+
+    Solo se barajan índices de ventana; las notas se leen del corpus mapeado en
+    memoria lote a lote, así que la memoria depende del tamaño de lote y no
+    del tamaño del dataset.
+
+    Args:
+        windows: WindowIndex sobre el corpus
+        index_range: Rango (inicio, fin) de índices de ventana
+        batch_size: Tamaño de lote
+        shuffle: Barajar las ventanas en cada época
+        shuffle_buffer: Tamaño máximo del buffer de barajado
+        seed: Semilla del barajado
+        augment: BatchAugmenter aplicado a cada lote (None para no aumentar)
+        reshuffle: Barajar de nuevo en cada iteración; con False y una semilla el
+            orden es fijo, lo que permite reanudar una época a medias
+        skip_batches: Lotes iniciales que se saltan (solo se descartan índices)
+        keep: Máscara por ventana (de todo el índice) de las que se usan, p. ej.
+            DedupIndex.keep para descartar duplicados
+        weights: Peso por ventana (de todo el índice), p. ej. DedupIndex.weights()
+
+    Returns:
+        Dataset de pares (X, y) con objetivos enteros para pérdidas sparse, o
+        de ternas (X, y, peso) si se pasan weights
+    """
+    start, stop = index_range
+    input_shape, input_dtype = window_input_spec(windows)
+    load_batch = window_batch_loader(windows, augment, weights)
+    output_types = (input_dtype, tf.int32) + ((tf.float32,) if weights is not None else ())
+
+    def load(indices):
+        batch = tf.numpy_function(load_batch, [indices], output_types)
+        batch[0].set_shape((None,) + input_shape)
+        for tensor in batch[1:]:
+            tensor.set_shape((None,))
+        return tuple(batch)
+
+    if keep is None:
+        dataset = tf.data.Dataset.range(start, stop)
+        size = stop - start
+    else:
+        # Solo se barajan los índices conservados
+        indices = start + np.flatnonzero(keep[start:stop])
+        dataset = tf.data.Dataset.from_tensor_slices(indices)
+        size = len(indices)
+    if shuffle:
+        dataset = dataset.shuffle(min(shuffle_buffer, max(size, 1)), seed=seed,
+                                  reshuffle_each_iteration=reshuffle)
+    dataset = dataset.batch(batch_size)
+    if skip_batches:
+        dataset = dataset.skip(skip_batches)
+    # Orden determinista también al barajar: con skip_batches se reconstruye
+    # exactamente la misma secuencia de lotes (y de aumentos) al reanudar
+    dataset = dataset.map(load, num_parallel_calls=AUTOTUNE, deterministic=True)
+    return dataset.prefetch(AUTOTUNE)
+
+def make_datasets(windows, batch_size: int = 64, validation_split: float = 0.2,
+                  seed: int = None, augment=None) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
+    """
+    Datasets de entrenamiento (barajado) y validación (en orden) sobre un WindowIndex
+
+    El aumento de datos solo se aplica al dataset de entrenamiento.
+    """
+    train_range, val_range = split_windows(len(windows), validation_split)
+    train_dataset = make_dataset(windows, train_range, batch_size, shuffle=True, seed=seed,
+                                 augment=augment)
+    val_dataset = make_dataset(windows, val_range, batch_size, shuffle=False)
+    return train_dataset, val_dataset
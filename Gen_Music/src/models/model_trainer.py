@@ -1,35 +1,189 @@
+import os
+import json
+import hashlib
+import multiprocessing
 import numpy as np
-from tensorflow.keras.utils import to_categorical
 from .cnn_model import build_cnn_model
 from .transformer_model import build_transformer_model
+from .input_pipeline import make_dataset, split_windows, window_batch_loader, window_input_spec
+from .checkpointing import ResumableTraining, CHECKPOINT_DIR_NAME
+from .distributed import make_strategy, configure_mixed_precision
+from .export import remove_exports
+from .registry import MODEL_FILES, model_file
+from ..data_processing.data_augmentation import BatchAugmenter
+from ..data_processing.dedup import DEDUP_MODES, DEFAULT_MAX_MISMATCHES, corpus_fingerprint, load_dedup_index
+from ..data_processing.event_tokens import VOCAB_SIZE
+from ..data_processing.note_corpus import NoteCorpus
+from ..data_processing.windowing import WindowIndex
+from ..utils.profiling import span, profiled
 
-def prepare_data(sequences):
-    """Prepara los datos para el entrenamiento"""
-    X = []
-    y = []
+@profiled('train.prepare_data')
+def prepare_data(corpus, seq_length=100, stride=1):
+    """Prepara en memoria todos los datos del corpus (X con canal, y como enteros)"""
+    windows = WindowIndex(corpus, seq_length, stride)
+    return window_batch_loader(windows)(np.arange(len(windows)))
+
+def build_model(name, input_shape, vocab_size=None):
+    """Construye y compila un modelo por su nombre visible (vocab_size para entrada de tokens)"""
+    if name == 'CNN':
+        return build_cnn_model(input_shape, vocab_size=vocab_size)
+    if name == 'Transformer':
+        model = build_transformer_model(input_shape, vocab_size=vocab_size)
+        model.compile(optimizer='adam', loss='sparse_categorical_crossentropy',
+                      metrics=['accuracy'])
+        return model
+    raise ValueError(f"Modelo desconocido: {name}")
+
+def run_fingerprint(windows, dedup=None, dedup_mode='drop'):
+    """
+    Huella de lo que determina un entrenamiento: el corpus que leen las
+    ventanas, su longitud y paso, la entrada (notas o tokens) y la deduplicación
+    """
+    settings = {
+        'corpus': corpus_fingerprint(windows.corpus, windows.tokens),
+        'seq_length': windows.seq_length,
+        'stride': windows.stride,
+        'tokens': windows.tokens,
+        'dedup': 'off' if dedup is None else dedup_mode,
+        'dedup_mismatches': None if dedup is None else dedup.max_mismatches
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+def train_model(name, windows, model_save_path, strategy, epochs=50, batch_size=64,
+                validation_split=0.2, augment=True, seed=None, resume=True, checkpoint_every=500,
+                dedup=None, dedup_mode='drop', **plateau):
+    """
+    Entrena un modelo con checkpoints, parada temprana y reducción del learning rate
+
+    Los checkpoints se guardan en <model_save_path>/checkpoints/<modelo>; si
+    resume y hay uno de un entrenamiento a medias con la misma huella (ver
+    run_fingerprint), el entrenamiento continúa desde él (incluida la época a
+    medias). Si no, o sin resume, se borran y se empieza de cero. Al terminar
+    se cargan los pesos con mejor val_loss.
+
+    Args:
+        dedup: DedupIndex de las ventanas (None para usarlas todas)
+        dedup_mode: 'drop' descarta los duplicados en entrenamiento y validación;
+            'weight' los conserva en entrenamiento con peso 1 / tamaño del grupo
+        plateau: Parámetros de ResumableTraining (patience, lr_patience, lr_factor, ...)
+
+    Returns:
+        Modelo entrenado
+    """
+    input_shape, _ = window_input_spec(windows)
+    with strategy.scope():
+        model = build_model(name, input_shape, VOCAB_SIZE if windows.tokens else None)
+        model.optimizer.build(model.trainable_variables)
     
-    for seq in sequences:
-        pitches = [note['pitch'] for note in seq]
-        X.append(pitches[:-1])
-        y.append(pitches[-1])
+    checkpoint_dir = os.path.join(model_save_path, CHECKPOINT_DIR_NAME,
+                                  os.path.splitext(model_file(name, windows.tokens))[0])
+    training = ResumableTraining(model, checkpoint_dir, seed=seed, save_every=checkpoint_every,
+                                 fingerprint=run_fingerprint(windows, dedup, dedup_mode), **plateau)
+    if not resume:
+        training.clear()
+    if training.restore():
+        print(f"{name}: reanudando desde la época {int(training.epoch.numpy()) + 1}, "
+              f"lote {int(training.step.numpy())}")
     
-    X = np.array(X)
-    y = to_categorical(np.array(y), num_classes=128)
+    global_batch_size = batch_size * strategy.num_replicas_in_sync
+    train_range, val_range = split_windows(len(windows), validation_split)
+    augmenter = BatchAugmenter(training.seed) if augment else None
+    keep = dedup.keep if dedup is not None and dedup_mode == 'drop' else None
+    weights = dedup.weights() if dedup is not None and dedup_mode == 'weight' else None
+    val_keep = keep
+    if keep is not None and val_range[1] > val_range[0] and not keep[val_range[0]:val_range[1]].any():
+        print(f"{name}: todas las ventanas de validación son duplicados; se validan sin deduplicar")
+        val_keep = None
+    val_dataset = make_dataset(windows, val_range, global_batch_size, shuffle=False, keep=val_keep)
     
-    return X, y
+    # Una llamada a fit por época: el orden de cada época es fijo y se puede reanudar
+    while not bool(training.stopped.numpy()) and int(training.epoch.numpy()) < epochs:
+        epoch = int(training.epoch.numpy())
+        print(f"{name}: época {epoch + 1}/{epochs}")
+        train_dataset = make_dataset(windows, train_range, global_batch_size,
+                                     seed=training.epoch_seed(epoch), augment=augmenter,
+                                     reshuffle=False, skip_batches=int(training.step.numpy()),
+                                     keep=keep, weights=weights)
+        with span('train.epoch', model=name, epoch=epoch + 1):
+            model.fit(train_dataset, epochs=epoch + 1, initial_epoch=epoch,
+                      validation_data=val_dataset, callbacks=[training])
+    
+    training.restore_best_weights()
+    training.mark_finished()
+    return model
+
+def train_models(data_path, model_save_path, seq_length=100, stride=1,
+                 epochs=50, batch_size=64, validation_split=0.2, augment=True, seed=None,
+                 models=None, num_workers=1, mixed_precision=False, parallel=False,
+                 resume=True, checkpoint_every=500, tokens=False, dedup='off',
+                 dedup_mismatches=DEFAULT_MAX_MISMATCHES, **plateau):
+    """
+    Entrena los modelos y los guarda (con aumento de datos por lote si augment)
 
-def train_models(data_path, model_save_path):
-    """Entrena ambos modelos y los guarda"""
-    sequences = np.load(data_path, allow_pickle=True)
-    X, y = prepare_data(sequences)
+    Args:
+        models: Nombres de los modelos a entrenar (None para todos)
+        num_workers: Réplicas de MirroredStrategy sobre dispositivos lógicos de CPU;
+            batch_size es el lote de cada réplica
+        mixed_precision: 'auto', True o False (ver distributed.configure_mixed_precision)
+        parallel: Entrenar cada modelo en su propio proceso, a la vez
+        resume: Reanudar desde el último checkpoint de cada modelo
+        checkpoint_every: Lotes entre checkpoints dentro de una época
+        tokens: Entrenar sobre tokens de eventos (alturas, desplazamientos, velocidades
+            y duraciones) con entrada Embedding; seq_length cuenta tokens
+        dedup: 'off', 'drop' (descartar ventanas duplicadas salvo transposición)
+            o 'weight' (reducir su peso); ver data_processing.dedup
+        dedup_mismatches: Intervalos distintos tolerados entre duplicados
+        plateau: Parámetros de parada temprana y learning rate (ver train_model)
+    """
+    models = list(models or MODEL_FILES)
+    os.makedirs(model_save_path, exist_ok=True)
+    
+    if parallel and len(models) > 1:
+        # Procesos 'spawn': cada uno inicializa TensorFlow con su propia configuración
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(target=train_models, name=f"train-{name}",
+                            args=(data_path, model_save_path),
+                            kwargs=dict(plateau, seq_length=seq_length, stride=stride, epochs=epochs,
+                                        batch_size=batch_size, validation_split=validation_split,
+                                        augment=augment, seed=seed, models=[name],
+                                        num_workers=num_workers, mixed_precision=mixed_precision,
+                                        resume=resume, checkpoint_every=checkpoint_every,
+                                        tokens=tokens, dedup=dedup,
+                                        dedup_mismatches=dedup_mismatches))
+            for name in models
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        failed = [p.name for p in processes if p.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"Falló el entrenamiento en: {', '.join(failed)}")
+        return
+    
+    strategy = make_strategy(num_workers)
+    if mixed_precision:
+        print(f"Política de precisión: {configure_mixed_precision(mixed_precision)}")
+    
+    corpus = NoteCorpus(data_path)
+    windows = WindowIndex(corpus, seq_length, stride, tokens=tokens)
     
-    # Entrenar CNN
-    cnn_model = build_cnn_model((X.shape[1], 1))
-    cnn_model.fit(X, y, epochs=50, batch_size=64, validation_split=0.2)
-    cnn_model.save(f"{model_save_path}/cnn_model.h5")
+    if dedup not in DEDUP_MODES:
+        raise ValueError(f"Modo de deduplicación desconocido: {dedup}")
+    index = None
+    if dedup != 'off' and tokens:
+        print("Deduplicación desactivada: solo se aplica a ventanas de notas")
+    elif dedup != 'off':
+        with span('train.dedup', windows=len(windows)):
+            index = load_dedup_index(windows, dedup_mismatches)
+        print(f"Ventanas duplicadas: {index.num_duplicates} de {len(index)} ({index.ratio:.1%}), "
+              f"modo {dedup}")
     
-    # Entrenar Transformer
-    transformer_model = build_transformer_model((X.shape[1],))
-    transformer_model.compile(optimizer='adam', loss='categorical_crossentropy')
-    transformer_model.fit(X, y, epochs=50, batch_size=64, validation_split=0.2)
-    transformer_model.save(f"{model_save_path}/transformer_model.h5")
\ No newline at end of file
+    for name in models:
+        model = train_model(name, windows, model_save_path, strategy, epochs, batch_size,
+                            validation_split, augment, seed, resume, checkpoint_every,
+                            dedup=index, dedup_mode=dedup, **plateau)
+        model.save(os.path.join(model_save_path, model_file(name, tokens)))
+        # Las exportaciones TFLite son de los pesos anteriores
+        remove_exports(model_save_path, os.path.splitext(model_file(name, tokens))[0])
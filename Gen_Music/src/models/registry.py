@@ -0,0 +1,19 @@
+import os
+
+# Nombre visible -> archivo del modelo entrenado. Sin dependencias pesadas:
+# batch_generate valida los manifiestos antes de importar TensorFlow.
+MODEL_FILES = {
+    'CNN': 'cnn_model.h5',
+    'Transformer': 'transformer_model.h5'
+}
+# Los modelos de tokens de eventos se guardan aparte: su salida no son alturas
+TOKEN_MODEL_SUFFIX = '_tokens'
+
+def model_file(name, tokens=False):
+    """Archivo del modelo entrenado (con o sin tokens de eventos)"""
+    stem, ext = os.path.splitext(MODEL_FILES[name])
+    return f"{stem}{TOKEN_MODEL_SUFFIX if tokens else ''}{ext}"
+
+def model_name(name, tokens=False):
+    """Nombre base del modelo (sin extensión), el que usa models.export.load_model"""
+    return os.path.splitext(model_file(name, tokens))[0]
@@ -0,0 +1,204 @@
+import numpy as np
+from typing import Callable, Optional, Tuple
+from .generation import ContextRingBuffer
+
+STRATEGIES = ('greedy', 'sample', 'beam')
+
+def apply_temperature(probs: np.ndarray, temperature: float) -> np.ndarray:
+    """Reescala probabilidades (lote, clases) con una temperatura y las renormaliza"""
+    if temperature == 1.0:
+        return probs
+    logits = np.log(np.maximum(probs, 1e-12)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+def top_k_filter(probs: np.ndarray, k: int) -> np.ndarray:
+    """Anula todas las probabilidades salvo las k mayores de cada fila"""
+    if k is None or k >= probs.shape[-1]:
+        return probs
+    kth = np.partition(probs, -k, axis=-1)[:, -k][:, None]
+    return np.where(probs >= kth, probs, 0.0)
+
+def top_p_filter(probs: np.ndarray, p: float) -> np.ndarray:
+    """Muestreo nucleus: conserva el menor conjunto de notas cuya probabilidad acumulada alcanza p"""
+    if p is None or p >= 1.0:
+        return probs
+    order = np.argsort(-probs, axis=-1)
+    sorted_probs = np.take_along_axis(probs, order, axis=-1)
+    cumulative = np.cumsum(sorted_probs, axis=-1)
+    # Se conserva cada nota cuya masa anterior aún no alcanza p (siempre al menos una)
+    keep_sorted = (cumulative - sorted_probs) < p * cumulative[:, -1:]
+    keep = np.zeros_like(keep_sorted)
+    np.put_along_axis(keep, order, keep_sorted, axis=-1)
+    return np.where(keep, probs, 0.0)
+
+def sample(probs: np.ndarray, temperature: float = 1.0, top_k: Optional[int] = None,
+           top_p: Optional[float] = None, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Muestrea una nota por fila de un tensor de probabilidades (lote, 128)
+
+    Args:
+        probs: Probabilidades de la siguiente nota para cada melodía del lote
+        temperature: Temperatura (0 equivale a argmax)
+        top_k: Limitar a las k notas más probables
+        top_p: Limitar al núcleo de probabilidad acumulada p
+        rng: Generador aleatorio de numpy
+
+    Returns:
+        Array (lote,) con la nota elegida para cada fila
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    if temperature == 0:
+        return np.argmax(probs, axis=-1)
+    if rng is None:
+        rng = np.random.default_rng()
+
+    probs = apply_temperature(probs, temperature)
+    probs = top_k_filter(probs, top_k)
+    probs = top_p_filter(probs, top_p)
+
+    # Muestreo por CDF inversa de todas las filas a la vez
+    cumulative = np.cumsum(probs, axis=-1)
+    thresholds = rng.random((len(probs), 1)) * cumulative[:, -1:]
+    choices = (cumulative <= thresholds).sum(axis=-1)
+    return np.minimum(choices, probs.shape[-1] - 1)
+
+def sample_rows(probs: np.ndarray, temperatures: np.ndarray, top_k: np.ndarray, top_p: np.ndarray,
+                rngs) -> np.ndarray:
+    """
+    Muestrea una nota por fila con parámetros de muestreo distintos en cada fila
+
+    Da lo mismo que llamar a sample fila a fila con el generador de cada una,
+    pero la temperatura, los filtros y la CDF se aplican a toda la matriz a
+    la vez; solo el número aleatorio se extrae por fila.
+
+    Args:
+        probs: Probabilidades de la siguiente nota (lote, 128)
+        temperatures: Temperatura por fila (0 equivale a argmax)
+        top_k: k por fila (0 para no limitar)
+        top_p: p por fila (1 para no limitar)
+        rngs: Un generador aleatorio de numpy por fila
+
+    Returns:
+        Array (lote,) con la nota elegida para cada fila
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    notes = np.argmax(probs, axis=-1)
+    rows = np.flatnonzero(np.asarray(temperatures) != 0)
+    if not len(rows):
+        return notes
+    num_classes = probs.shape[-1]
+    probs = probs[rows]
+
+    temperature = np.asarray(temperatures, dtype=np.float64)[rows, None]
+    logits = np.log(np.maximum(probs, 1e-12)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    probs = np.where(temperature == 1.0, probs, scaled / scaled.sum(axis=-1, keepdims=True))
+
+    # Un solo orden sirve para ambos filtros: top-k solo anula las menores
+    order = np.argsort(-probs, axis=-1)
+    sorted_probs = np.take_along_axis(probs, order, axis=-1)
+    k = np.asarray(top_k, dtype=np.int64)[rows]
+    k = np.where((k <= 0) | (k > num_classes), num_classes, k)
+    kth = sorted_probs[np.arange(len(rows)), k - 1][:, None]
+    probs = np.where(probs >= kth, probs, 0.0)
+
+    sorted_probs = np.take_along_axis(probs, order, axis=-1)
+    cumulative = np.cumsum(sorted_probs, axis=-1)
+    p = np.asarray(top_p, dtype=np.float64)[rows, None]
+    keep_sorted = ((cumulative - sorted_probs) < p * cumulative[:, -1:]) | (p >= 1.0)
+    keep = np.zeros_like(keep_sorted)
+    np.put_along_axis(keep, order, keep_sorted, axis=-1)
+    probs = np.where(keep, probs, 0.0)
+
+    cumulative = np.cumsum(probs, axis=-1)
+    thresholds = np.array([rngs[row].random() for row in rows])[:, None] * cumulative[:, -1:]
+    notes[rows] = np.minimum((cumulative <= thresholds).sum(axis=-1), num_classes - 1)
+    return notes
+
+def make_sampler(temperature: float = 1.0, top_k: Optional[int] = None, top_p: Optional[float] = None,
+                 seed: Optional[int] = None) -> Callable[[np.ndarray], np.ndarray]:
+    """Crea una función de selección para GenerationEngine.generate"""
+    rng = np.random.default_rng(seed)
+    return lambda probs: sample(probs, temperature, top_k, top_p, rng)
+
+def beam_search(engine, seeds: np.ndarray, length: int, beam_width: int = 4,
+                callback: Optional[Callable[[int, np.ndarray], None]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Búsqueda en haz para varias semillas a la vez
+
+    Todas las hipótesis de todas las semillas se evalúan en una sola pasada
+    del modelo por paso (lote de semillas x beam_width).
+
+    Args:
+        engine: GenerationEngine del modelo
+        seeds: Semillas de forma (semillas, window)
+        length: Número de notas a generar
+        beam_width: Hipótesis conservadas por semilla
+        callback: Función llamada tras cada paso con (paso, mejores notas del paso)
+
+    Returns:
+        Secuencias (semillas, beam_width, length) ordenadas de mejor a peor y
+        su log-probabilidad acumulada (semillas, beam_width)
+    """
+    seeds = np.atleast_2d(seeds)
+    num_seeds = len(seeds)
+
+    context = ContextRingBuffer(num_seeds * beam_width, engine.window,
+                                dtype=engine.input_dtype.as_numpy_dtype)
+    context.fill(np.repeat(seeds, beam_width, axis=0))
+
+    # Al principio todas las hipótesis son iguales: solo la primera puede expandirse
+    scores = np.full((num_seeds, beam_width), -np.inf)
+    scores[:, 0] = 0.0
+    sequences = np.zeros((num_seeds, beam_width, length), dtype=np.int64)
+    seed_rows = np.arange(num_seeds)[:, None] * beam_width
+
+    for i in range(length):
+        probs = engine.predict_step(context.view()).reshape(num_seeds, beam_width, -1)
+        num_classes = probs.shape[-1]
+        totals = (scores[..., None] + np.log(np.maximum(probs, 1e-12))).reshape(num_seeds, -1)
+
+        best = np.argpartition(-totals, beam_width - 1, axis=-1)[:, :beam_width]
+        best_scores = np.take_along_axis(totals, best, axis=-1)
+        order = np.argsort(-best_scores, axis=-1)
+        best = np.take_along_axis(best, order, axis=-1)
+        scores = np.take_along_axis(best_scores, order, axis=-1)
+
+        parents, notes = np.divmod(best, num_classes)
+        sequences = np.take_along_axis(sequences, parents[..., None], axis=1)
+        sequences[:, :, i] = notes
+        context.reorder((seed_rows + parents).ravel())
+        context.push(notes.ravel())
+        if callback is not None:
+            callback(i, notes[:, 0])
+
+    return sequences, scores
+
+def generate_takes(engine, seeds: np.ndarray, length: int, num_takes: int = 1,
+                   strategy: str = 'greedy', temperature: float = 1.0, top_k: Optional[int] = None,
+                   top_p: Optional[float] = None, beam_width: Optional[int] = None,
+                   seed: Optional[int] = None,
+                   callback: Optional[Callable[[int, np.ndarray], None]] = None) -> np.ndarray:
+    """
+    Genera num_takes variantes para cada semilla con la estrategia indicada
+
+    Returns:
+        Array (semillas, num_takes, length)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estrategia no soportada: {strategy}")
+    seeds = np.atleast_2d(seeds)
+
+    if strategy == 'beam':
+        sequences, _ = beam_search(engine, seeds, length, max(beam_width or num_takes, num_takes), callback)
+        return sequences[:, :num_takes]
+
+    if strategy == 'greedy':
+        select = None
+    else:
+        select = make_sampler(temperature, top_k, top_p, seed)
+    batch = np.repeat(seeds, num_takes, axis=0)
+    return engine.generate(batch, length, select, callback).reshape(len(seeds), num_takes, length)
@@ -1,7 +1,30 @@
+import tensorflow as tf
 from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Input, Dense, Dropout, LayerNormalization
 from tensorflow.keras.layers import MultiHeadAttention, Embedding, GlobalAveragePooling1D
 
+@tf.keras.utils.register_keras_serializable(package='gen_music')
+class TokenAndPositionEmbedding(tf.keras.layers.Layer):
+    """Embedding de tokens más embedding aprendido de la posición en la ventana"""
+
+    def __init__(self, sequence_length, vocab_size, embed_dim, **kwargs):
+        super().__init__(**kwargs)
+        self.sequence_length = sequence_length
+        self.vocab_size = vocab_size
+        self.embed_dim = embed_dim
+        self.token_embedding = Embedding(vocab_size, embed_dim)
+        self.position_embedding = Embedding(sequence_length, embed_dim)
+
+    def call(self, tokens):
+        positions = tf.range(tf.shape(tokens)[-1])
+        return self.token_embedding(tokens) + self.position_embedding(positions)
+
+    def get_config(self):
+        config = super().get_config()
+        config.update(sequence_length=self.sequence_length, vocab_size=self.vocab_size,
+                      embed_dim=self.embed_dim)
+        return config
+
 def transformer_encoder(inputs, head_size, num_heads, ff_dim, dropout=0):
     # Normalización y atención
     x = LayerNormalization(epsilon=1e-6)(inputs)
@@ -17,15 +40,31 @@ def transformer_encoder(inputs, head_size, num_heads, ff_dim, dropout=0):
     x = Dense(inputs.shape[-1])(x)
     return x + res
 
-def build_transformer_model(input_shape, head_size=256, num_heads=4, ff_dim=4, num_layers=4, dropout=0.25):
-    """Construye un modelo Transformer para generación musical"""
-    inputs = Input(shape=input_shape)
-    x = inputs
+def build_transformer_model(input_shape, head_size=None, num_heads=4, ff_dim=None, num_layers=4, dropout=0.25,
+                            vocab_size=None, embed_dim=64):
+    """
+    Construye un modelo Transformer para generación musical
+
+    Con vocab_size la entrada son tokens enteros de forma (seq_length,) con
+    embedding de token y de posición, y la salida es una distribución sobre el
+    vocabulario. head_size y ff_dim se ajustan por defecto a la anchura de la
+    entrada (256 y 4 con alturas como un canal float, como antes).
+    """
+    if vocab_size is None:
+        inputs = Input(shape=input_shape)
+        x = inputs
+        head_size = head_size or 256
+        ff_dim = ff_dim or 4
+    else:
+        inputs = Input(shape=input_shape, dtype='int32')
+        x = TokenAndPositionEmbedding(input_shape[0], vocab_size, embed_dim)(inputs)
+        head_size = head_size or embed_dim // num_heads
+        ff_dim = ff_dim or 4 * embed_dim
     
     for _ in range(num_layers):
         x = transformer_encoder(x, head_size, num_heads, ff_dim, dropout)
     
     x = GlobalAveragePooling1D()(x)
-    outputs = Dense(128, activation='softmax')(x)  # 128 pitches MIDI
+    outputs = Dense(vocab_size or 128, activation='softmax', dtype='float32')(x)  # 128 pitches MIDI
     
-    return Model(inputs, outputs)
\ No newline at end of file
+    return Model(inputs, outputs)
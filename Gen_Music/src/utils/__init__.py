@@ -3,31 +3,49 @@ Módulo de utilidades para el generador de melodías
 
 Contiene:
 - audio_utils: Funciones para manipulación y generación de audio
+- audio_stream: Render de audio en streaming, nota a nota
 - music_utils: Utilidades para teoría musical y conversiones
+- render_cache: Caché en disco del audio renderizado
+- profiling: Instrumentación opcional (spans, contadores, trazas y perfiles)
+
+Los submódulos se importan de forma diferida (PEP 562): importar una función
+de music_utils no carga pydub, pretty_midi ni soundfile.
 """
+import importlib
 
-from .audio_utils import (
-    generate_audio_from_predictions,
-    midi_to_mp3,
-    normalize_audio,
-    concatenate_audio_files
-)
-from .music_utils import (
-    note_to_midi,
-    midi_to_note,
-    note_to_frequency,
-    scale_to_midi_notes,
-    chord_to_midi_notes,
-    is_valid_note,
-    is_valid_scale,
-    is_valid_chord
-)
+# Nombre exportado -> submódulo que lo define
+_EXPORTS = {
+    'generate_audio_from_predictions': 'audio_utils',
+    'midi_to_mp3': 'audio_utils',
+    'normalize_audio': 'audio_utils',
+    'concatenate_audio_files': 'audio_utils',
+    'stream_audio': 'audio_stream',
+    'stream_to_wav': 'audio_stream',
+    'RenderCache': 'render_cache',
+    'default_render_cache': 'render_cache',
+    'note_to_midi': 'music_utils',
+    'midi_to_note': 'music_utils',
+    'note_to_frequency': 'music_utils',
+    'scale_to_midi_notes': 'music_utils',
+    'chord_to_midi_notes': 'music_utils',
+    'is_valid_note': 'music_utils',
+    'is_valid_scale': 'music_utils',
+    'is_valid_chord': 'music_utils',
+    'parse_music_input': 'music_utils',
+    'midi_to_frequency': 'music_utils',
+    'midi_to_note_names': 'music_utils',
+    'note_names_to_midi': 'music_utils'
+}
 
 __all__ = [
     'generate_audio_from_predictions',
     'midi_to_mp3',
     'normalize_audio',
     'concatenate_audio_files',
+    'stream_audio',
+    'stream_to_wav',
+    'RenderCache',
+    'default_render_cache',
     'note_to_midi',
     'midi_to_note',
     'note_to_frequency',
@@ -35,5 +53,20 @@ __all__ = [
     'chord_to_midi_notes',
     'is_valid_note',
     'is_valid_scale',
-    'is_valid_chord'
-]
\ No newline at end of file
+    'is_valid_chord',
+    'parse_music_input',
+    'midi_to_frequency',
+    'midi_to_note_names',
+    'note_names_to_midi'
+]
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
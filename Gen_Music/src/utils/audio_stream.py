@@ -0,0 +1,237 @@
+"""
+Render de audio en streaming, nota a nota
+
+Conecta un iterador de notas (p. ej. models.generation.stream_notes) con el
+sintetizador: cada nota se sintetiza en cuanto llega y las muestras que ya no
+pueden cambiar (las anteriores al inicio de la nota siguiente) se emiten como
+un bloque. Así el primer audio está disponible tras la primera predicción, no
+al final de la melodía.
+
+La colocación de las notas es la de generate_audio_from_predictions. El
+volumen durante el streaming es una ganancia fija (la normalización por RMS
+necesita la toma completa); stream_to_wav normaliza el archivo al terminar.
+stream_to_file además entrega el formato pedido y pasa por la caché de audio.
+"""
+import os
+import wave
+import numpy as np
+import soundfile as sf
+from typing import Callable, Iterable, Iterator, Optional
+from .audio_utils import (SAMPLE_RATE, INSTRUMENT_PROGRAMS, synth_preset, cached_note_waveform,
+                          normalize_audio_stream, audio_cache_key, write_audio)
+from .profiling import span
+from .render_cache import default_render_cache
+
+# Ganancia fija durante el streaming (-6 dB de margen para el solapamiento de colas)
+STREAM_GAIN = 0.5
+
+class StreamingRenderer:
+    """
+    Sintetizador incremental: push(nota) devuelve las muestras ya definitivas
+
+    Solo guarda las muestras pendientes (la cola de liberación de las notas
+    recientes), así que la memoria no crece con la longitud de la melodía.
+    """
+
+    def __init__(self, instrument_type: str = "piano", tempo: int = 120, note_duration: float = 0.5,
+                 velocity: int = 100, sample_rate: int = SAMPLE_RATE, gain: float = STREAM_GAIN):
+        program = INSTRUMENT_PROGRAMS.get(instrument_type.lower(), 0)
+        self.wave_type, self.adsr = synth_preset(program)
+        self.sample_rate = sample_rate
+        self.step = note_duration * 60.0 / tempo
+        self.gain = gain * velocity / 127.0
+        self.num_notes = 0
+        self.emitted = 0  # Muestras ya devueltas
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def _position(self, index: int) -> int:
+        return int(round(index * self.step * self.sample_rate))
+
+    def push(self, pitch: int) -> np.ndarray:
+        """
+        Añade la siguiente nota (fuera de 0-127 se trata como silencio)
+
+        Returns:
+            Bloque float32 con las muestras anteriores al inicio de la nota siguiente
+        """
+        index = self.num_notes
+        self.num_notes += 1
+        if 0 <= pitch <= 127:
+            start = self._position(index)
+            length = max(int(round(self.step * self.sample_rate)), 1)
+            wave = cached_note_waveform(int(pitch), length, self.wave_type, self.adsr, self.sample_rate)
+            offset = start - self.emitted
+            if len(self.pending) < offset + len(wave):
+                self.pending = np.concatenate(
+                    [self.pending, np.zeros(offset + len(wave) - len(self.pending), dtype=np.float32)])
+            self.pending[offset:offset + len(wave)] += self.gain * wave
+        return self._emit(self._position(index + 1))
+
+    def flush(self) -> np.ndarray:
+        """Devuelve lo que queda (la liberación de la última nota)"""
+        return self._emit(self.emitted + len(self.pending))
+
+    def _emit(self, until: int) -> np.ndarray:
+        count = until - self.emitted
+        if len(self.pending) < count:
+            self.pending = np.concatenate(
+                [self.pending, np.zeros(count - len(self.pending), dtype=np.float32)])
+        chunk, self.pending = self.pending[:count], self.pending[count:]
+        self.emitted = until
+        return chunk
+
+def stream_audio(notes: Iterable[int], instrument_type: str = "piano", tempo: int = 120,
+                 note_duration: float = 0.5, velocity: int = 100,
+                 sample_rate: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Convierte un iterador de notas en un iterador de bloques de audio
+
+    Cada bloque se produce en cuanto llega su nota; al agotarse las notas se
+    emite la cola final.
+    """
+    renderer = StreamingRenderer(instrument_type, tempo, note_duration, velocity, sample_rate)
+    for pitch in notes:
+        with span('audio.stream_note'):
+            chunk = renderer.push(pitch)
+        yield chunk
+    yield renderer.flush()
+
+class WavStreamWriter:
+    """
+    Escritor WAV PCM de 16 bits que mantiene la cabecera válida tras cada bloque
+
+    wave actualiza los tamaños de la cabecera en cada writeframes, de modo que
+    un reproductor puede abrir el archivo mientras todavía se está escribiendo.
+    """
+
+    def __init__(self, output_path: str, sample_rate: int = SAMPLE_RATE, channels: int = 1):
+        self.output_path = output_path
+        self.samples_written = 0
+        self._writer = wave.open(output_path, 'wb')
+        self._writer.setnchannels(channels)
+        self._writer.setsampwidth(2)
+        self._writer.setframerate(sample_rate)
+
+    def write(self, chunk: np.ndarray) -> None:
+        pcm = (np.clip(chunk, -1.0, 1.0) * 32767).astype('<i2')
+        self._writer.writeframes(pcm.tobytes())
+        self.samples_written += len(chunk)
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def stream_to_wav(
+    notes: Iterable[int],
+    output_path: str,
+    instrument_type: str = "piano",
+    tempo: int = 120,
+    note_duration: float = 0.5,
+    velocity: int = 100,
+    normalize: bool = True,
+    on_chunk: Optional[Callable[[np.ndarray, int], None]] = None
+) -> str:
+    """
+    Sintetiza un iterador de notas en un WAV que crece a medida que llegan
+
+    Args:
+        notes: Iterador de valores MIDI (p. ej. models.generation.stream_notes)
+        output_path: Ruta del WAV de salida
+        instrument_type: Tipo de instrumento (piano, synth, etc.)
+        tempo: Tempo en BPM
+        note_duration: Duración de cada nota en beats
+        velocity: Velocidad de las notas (0-127)
+        normalize: Normalizar el archivo completo al terminar (como
+            generate_audio_from_predictions)
+        on_chunk: Llamada tras escribir cada bloque con (bloque, muestras escritas)
+
+    Returns:
+        Ruta al archivo generado (si el iterador falla o se cancela, el archivo
+        parcial se elimina)
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    try:
+        with WavStreamWriter(output_path) as writer:
+            for chunk in stream_audio(notes, instrument_type, tempo, note_duration, velocity):
+                writer.write(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk, writer.samples_written)
+        if normalize:
+            normalize_audio_stream(output_path, output_path)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return output_path
+
+def stream_to_file(
+    notes: Iterable[int],
+    output_path: str,
+    instrument_type: str = "piano",
+    tempo: int = 120,
+    note_duration: float = 0.5,
+    velocity: int = 100,
+    on_chunk: Optional[Callable[[np.ndarray, int], None]] = None,
+    stream_path: Optional[str] = None,
+    use_cache: bool = True
+) -> str:
+    """
+    Streaming con el formato de salida y la caché de generate_audio_from_predictions
+
+    El audio se escribe en un WAV que crece (stream_path) y que puede
+    reproducirse desde el primer bloque. Al terminar, la toma se busca en la
+    caché de audio con la misma clave que generate_audio_from_predictions: si
+    está, se copia a output_path; si no, el WAV se codifica una sola vez al
+    formato de output_path y el resultado se guarda en la caché. El WAV
+    intermedio se borra cuando el formato final es otro.
+
+    Args:
+        notes: Iterador de valores MIDI (p. ej. models.generation.stream_notes)
+        output_path: Ruta del archivo final; su extensión decide el formato
+        instrument_type, tempo, note_duration, velocity: Ver stream_to_wav
+        on_chunk: Ver stream_to_wav
+        stream_path: WAV que crece durante el streaming (por defecto
+            output_path con extensión .wav)
+        use_cache: Consultar y actualizar la caché de audio
+
+    Returns:
+        Ruta al archivo final
+    """
+    format = output_path.split('.')[-1].lower()
+    stream_path = stream_path or os.path.splitext(output_path)[0] + '.wav'
+    played = []
+
+    def record(notes):
+        for pitch in notes:
+            played.append(pitch)
+            yield pitch
+
+    stream_to_wav(record(notes), stream_path, instrument_type, tempo, note_duration, velocity,
+                  on_chunk=on_chunk)
+
+    cache = default_render_cache() if use_cache else None
+    key = audio_cache_key(played, instrument_type, tempo, note_duration, velocity, format)
+    hit = False
+    if stream_path != output_path:
+        hit = cache is not None and cache.get(key, format, output_path)
+        if not hit:
+            samples, sample_rate = sf.read(stream_path, dtype='float32')
+            write_audio(samples, output_path, sample_rate)
+        try:
+            os.remove(stream_path)
+        except OSError:
+            # Puede seguir abierto en un reproductor (Windows no deja borrarlo)
+            pass
+    if cache is not None and not hit:
+        try:
+            cache.put(key, format, output_path)
+        except OSError as e:
+            print(f"No se pudo guardar el audio en la caché: {e}")
+    return output_path
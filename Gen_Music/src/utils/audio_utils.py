@@ -1,12 +1,60 @@
 import os
+import wave
+import itertools
+import threading
 import numpy as np
 from pydub import AudioSegment, effects
 from pydub.generators import Sine, Sawtooth, Square, Pulse
 import pretty_midi
 from datetime import datetime
-from typing import Union, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Union, List, Optional, Callable
 import tempfile
 import soundfile as sf
+from .music_utils import note_to_frequency
+from .profiling import profiled
+from .render_cache import default_render_cache, render_cache_key
+
+SAMPLE_RATE = 44100
+
+# Memoria máxima de la caché de formas de onda de notas (por proceso)
+WAVEFORM_CACHE_BYTES = 16 * 1024 * 1024
+
+# Cambiar al modificar la síntesis o la normalización para invalidar la caché de audio
+RENDERER_VERSION = 1
+
+# Estimación del pico real: sobremuestreo y longitud del filtro de interpolación
+TRUE_PEAK_OVERSAMPLE = 4
+TRUE_PEAK_TAPS = 16
+
+# Programa General MIDI de cada tipo de instrumento
+INSTRUMENT_PROGRAMS = {
+    "piano": 0,
+    "synth": 80,
+    "guitar": 24,
+    "strings": 48,
+    "bass": 32
+}
+
+# Oscilador y envolvente ADSR (ataque, caída, sostenido, liberación) por familia de programas GM
+SYNTH_PRESETS = {
+    'piano': ('sine', (0.005, 0.3, 0.4, 0.15)),
+    'guitar': ('pulse', (0.005, 0.2, 0.3, 0.1)),
+    'bass': ('square', (0.01, 0.1, 0.8, 0.05)),
+    'strings': ('sawtooth', (0.08, 0.1, 0.9, 0.2)),
+    'synth': ('sawtooth', (0.01, 0.05, 0.7, 0.1))
+}
+
+@profiled('audio.generate_audio_from_predictions')
+def audio_cache_key(predictions, instrument_type: str, tempo: int, note_duration: float,
+                    velocity: int, format: str) -> str:
+    """Clave de la caché de audio para una toma y sus parámetros de render"""
+    return render_cache_key(predictions, {
+        'renderer': RENDERER_VERSION, 'sample_rate': SAMPLE_RATE,
+        'instrument': instrument_type.lower(), 'tempo': tempo,
+        'note_duration': note_duration, 'velocity': velocity, 'format': format.lower()
+    })
 
 def generate_audio_from_predictions(
     predictions: Union[List[int], np.ndarray],
@@ -15,11 +63,17 @@ def generate_audio_from_predictions(
     tempo: int = 120,
     note_duration: float = 0.5,
     velocity: int = 100,
-    format: str = "mp3"
+    format: str = "mp3",
+    progress_callback: Optional[Callable[[str], None]] = None,
+    use_cache: bool = True,
+    output_path: Optional[str] = None
 ) -> str:
     """
     Genera un archivo de audio a partir de predicciones de notas MIDI
     
+    Si la misma toma ya se renderizó con los mismos parámetros, el archivo se
+    toma de la caché de audio (ver render_cache) sin volver a sintetizarlo.
+    
     Args:
         predictions: Lista de valores MIDI (0-127)
         output_dir: Directorio de salida
@@ -28,24 +82,31 @@ def generate_audio_from_predictions(
         note_duration: Duración de cada nota en segundos
         velocity: Velocidad de las notas (0-127)
         format: Formato de salida (mp3, wav)
+        progress_callback: Función llamada al empezar cada etapa ('midi', 'render', 'done')
+        use_cache: Reutilizar renders anteriores idénticos
+        output_path: Ruta exacta del archivo (por defecto melody_<fecha>.<formato>
+            dentro de output_dir)
         
     Returns:
         Ruta al archivo generado
     """
-    os.makedirs(output_dir, exist_ok=True)
+    if output_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        output_path = os.path.join(output_dir, f"melody_{timestamp}.{format}")
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    if progress_callback is not None:
+        progress_callback('midi')
     
-    # Crear objeto PrettyMIDI
-    pm = pretty_midi.PrettyMIDI()
+    cache = default_render_cache() if use_cache else None
+    if cache is not None:
+        key = audio_cache_key(predictions, instrument_type, tempo, note_duration, velocity, format)
+        if cache.get(key, format.lower(), output_path):
+            if progress_callback is not None:
+                progress_callback('done')
+            return output_path
     
     # Seleccionar instrumento según tipo
-    program = {
-        "piano": 0,
-        "synth": 80,
-        "guitar": 24,
-        "strings": 48,
-        "bass": 32
-    }.get(instrument_type.lower(), 0)
-    
+    program = INSTRUMENT_PROGRAMS.get(instrument_type.lower(), 0)
     instrument = pretty_midi.Instrument(program=program)
     
     # Calcular tiempo por beat según tempo
@@ -64,48 +125,335 @@ def generate_audio_from_predictions(
             instrument.notes.append(note)
         current_time += note_duration * beat_duration
     
-    pm.instruments.append(instrument)
+    # Sintetizar en memoria y escribir directamente el formato deseado
+    if progress_callback is not None:
+        progress_callback('render')
+    samples = normalize_buffer(render_instrument(instrument))
+    write_audio(samples, output_path)
+    if cache is not None:
+        try:
+            cache.put(key, format.lower(), output_path)
+        except OSError as e:
+            print(f"No se pudo guardar el audio en la caché: {e}")
     
-    # Guardar archivo MIDI temporal
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    midi_path = os.path.join(tempfile.gettempdir(), f"temp_{timestamp}.mid")
-    pm.write(midi_path)
+    if progress_callback is not None:
+        progress_callback('done')
     
-    # Convertir a formato de audio deseado
-    output_path = os.path.join(output_dir, f"melody_{timestamp}.{format}")
-    midi_to_mp3(midi_path, output_path)
+    return output_path
+
+def synth_preset(program: int, is_drum: bool = False):
+    """Devuelve (tipo de onda, ADSR) para un programa General MIDI"""
+    if is_drum:
+        return 'square', (0.001, 0.05, 0.0, 0.02)
+    if program < 8:
+        return SYNTH_PRESETS['piano']
+    if 24 <= program < 32:
+        return SYNTH_PRESETS['guitar']
+    if 32 <= program < 40:
+        return SYNTH_PRESETS['bass']
+    if 40 <= program < 56:
+        return SYNTH_PRESETS['strings']
+    if 80 <= program < 96:
+        return SYNTH_PRESETS['synth']
+    return SYNTH_PRESETS['piano']
+
+def adsr_envelope(
+    num_samples: int,
+    release_samples: int,
+    sample_rate: int = SAMPLE_RATE,
+    adsr: tuple = (0.01, 0.1, 0.7, 0.1)
+) -> np.ndarray:
+    """
+    Genera una envolvente ADSR vectorizada
     
-    # Limpiar archivo temporal
-    os.remove(midi_path)
+    Args:
+        num_samples: Muestras mientras la nota está pulsada
+        release_samples: Muestras de liberación tras soltar la nota
+        sample_rate: Tasa de muestreo
+        adsr: (ataque s, caída s, nivel de sostenido 0-1, liberación s)
+        
+    Returns:
+        Array de num_samples + release_samples valores entre 0 y 1
+    """
+    attack, decay, sustain, _ = adsr
+    t = np.arange(num_samples, dtype=np.float32) / sample_rate
+    attack = max(attack, 1.0 / sample_rate)
+    held = np.where(
+        t < attack,
+        t / attack,
+        sustain + (1.0 - sustain) * np.exp(-(t - attack) / max(decay, 1e-6))
+    ).astype(np.float32)
     
-    return output_path
+    # La liberación parte del nivel alcanzado al soltar la nota
+    level = held[-1] if num_samples else 0.0
+    release = level * np.linspace(1.0, 0.0, release_samples, endpoint=False, dtype=np.float32)
+    return np.concatenate([held, release])
+
+def note_waveform(
+    pitch: int,
+    num_samples: int,
+    wave_type: str,
+    adsr: tuple,
+    sample_rate: int = SAMPLE_RATE
+) -> np.ndarray:
+    """Forma de onda con envolvente de una nota (num_samples más la liberación)"""
+    release_samples = int(adsr[3] * sample_rate)
+    total = num_samples + release_samples
+    t = np.arange(total, dtype=np.float64) / sample_rate
+    wave = _oscillator(t, note_to_frequency(int(pitch)), wave_type)
+    return (wave * adsr_envelope(num_samples, release_samples, sample_rate, adsr)).astype(np.float32)
+
+_waveform_cache = OrderedDict()
+_waveform_cache_bytes = 0
+_waveform_lock = threading.Lock()
+
+def cached_note_waveform(
+    pitch: int,
+    num_samples: int,
+    wave_type: str,
+    adsr: tuple,
+    sample_rate: int = SAMPLE_RATE
+) -> np.ndarray:
+    """
+    note_waveform cacheada por (pitch, duración, tipo de onda)
+    
+    La caché es LRU y está acotada en bytes (WAVEFORM_CACHE_BYTES), no en
+    entradas: las notas largas ocupan mucho más que las cortas. El array
+    devuelto es de solo lectura porque se comparte entre llamadas.
+    """
+    global _waveform_cache_bytes
+    key = (int(pitch), int(num_samples), wave_type, adsr, sample_rate)
+    with _waveform_lock:
+        wave = _waveform_cache.get(key)
+        if wave is not None:
+            _waveform_cache.move_to_end(key)
+            return wave
+    
+    wave = note_waveform(pitch, num_samples, wave_type, adsr, sample_rate)
+    wave.flags.writeable = False
+    with _waveform_lock:
+        if key not in _waveform_cache and wave.nbytes <= WAVEFORM_CACHE_BYTES:
+            _waveform_cache[key] = wave
+            _waveform_cache_bytes += wave.nbytes
+            while _waveform_cache_bytes > WAVEFORM_CACHE_BYTES:
+                _, evicted = _waveform_cache.popitem(last=False)
+                _waveform_cache_bytes -= evicted.nbytes
+    return wave
 
+@profiled('audio.render_instrument')
+def render_instrument(
+    instrument: pretty_midi.Instrument,
+    sample_rate: int = SAMPLE_RATE,
+    wave_type: Optional[str] = None,
+    out: Optional[np.ndarray] = None,
+    cache: bool = True
+) -> np.ndarray:
+    """
+    Sintetiza todas las notas de un instrumento en un único buffer mono
+    
+    Las formas de onda se suman por solapamiento (overlap-add) en un buffer
+    preasignado; con cache, cada combinación (pitch, duración, onda) se
+    sintetiza una sola vez.
+    
+    Args:
+        instrument: Instrumento de pretty_midi
+        sample_rate: Tasa de muestreo
+        wave_type: Tipo de onda (None para elegirlo según el programa)
+        out: Buffer donde acumular (None para crear uno nuevo)
+        cache: Reutilizar formas de onda (ver cached_note_waveform); solo
+            compensa si las duraciones se repiten
+        
+    Returns:
+        Buffer float32 con las muestras
+    """
+    preset_wave, adsr = synth_preset(instrument.program, instrument.is_drum)
+    wave_type = wave_type or preset_wave
+    release_samples = int(adsr[3] * sample_rate)
+    
+    if not instrument.notes:
+        return out if out is not None else np.zeros(0, dtype=np.float32)
+    
+    starts = np.array([n.start for n in instrument.notes])
+    ends = np.array([n.end for n in instrument.notes])
+    start_samples = np.round(starts * sample_rate).astype(np.int64)
+    lengths = np.maximum(np.round((ends - starts) * sample_rate).astype(np.int64), 1)
+    gains = np.array([n.velocity for n in instrument.notes], dtype=np.float32) / 127.0
+    
+    total = int((start_samples + lengths).max()) + release_samples
+    if out is None:
+        out = np.zeros(total, dtype=np.float32)
+    elif len(out) < total:
+        raise ValueError("El buffer de salida es demasiado corto")
+    
+    waveform = cached_note_waveform if cache else note_waveform
+    for note, start, length, gain in zip(instrument.notes, start_samples, lengths, gains):
+        wave = waveform(note.pitch, int(length), wave_type, adsr, sample_rate)
+        out[start:start + len(wave)] += gain * wave
+    
+    return out
+
+def render_midi(pm: pretty_midi.PrettyMIDI, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Sintetiza todos los instrumentos de un PrettyMIDI en un único buffer mono
+    
+    Sin caché de formas de onda: en un MIDI interpretado las duraciones son
+    prácticamente continuas y casi nunca se repiten.
+    """
+    release = max(adsr[3] for _, adsr in SYNTH_PRESETS.values())
+    total = int((pm.get_end_time() + release) * sample_rate) + 1
+    buffer = np.zeros(total, dtype=np.float32)
+    for instrument in pm.instruments:
+        render_instrument(instrument, sample_rate, out=buffer, cache=False)
+    return buffer
+
+@profiled('audio.write_audio')
+def write_audio(samples: np.ndarray, output_path: str, sample_rate: int = SAMPLE_RATE) -> None:
+    """
+    Escribe un buffer de muestras en el formato indicado por la extensión
+    
+    WAV/FLAC/OGG se escriben directamente con soundfile; MP3 se codifica una
+    sola vez con pydub a partir del buffer en memoria.
+    """
+    samples = np.clip(samples, -1.0, 1.0)
+    extension = output_path.split('.')[-1].lower()
+    
+    if extension == 'mp3':
+        pcm = (samples * 32767).astype(np.int16)
+        segment = AudioSegment(pcm.tobytes(), frame_rate=sample_rate,
+                               sample_width=2, channels=1 if pcm.ndim == 1 else pcm.shape[1])
+        segment.export(output_path, format="mp3", bitrate="192k")
+    else:
+        sf.write(output_path, samples, sample_rate)
+
+@profiled('audio.midi_to_mp3')
 def midi_to_mp3(midi_path: str, output_path: str) -> None:
     """
-    Convierte un archivo MIDI a MP3 usando soundfont
+    Convierte un archivo MIDI a audio con el sintetizador interno
     
     Args:
         midi_path: Ruta al archivo MIDI
-        output_path: Ruta de salida para el MP3
+        output_path: Ruta de salida (mp3, wav, flac u ogg)
     """
     try:
-        # Usar soundfont para mejor calidad
-        soundfont = "/usr/share/sounds/sf2/FluidR3_GM.sf2"  # Ajustar según sistema
+        pm = pretty_midi.PrettyMIDI(midi_path)
         
-        if os.path.exists(soundfont):
-            # Convertir usando fluidsynth si está disponible
-            os.system(f"fluidsynth -ni {soundfont} {midi_path} -F {output_path} -r 44100")
-            
-            # Normalizar volumen
-            normalize_audio(output_path)
-        else:
-            # Conversión básica si no hay soundfont
-            midi_audio = AudioSegment.from_file(midi_path, format="mid")
-            midi_audio.export(output_path, format="mp3", bitrate="192k")
+        # Normalizar volumen sobre el buffer antes de la única codificación
+        write_audio(normalize_buffer(render_midi(pm)), output_path)
     except Exception as e:
         print(f"Error convirtiendo MIDI a MP3: {str(e)}")
         raise
 
+def _true_peak_filters(oversample: int = TRUE_PEAK_OVERSAMPLE, taps: int = TRUE_PEAK_TAPS) -> np.ndarray:
+    """Filtros polifásicos (sinc con ventana) para interpolar entre muestras"""
+    n = np.arange(taps) - taps // 2 + 1
+    phases = np.arange(1, oversample) / oversample
+    filters = np.sinc(n[None, :] - phases[:, None]) * np.hanning(taps + 2)[1:-1]
+    return filters / filters.sum(axis=1, keepdims=True)
+
+def true_peak(samples: np.ndarray, oversample: int = TRUE_PEAK_OVERSAMPLE) -> float:
+    """
+    Estima el pico real (entre muestras) de un buffer sobremuestreándolo
+    
+    Args:
+        samples: Buffer (muestras,) o (muestras, canales)
+        oversample: Factor de sobremuestreo
+        
+    Returns:
+        Valor absoluto máximo estimado (escala lineal)
+    """
+    if samples.size == 0:
+        return 0.0
+    data = samples.reshape(len(samples), -1)
+    peak = float(np.abs(data).max())
+    for fir in _true_peak_filters(oversample):
+        for channel in data.T:
+            peak = max(peak, float(np.abs(np.convolve(channel, fir, mode='valid')).max(initial=0.0)))
+    return peak
+
+def _normalization_gain(sum_squares: float, count: int, peak: float,
+                        target_dBFS: float, peak_dBFS: Optional[float]) -> float:
+    """Ganancia lineal para llevar el RMS a target_dBFS sin superar el techo de pico"""
+    if count == 0 or sum_squares <= 0:
+        return 1.0
+    rms_dBFS = 10 * np.log10(sum_squares / count)
+    gain = 10 ** ((target_dBFS - rms_dBFS) / 20)
+    if peak_dBFS is not None and peak > 0:
+        gain = min(gain, 10 ** (peak_dBFS / 20) / peak)
+    return float(gain)
+
+@profiled('audio.normalize_buffer')
+def normalize_buffer(
+    samples: np.ndarray,
+    target_dBFS: float = -20.0,
+    peak_dBFS: Optional[float] = -1.0
+) -> np.ndarray:
+    """
+    Normaliza un buffer en memoria al RMS objetivo en una sola pasada de NumPy
+    
+    Args:
+        samples: Buffer float (muestras,) o (muestras, canales)
+        target_dBFS: Nivel RMS objetivo
+        peak_dBFS: Techo de pico real; la ganancia se limita para no superarlo
+            (None para desactivar la limitación)
+        
+    Returns:
+        El mismo buffer, escalado in situ
+    """
+    sum_squares = float(np.dot(samples.ravel(), samples.ravel()))
+    peak = true_peak(samples) if peak_dBFS is not None else 0.0
+    samples *= _normalization_gain(sum_squares, samples.size, peak, target_dBFS, peak_dBFS)
+    return samples
+
+def normalize_audio_stream(
+    input_path: str,
+    output_path: str,
+    target_dBFS: float = -20.0,
+    peak_dBFS: Optional[float] = -1.0,
+    block_size: int = 65536
+) -> None:
+    """
+    Normaliza un archivo largo por bloques con memoria constante
+    
+    Primera pasada: mide RMS y pico real bloque a bloque. Segunda pasada:
+    aplica la ganancia y escribe el resultado. Solo formatos de soundfile
+    (WAV, FLAC, OGG).
+    
+    Args:
+        input_path: Archivo de entrada
+        output_path: Archivo de salida (puede ser el mismo que la entrada)
+        target_dBFS: Nivel RMS objetivo
+        peak_dBFS: Techo de pico real (None para desactivar)
+        block_size: Muestras por bloque
+    """
+    info = sf.info(input_path)
+    sum_squares, count, peak = 0.0, 0, 0.0
+    overlap = TRUE_PEAK_TAPS if peak_dBFS is not None else 0
+    position = 0
+    for block in sf.blocks(input_path, blocksize=block_size + overlap, overlap=overlap, dtype='float32'):
+        # Con solapamiento, las primeras muestras de cada bloque ya se contaron
+        fresh = block if position == 0 else block[overlap:]
+        position += 1
+        sum_squares += float(np.dot(fresh.ravel(), fresh.ravel()))
+        count += fresh.size
+        if peak_dBFS is not None:
+            peak = max(peak, true_peak(block))
+    gain = _normalization_gain(sum_squares, count, peak, target_dBFS, peak_dBFS)
+    
+    # Escritura a un temporal para poder normalizar in situ
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)),
+                                    suffix='.' + output_path.split('.')[-1])
+    os.close(fd)
+    try:
+        with sf.SoundFile(tmp_path, 'w', samplerate=info.samplerate, channels=info.channels,
+                          subtype=info.subtype, format=info.format) as out:
+            for block in sf.blocks(input_path, blocksize=block_size, dtype='float32'):
+                out.write(np.clip(block * gain, -1.0, 1.0))
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+@profiled('audio.normalize_audio')
 def normalize_audio(file_path: str, target_dBFS: float = -20.0) -> None:
     """
     Normaliza el volumen de un archivo de audio
@@ -115,6 +463,9 @@ def normalize_audio(file_path: str, target_dBFS: float = -20.0) -> None:
         target_dBFS: Nivel de volumen objetivo
     """
     try:
+        if file_path.split('.')[-1].lower() in ('wav', 'flac', 'ogg'):
+            normalize_audio_stream(file_path, file_path, target_dBFS)
+            return
         audio = AudioSegment.from_file(file_path)
         change_in_dBFS = target_dBFS - audio.dBFS
         normalized = audio.apply_gain(change_in_dBFS)
@@ -122,23 +473,205 @@ def normalize_audio(file_path: str, target_dBFS: float = -20.0) -> None:
     except Exception as e:
         print(f"Error normalizando audio: {str(e)}")
 
-def concatenate_audio_files(file_paths: List[str], output_path: str) -> None:
+class _LinearResampler:
+    """Remuestreo lineal por bloques que conserva la fase entre bloques"""
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.step = src_rate / dst_rate
+        self.position = 0.0  # Posición de la siguiente muestra de salida en la entrada
+        self.offset = 0      # Índice en la entrada de la primera muestra de `data`
+        self.tail = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        data = block if self.tail is None else np.concatenate([self.tail, block])
+        last = self.offset + len(data) - 1
+        count = max(int(np.ceil((last - self.position) / self.step)), 0)
+        positions = self.position + self.step * np.arange(count) - self.offset
+        index = positions.astype(np.int64)
+        frac = (positions - index)[:, None]
+        resampled = data[index] * (1 - frac) + data[np.minimum(index + 1, len(data) - 1)] * frac
+        
+        self.position += self.step * count
+        self.tail = data[-1:]
+        self.offset = last
+        return resampled.astype(np.float32)
+
+def _match_channels(block: np.ndarray, channels: int) -> np.ndarray:
+    """Adapta un bloque (muestras, canales) al número de canales de salida"""
+    if block.shape[1] == channels:
+        return block
+    if channels == 1:
+        return block.mean(axis=1, keepdims=True)
+    if block.shape[1] == 1:
+        return np.repeat(block, channels, axis=1)
+    return block[:, :channels] if block.shape[1] > channels else \
+        np.pad(block, ((0, 0), (0, channels - block.shape[1])), mode='edge')
+
+def _audio_params(file_path: str):
+    """(tasa de muestreo, canales) de un archivo sin decodificarlo entero si es posible"""
+    try:
+        info = sf.info(file_path)
+        return info.samplerate, info.channels
+    except RuntimeError:
+        audio = AudioSegment.from_file(file_path)
+        return audio.frame_rate, audio.channels
+
+def _iter_audio_blocks(file_path: str, sample_rate: int, channels: int, block_size: int):
+    """
+    Lee un archivo por bloques float32 (muestras, canales) ya convertidos al
+    formato de salida. Los formatos de soundfile se leen en streaming; el resto
+    (mp3) se decodifica con pydub archivo a archivo.
+    """
+    try:
+        info = sf.info(file_path)
+        source_rate = info.samplerate
+        blocks = sf.blocks(file_path, blocksize=block_size, dtype='float32', always_2d=True)
+    except RuntimeError:
+        audio = AudioSegment.from_file(file_path)
+        source_rate = audio.frame_rate
+        scale = float(1 << (8 * audio.sample_width - 1))
+        samples = np.array(audio.get_array_of_samples(), dtype=np.float32).reshape(-1, audio.channels) / scale
+        blocks = (samples[i:i + block_size] for i in range(0, len(samples), block_size))
+    
+    resampler = _LinearResampler(source_rate, sample_rate) if source_rate != sample_rate else None
+    for block in blocks:
+        block = _match_channels(block, channels)
+        if resampler is not None:
+            block = resampler.process(block)
+        if len(block):
+            yield block
+
+def _read_frames(blocks, count: int, channels: int):
+    """Extrae las primeras count muestras de un iterador de bloques y devuelve (muestras, resto)"""
+    taken = []
+    total = 0
+    for block in blocks:
+        taken.append(block)
+        total += len(block)
+        if total >= count:
+            break
+    data = np.concatenate(taken) if taken else np.zeros((0, channels), dtype=np.float32)
+    return data[:count], data[count:]
+
+def _copy_wav_frames(file_paths: List[str], output_path: str, block_size: int) -> bool:
+    """
+    Camino rápido sin decodificar: copia las tramas PCM de WAVs con el mismo formato
+    
+    Returns:
+        False si los archivos no son WAV PCM compatibles entre sí
+    """
+    if output_path.split('.')[-1].lower() != 'wav':
+        return False
+    params = None
+    try:
+        for file_path in file_paths:
+            with wave.open(file_path, 'rb') as reader:
+                current = (reader.getnchannels(), reader.getsampwidth(), reader.getframerate())
+            if params is not None and current != params:
+                return False
+            params = current
+    except (wave.Error, EOFError):
+        return False
+    
+    with wave.open(output_path, 'wb') as writer:
+        writer.setnchannels(params[0])
+        writer.setsampwidth(params[1])
+        writer.setframerate(params[2])
+        for file_path in file_paths:
+            with wave.open(file_path, 'rb') as reader:
+                while True:
+                    frames = reader.readframes(block_size)
+                    if not frames:
+                        break
+                    writer.writeframesraw(frames)
+    return True
+
+@contextmanager
+def _audio_writer(output_path: str, sample_rate: int, channels: int):
+    """
+    Escritor por bloques: directo con soundfile para WAV/FLAC/OGG; para otros
+    formatos (mp3) se escribe un WAV temporal que se codifica una sola vez al final
+    """
+    extension = output_path.split('.')[-1].lower()
+    if extension in ('wav', 'flac', 'ogg'):
+        with sf.SoundFile(output_path, 'w', samplerate=sample_rate, channels=channels) as writer:
+            yield writer
+        return
+    
+    fd, tmp_path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        with sf.SoundFile(tmp_path, 'w', samplerate=sample_rate, channels=channels) as writer:
+            yield writer
+        AudioSegment.from_wav(tmp_path).export(output_path, format=extension)
+    finally:
+        os.remove(tmp_path)
+
+@profiled('audio.concatenate_audio_files')
+def concatenate_audio_files(
+    file_paths: List[str],
+    output_path: str,
+    crossfade_ms: float = 0,
+    block_size: int = 65536
+) -> None:
     """
     Concatena múltiples archivos de audio en uno solo
     
+    Escribe cada entrada por bloques directamente en la salida, así que la
+    memoria es constante y el coste lineal en la duración total. Las entradas
+    se remuestrean y se adaptan al número de canales de la primera. WAVs PCM
+    con el mismo formato y sin crossfade se copian sin decodificar.
+    
     Args:
         file_paths: Lista de rutas a archivos de audio
         output_path: Ruta de salida para el archivo concatenado
+        crossfade_ms: Duración del fundido cruzado entre archivos (0 para ninguno)
+        block_size: Muestras por bloque
     """
     if not file_paths:
         return
-        
-    combined = AudioSegment.empty()
-    for file_path in file_paths:
-        sound = AudioSegment.from_file(file_path)
-        combined += sound
     
-    combined.export(output_path, format=output_path.split('.')[-1])
+    if crossfade_ms <= 0 and _copy_wav_frames(file_paths, output_path, block_size):
+        return
+    
+    sample_rate, channels = _audio_params(file_paths[0])
+    fade = int(sample_rate * crossfade_ms / 1000)
+    
+    with _audio_writer(output_path, sample_rate, channels) as writer:
+        # Las últimas `fade` muestras se retienen para mezclarlas con el siguiente archivo
+        held = np.zeros((0, channels), dtype=np.float32)
+        for file_path in file_paths:
+            blocks = _iter_audio_blocks(file_path, sample_rate, channels, block_size)
+            if fade and len(held):
+                head, rest = _read_frames(blocks, fade, channels)
+                n = min(len(head), len(held))
+                ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)[:, None]
+                writer.write(held[:len(held) - n])
+                held = held[len(held) - n:] * (1 - ramp) + head[:n] * ramp
+                blocks = itertools.chain([np.concatenate([held, head[n:], rest])], blocks)
+                held = np.zeros((0, channels), dtype=np.float32)
+            
+            for block in blocks:
+                if fade:
+                    block = np.concatenate([held, block])
+                    writer.write(block[:-fade])
+                    held = block[-fade:]
+                else:
+                    writer.write(block)
+        writer.write(held)
+
+def _oscillator(t: np.ndarray, frequency: float, wave_type: str) -> np.ndarray:
+    """Evalúa un oscilador de forma vectorizada sobre los instantes t"""
+    if wave_type == "sine":
+        return np.sin(2 * np.pi * frequency * t)
+    elif wave_type == "square":
+        return np.sign(np.sin(2 * np.pi * frequency * t))
+    elif wave_type == "sawtooth":
+        return 2 * (t * frequency - np.floor(0.5 + t * frequency))
+    elif wave_type == "pulse":
+        return np.where(np.sin(2 * np.pi * frequency * t) > 0, 1, -1)
+    else:
+        raise ValueError("Tipo de onda no soportado")
 
 def generate_waveform(
     frequency: float,
@@ -161,16 +694,6 @@ def generate_waveform(
         Array numpy con la forma de onda
     """
     t = np.linspace(0, duration, int(sample_rate * duration), False)
-    
-    if wave_type == "sine":
-        wave = np.sin(2 * np.pi * frequency * t)
-    elif wave_type == "square":
-        wave = np.sign(np.sin(2 * np.pi * frequency * t))
-    elif wave_type == "sawtooth":
-        wave = 2 * (t * frequency - np.floor(0.5 + t * frequency))
-    elif wave_type == "pulse":
-        wave = np.where(np.sin(2 * np.pi * frequency * t) > 0, 1, -1)
-    else:
-        raise ValueError("Tipo de onda no soportado")
+    wave = _oscillator(t, frequency, wave_type)
     
     return wave * volume
\ No newline at end of file
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from typing import Union, List, Optional, Tuple
 import numpy as np
 
@@ -22,6 +23,23 @@ CHORD_TYPES = {
     'min7': [0, 3, 7, 10]
 }
 
+# Patrones compilados una sola vez
+NOTE_PATTERN = re.compile(r'^([A-Ga-g]#?|b?)(-?\d+)$')
+CHORD_PATTERN = re.compile(r'^([A-Ga-g]#?|b?)(maj|min|m|dim|aug)?(7|maj7|min7)?$', re.IGNORECASE)
+ROOT_PATTERN = re.compile(r'^([A-Ga-g]#?|b?)')
+
+# Tablas de consulta para los 128 valores MIDI
+MIDI_NOTE_NAMES = tuple(f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}" for midi in range(128))
+MIDI_FREQUENCY_LIST = tuple(440.0 * (2.0 ** ((midi - 69) / 12.0)) for midi in range(128))
+MIDI_FREQUENCIES = np.array(MIDI_FREQUENCY_LIST)
+MIDI_FREQUENCIES.flags.writeable = False
+_MIDI_NOTE_NAME_ARRAY = np.array(MIDI_NOTE_NAMES)
+_MIDI_NOTE_NAME_ARRAY.flags.writeable = False
+
+# Tamaño de las cachés de conversión de cadenas (notas y entradas de usuario)
+PARSE_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def note_to_midi(note: str) -> Optional[int]:
     """
     Convierte un nombre de nota (ej. 'C4') a valor MIDI (0-127)
@@ -32,7 +50,7 @@ def note_to_midi(note: str) -> Optional[int]:
     Returns:
         Valor MIDI o None si no es válido
     """
-    match = re.match(r'^([A-Ga-g]#?|b?)(-?\d+)$', note.strip())
+    match = NOTE_PATTERN.match(note.strip())
     if not match:
         return None
     
@@ -71,9 +89,7 @@ def midi_to_note(midi: int) -> str:
     if not 0 <= midi <= 127:
         return None
     
-    octave = (midi // 12) - 1
-    note_name = NOTE_NAMES[midi % 12]
-    return f"{note_name}{octave}"
+    return MIDI_NOTE_NAMES[midi]
 
 def note_to_frequency(note: Union[str, int]) -> float:
     """
@@ -94,9 +110,56 @@ def note_to_frequency(note: Union[str, int]) -> float:
     else:
         return None
     
+    if 0 <= midi <= 127:
+        return MIDI_FREQUENCY_LIST[midi]
     # Fórmula: f = 440 * 2^((n-69)/12)
     return 440.0 * (2.0 ** ((midi - 69) / 12.0))
 
+def _check_midi_range(midi: np.ndarray) -> np.ndarray:
+    midi = np.asarray(midi)
+    if midi.size and (midi.min() < 0 or midi.max() > 127):
+        raise ValueError("Los valores MIDI deben estar entre 0 y 127")
+    return midi
+
+def midi_to_frequency(midi: np.ndarray) -> np.ndarray:
+    """
+    Convierte un array de valores MIDI (0-127) a frecuencias en Hz
+    
+    Args:
+        midi: Array de enteros de cualquier forma (p. ej. un lote generado)
+        
+    Returns:
+        Array float64 de la misma forma
+    """
+    return MIDI_FREQUENCIES[_check_midi_range(midi)]
+
+def midi_to_note_names(midi: np.ndarray) -> np.ndarray:
+    """Convierte un array de valores MIDI (0-127) a nombres de nota (ej. 'C4')"""
+    return _MIDI_NOTE_NAME_ARRAY[_check_midi_range(midi)]
+
+def note_names_to_midi(names) -> np.ndarray:
+    """
+    Convierte un array de nombres de nota a valores MIDI
+    
+    Cada nombre distinto se analiza una sola vez.
+    
+    Args:
+        names: Secuencia o array de nombres (ej. ['C4', 'A#3'])
+        
+    Returns:
+        Array int16 de la misma forma, con -1 en los nombres no válidos
+    """
+    names = np.asarray(names, dtype=str)
+    unique, inverse = np.unique(names, return_inverse=True)
+    values = np.empty(len(unique), dtype=np.int16)
+    for i, name in enumerate(unique):
+        try:
+            midi = note_to_midi(str(name))
+        except ValueError:
+            midi = None
+        values[i] = -1 if midi is None else midi
+    return values[inverse].reshape(names.shape)
+
 def scale_to_midi_notes(root: str, scale_type: str, octaves: int = 2) -> List[int]:
     """
     Genera notas MIDI para una escala
@@ -160,9 +223,7 @@ def is_valid_scale(scale: str) -> bool:
 def is_valid_chord(chord: str) -> bool:
     """Verifica si una cadena representa un acorde válido (ej. 'Cmaj7')"""
     # Patrones para acordes (ej. C, Cm, Cdim, C7, Cmaj7)
-    pattern = r'^([A-Ga-g]#?|b?)(maj|min|m|dim|aug)?(7|maj7|min7)?$'
-    match = re.match(pattern, chord.strip(), re.IGNORECASE)
-    return bool(match)
+    return CHORD_PATTERN.match(chord.strip()) is not None
 
 def parse_music_input(input_str: str) -> List[int]:
     """
@@ -174,15 +235,22 @@ def parse_music_input(input_str: str) -> List[int]:
     Returns:
         Lista de valores MIDI
     """
+    return list(_parse_music_input(input_str))
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_music_input(input_str: str) -> Tuple[int, ...]:
+    # Memoizada: las semillas se repiten mucho (GUI, lotes, servidor); se
+    # devuelve una tupla para que nadie pueda modificar el valor cacheado
     elements = [elem.strip() for elem in input_str.split(',')]
     midi_notes = []
     
     for elem in elements:
-        if is_valid_note(elem):
-            midi_notes.append(note_to_midi(elem))
+        midi = note_to_midi(elem)
+        if midi is not None:
+            midi_notes.append(midi)
         elif is_valid_chord(elem):
             # Extraer root y tipo de acorde
-            root = re.match(r'^([A-Ga-g]#?|b?)', elem).group(1)
+            root = ROOT_PATTERN.match(elem).group(1)
             chord_type = elem[len(root):].lower()
             if not chord_type:
                 chord_type = 'major'
@@ -193,4 +261,4 @@ def parse_music_input(input_str: str) -> List[int]:
             root, scale_type = elem.split()
             midi_notes.extend(scale_to_midi_notes(root, scale_type))
     
-    return [note for note in midi_notes if note is not None]
\ No newline at end of file
+    return tuple(note for note in midi_notes if note is not None)
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""
+Instrumentación opcional: tramos con tiempo (spans) y contadores
+
+Desactivada por defecto. Mientras lo está, span() devuelve siempre el mismo
+contexto vacío y profiled() llama directamente a la función, así que el coste
+es una comprobación de un booleano. Se activa con enable() o con la variable
+de entorno GEN_MUSIC_PROFILE=1.
+
+Exporta a una traza JSON en formato Chrome (chrome://tracing, Perfetto) y a
+un volcado de texto en formato Prometheus. También incluye interruptores para
+cProfile y tf.profiler.
+"""
+import os
+import re
+import json
+import time
+import threading
+import functools
+import cProfile
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+ENV_VAR = 'GEN_MUSIC_PROFILE'
+METRIC_PREFIX = 'gen_music'
+# Límite de eventos guardados para la traza (las estadísticas no tienen límite)
+MAX_TRACE_EVENTS = 200000
+
+_enabled = os.environ.get(ENV_VAR, '') not in ('', '0')
+_NULL_SPAN = nullcontext()
+
+class Recorder:
+    """Eventos de la traza, estadísticas por span y contadores (seguro entre hilos)"""
+
+    def __init__(self, max_events: int = MAX_TRACE_EVENTS):
+        self.max_events = max_events
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.events = []
+            self.dropped_events = 0
+            self.stats: Dict[str, list] = {}
+            self.counters: Dict[str, float] = {}
+
+    def record_span(self, name: str, start: float, duration: float, args: Optional[dict]) -> None:
+        with self.lock:
+            stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, duration, os.getpid(), threading.get_ident(), args))
+            else:
+                self.dropped_events += 1
+
+    def add(self, name: str, value: float) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def chrome_trace(self) -> dict:
+        """Traza en el formato JSON de Chrome (eventos completos 'X' y contadores 'C')"""
+        with self.lock:
+            events = [{
+                'name': name, 'cat': name.split('.')[0], 'ph': 'X',
+                'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6,
+                'pid': pid, 'tid': tid, 'args': args or {}
+            } for name, start, duration, pid, tid, args in self.events]
+            end = (time.perf_counter() - self.origin) * 1e6
+            events += [{'name': name, 'ph': 'C', 'ts': end, 'pid': os.getpid(), 'args': {'value': value}}
+                       for name, value in self.counters.items()]
+            return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                    'otherData': {'dropped_events': self.dropped_events}}
+
+    def prometheus_text(self) -> str:
+        """Volcado en formato de texto de Prometheus"""
+        lines = [f'# TYPE {METRIC_PREFIX}_span_seconds summary']
+        with self.lock:
+            for name, (calls, total, _) in sorted(self.stats.items()):
+                label = f'{{span="{name}"}}'
+                lines.append(f'{METRIC_PREFIX}_span_seconds_count{label} {calls}')
+                lines.append(f'{METRIC_PREFIX}_span_seconds_sum{label} {total:.9f}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_span_max_seconds gauge')
+            for name, (_, _, longest) in sorted(self.stats.items()):
+                lines.append(f'{METRIC_PREFIX}_span_max_seconds{{span="{name}"}} {longest:.9f}')
+            for name, value in sorted(self.counters.items()):
+                metric = f"{METRIC_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+recorder = Recorder()
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        recorder.record_span(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+def span(name: str, **args):
+    """
+    Mide un bloque de código
+
+    Uso: with span('generation.step', batch=8): ...
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+def count(name: str, value: float = 1) -> None:
+    """Suma value a un contador"""
+    if _enabled:
+        recorder.add(name, value)
+
+def profiled(name: Optional[str] = None):
+    """Decorador que mide cada llamada a la función como un span"""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_chrome_trace(path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(recorder.chrome_trace(), f)
+
+def write_prometheus(path: str) -> None:
+    with open(path, 'w') as f:
+        f.write(recorder.prometheus_text())
+
+def write_reports(directory: str) -> Dict[str, str]:
+    """
+    Escribe trace.json (Chrome) y metrics.prom (Prometheus) en un directorio
+
+    Returns:
+        Rutas escritas por formato
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {'chrome': os.path.join(directory, 'trace.json'),
+             'prometheus': os.path.join(directory, 'metrics.prom')}
+    write_chrome_trace(paths['chrome'])
+    write_prometheus(paths['prometheus'])
+    return paths
+
+@contextmanager
+def cprofile(output_path: str):
+    """Ejecuta el bloque bajo cProfile y guarda las estadísticas (ver pstats / snakeviz)"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        profiler.dump_stats(output_path)
+
+@contextmanager
+def tf_profiler(logdir: str):
+    """Ejecuta el bloque bajo tf.profiler (se ve en la pestaña Profile de TensorBoard)"""
+    import tensorflow as tf
+    tf.profiler.experimental.start(logdir)
+    try:
+        yield
+    finally:
+        tf.profiler.experimental.stop()
+
+PROFILE_MODES = ('off', 'spans', 'cprofile', 'tf')
+
+@contextmanager
+def profile_session(mode: str = 'off', output_dir: str = 'profiles'):
+    """
+    Interruptor común de los puntos de entrada (train.py, main.py)
+
+    'spans' activa la instrumentación y escribe los informes al salir;
+    'cprofile' y 'tf' además perfilan todo el bloque con cProfile o tf.profiler.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado no soportado: {mode}")
+    if mode == 'off':
+        yield
+        return
+
+    enable()
+    if mode == 'cprofile':
+        session = cprofile(os.path.join(output_dir, 'profile.pstats'))
+    elif mode == 'tf':
+        session = tf_profiler(os.path.join(output_dir, 'tf'))
+    else:
+        session = nullcontext()
+    try:
+        with session:
+            yield
+    finally:
+        paths = write_reports(output_dir)
+        print(f"Perfil guardado en {output_dir} ({', '.join(os.path.basename(p) for p in paths.values())})")
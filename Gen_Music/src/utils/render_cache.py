@@ -0,0 +1,214 @@
+"""
+Caché en disco de audio renderizado, direccionada por contenido
+
+La clave es un hash de todo lo que determina el resultado (notas, parámetros
+de render, formato y versión del sintetizador), así que una misma toma solo
+se sintetiza una vez. El tamaño total está acotado: al superarlo se eliminan
+las entradas usadas hace más tiempo (LRU por fecha de modificación, que se
+actualiza en cada acierto).
+
+Es segura entre procesos: las entradas se escriben en un temporal del mismo
+directorio y se publican con os.replace, de modo que nadie ve un archivo a
+medias; los temporales que deja un proceso que muere a mitad de escritura
+se borran al expulsar, pasado STALE_TMP_SECONDS. Las entradas son copias de
+solo lectura: ni al guardarlas ni al devolverlas se enlazan con el archivo
+del llamador, que puede modificarlo (p. ej. normalize_audio) sin alterar la
+caché.
+
+Configuración por variables de entorno:
+    GEN_MUSIC_RENDER_CACHE: directorio de la caché ('off' para desactivarla)
+    GEN_MUSIC_RENDER_CACHE_BYTES: presupuesto en bytes
+"""
+import os
+import json
+import stat
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+from typing import Dict, Optional
+from .profiling import count
+
+CACHE_ENV_VAR = 'GEN_MUSIC_RENDER_CACHE'
+CACHE_BYTES_ENV_VAR = 'GEN_MUSIC_RENDER_CACHE_BYTES'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gen_music', 'renders')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+TMP_SUFFIX = '.tmp'
+# Antigüedad a partir de la cual un temporal se da por abandonado
+STALE_TMP_SECONDS = 3600
+
+def render_cache_key(predictions, settings: dict) -> str:
+    """
+    Clave de caché: hash de las notas más los parámetros de render
+
+    Las notas se pasan a int64, de modo que la misma melodía da la misma clave
+    venga como lista o como array de cualquier tipo entero.
+
+    Args:
+        predictions: Lista o array de valores MIDI
+        settings: Parámetros que afectan al resultado (deben ser serializables a JSON)
+
+    Returns:
+        Hash hexadecimal (sha256)
+    """
+    notes = np.ascontiguousarray(predictions, dtype=np.int64)
+    digest = hashlib.sha256()
+    digest.update(notes.tobytes())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+class RenderCache:
+    """Caché de archivos de audio con presupuesto de bytes y expulsión LRU"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str, format: str) -> str:
+        return os.path.join(self.directory, f"{key}.{format}")
+
+    def get(self, key: str, format: str, output_path: str) -> bool:
+        """
+        Publica una entrada de la caché en output_path si existe
+
+        Returns:
+            True si hubo acierto
+        """
+        path = self.path(key, format)
+        try:
+            # Marca la entrada como usada recientemente para el orden LRU
+            os.utime(path)
+            # Copia en un temporal (con los permisos por defecto): output_path
+            # nunca queda a medias ni de solo lectura
+            tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}"
+            try:
+                shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except FileNotFoundError:
+            # No existe o la expulsó otro proceso entre medias
+            self._record('misses')
+            return False
+        self._record('hits')
+        return True
+
+    def put(self, key: str, format: str, source_path: str) -> str:
+        """
+        Añade a la caché una copia de un archivo ya renderizado (el original no se toca)
+
+        Returns:
+            Ruta de la entrada en la caché
+        """
+        path = self.path(key, format)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=TMP_SUFFIX)
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return path
+
+    def _scan(self):
+        """Entradas publicadas (fecha de uso, tamaño, ruta) y temporales abandonados"""
+        entries, stale = [], []
+        cutoff = time.time() - STALE_TMP_SECONDS
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if not entry.name.endswith(TMP_SUFFIX):
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+                elif info.st_mtime < cutoff:
+                    stale.append(entry.path)
+        return entries, stale
+
+    def entries(self):
+        """Lista (fecha de uso, tamaño, ruta) de las entradas publicadas"""
+        return self._scan()[0]
+
+    def size(self) -> int:
+        """Bytes ocupados por las entradas"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Elimina las entradas menos usadas hasta quedar dentro del presupuesto
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries, stale = self._scan()
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if removed:
+            self._record('evictions', removed)
+        return removed
+
+    def clear(self) -> int:
+        """Vacía la caché"""
+        return self.evict(0)
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de este proceso y ocupación actual"""
+        entries = self.entries()
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes}
+
+    def _record(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            setattr(self, name, getattr(self, name) + value)
+        count(f'render_cache.{name}', value)
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def default_render_cache() -> Optional[RenderCache]:
+    """Caché compartida del proceso según las variables de entorno (None si está desactivada)"""
+    global _default_cache
+    directory = os.environ.get(CACHE_ENV_VAR, DEFAULT_CACHE_DIR)
+    if directory.lower() in ('off', '0', ''):
+        return None
+    with _default_lock:
+        if _default_cache is None or _default_cache.directory != directory:
+            max_bytes = int(os.environ.get(CACHE_BYTES_ENV_VAR, DEFAULT_MAX_BYTES))
+            try:
+                _default_cache = RenderCache(directory, max_bytes)
+            except OSError as e:
+                print(f"Caché de audio desactivada: {e}")
+                return None
+        return _default_cache
@@ -1,14 +1,42 @@
+import argparse
 from src.data_processing.midi_processor import preprocess_dataset
+from src.data_processing.dedup import DEDUP_MODES, DEFAULT_MAX_MISMATCHES
 from src.models.model_trainer import train_models
+from src.utils.profiling import PROFILE_MODES, profile_session
 
 def main():
-    # Preprocesar datos MIDI
-    print("Preprocesando datos MIDI...")
-    preprocess_dataset("data/midi", "data/processed")
+    parser = argparse.ArgumentParser(description="Preprocesa el corpus MIDI y entrena los modelos")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Réplicas de entrenamiento en dispositivos lógicos de CPU")
+    parser.add_argument("--mixed-precision", choices=['auto', 'on', 'off'], default='off')
+    parser.add_argument("--parallel", action='store_true',
+                        help="Entrenar CNN y Transformer a la vez en procesos separados")
+    parser.add_argument("--no-resume", action='store_true',
+                        help="Empezar de cero aunque haya checkpoints")
+    parser.add_argument("--tokens", action='store_true',
+                        help="Entrenar sobre tokens de eventos con entrada Embedding")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default='off',
+                        help="Ventanas duplicadas salvo transposición: descartarlas o reducir su peso "
+                             "(por defecto se entrena con todas, como train_models)")
+    parser.add_argument("--dedup-mismatches", type=int, default=DEFAULT_MAX_MISMATCHES,
+                        help="Intervalos distintos tolerados entre ventanas duplicadas")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default='off',
+                        help="Instrumentación: spans, cProfile o tf.profiler")
+    parser.add_argument("--profile-dir", default="profiles")
+    args = parser.parse_args()
     
-    # Entrenar modelos
-    print("Entrenando modelos...")
-    train_models("data/processed/sequences.npy", "models")
+    with profile_session(args.profile, args.profile_dir):
+        # Preprocesar datos MIDI
+        print("Preprocesando datos MIDI...")
+        preprocess_dataset("data/midi", "data/processed",
+                           dedup_mismatches=None if args.dedup == 'off' else args.dedup_mismatches)
+        
+        # Entrenar modelos
+        print("Entrenando modelos...")
+        train_models("data/processed", "models", num_workers=args.workers,
+                     mixed_precision=args.mixed_precision, parallel=args.parallel,
+                     resume=not args.no_resume, tokens=args.tokens, dedup=args.dedup,
+                     dedup_mismatches=args.dedup_mismatches)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()